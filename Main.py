@@ -1,3 +1,4 @@
+import asyncio
 import customtkinter as ctk
 from PIL import Image
 import time
@@ -6,16 +7,21 @@ import tkinter.font as tkfont
 import json
 import os
 import datetime  
-import requests
 from PIL import Image
 from dotenv import load_dotenv
 import backend
+import async_backend
+import tracing
+from event_loop import deliver_to_tk, run_in_tk
 import tkinter as tk
 
 load_dotenv()
 
 OPEN_WEATHER_API_KEY = os.getenv("OPEN_WEATHER_API_KEY")
 
+# The GUI's conversation (history, speak setting, turns)
+session = backend.default_session
+
 # === App Theme Settings ===
 ctk.set_appearance_mode("dark")  
 ctk.set_default_color_theme("blue")
@@ -23,6 +29,11 @@ ctk.set_default_color_theme("blue")
 # Initialize global message counter
 message_counter = 0  
 
+# How often (ms) streamed reply text is pushed into its chat bubble
+STREAM_FLUSH_MS = 50
+# Recent turns summarized in the latency debug panel (F12, or open at start with AURA_DEBUG_PANEL=1)
+LATENCY_PANEL_TURNS = 20
+
 class CityInputPopup(ctk.CTkToplevel):
     def __init__(self, parent, on_submit_callback):
         super().__init__(parent)
@@ -50,12 +61,17 @@ class CityInputPopup(ctk.CTkToplevel):
         self.destroy()
 
 class ChatBubble(ctk.CTkFrame):
-    def __init__(self, master, text, is_user=False):
+    def __init__(self, master, text, is_user=False, streaming=False):
         super().__init__(master, fg_color="#f0f0f0" if ctk.get_appearance_mode() == "Light" else "#333333", corner_radius=20)
         self.grid_columnconfigure(0, weight=1)
         self.is_user = is_user
         self._last_width = 0  # Initialize for tracking width
 
+        # Streamed text arrives from worker threads and is applied in batches on the main loop
+        self._stream_lock = threading.Lock()
+        self._pending_text = []
+        self._streaming = streaming
+
         text_color = "#333333" if ctk.get_appearance_mode() == "Light" else "#f0f0f0"
 
         self.inner_frame = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
@@ -76,7 +92,32 @@ class ChatBubble(ctk.CTkFrame):
             self.label.configure(text_color="#000000" if ctk.get_appearance_mode() == "Light" else "#ffffff")
 
         self.after(10, self.update_bubble_width)  # Let layout settle before measuring
+        if streaming:
+            self.after(STREAM_FLUSH_MS, self._flush_stream)
+
+    def append_text(self, text):
+        """Queues streamed text for the bubble; safe to call from worker threads."""
+        with self._stream_lock:
+            self._pending_text.append(text)
+
+    def finish_stream(self):
+        """Marks the stream as complete; the last batch is flushed on the next tick."""
+        with self._stream_lock:
+            self._streaming = False
+
+    def _flush_stream(self):
+        with self._stream_lock:
+            pending = "".join(self._pending_text)
+            self._pending_text.clear()
+            still_streaming = self._streaming
+
+        if pending:
+            self.label.configure(text=self.label.cget("text") + pending)
+            self.update_bubble_width()
+            output_box.after(50, lambda: output_box._parent_canvas.yview_moveto(1.0))
 
+        if still_streaming:
+            self.after(STREAM_FLUSH_MS, self._flush_stream)
 
     def update_bubble_width(self):
         self.label.update_idletasks()
@@ -92,14 +133,14 @@ class ChatBubble(ctk.CTkFrame):
 
 
 # Updated display_message function
-def display_message(message, sender):
+def display_message(message, sender, streaming=False):
     global message_counter
 
     if not message.strip():
-        return
+        return None
 
     is_user = (sender == "user")
-    bubble = ChatBubble(output_box, message, is_user=is_user)
+    bubble = ChatBubble(output_box, message, is_user=is_user, streaming=streaming)
 
     if is_user:
         bubble.grid(row=message_counter, column=1, padx=(40, 10), pady=5, sticky="se")
@@ -110,6 +151,8 @@ def display_message(message, sender):
 
     # Scroll to bottom after slight delay
     output_box.after(50, lambda: output_box._parent_canvas.yview_moveto(1.0))
+    return bubble
+
 
 # === Initialize App ===
 app = ctk.CTk()
@@ -126,37 +169,48 @@ def toggle_listening():
 
     if not is_listening:
         is_listening = True
-        backend.speak_enabled = True
+        session.speak_enabled = True
 
         display_message("🎙️ Listening activated. Say something!", "assistant")
-        backend.speak_text("Listening activated. Say something!", lang='en')
+        # Speak without blocking the Tk main loop; the listen loop waits for it before recording
+        activation_prompt = backend.speak_text_async("Listening activated. Say something!", lang='en', session=session)
 
         def listen_loop():
+            activation_prompt.result()
             while is_listening:
-                recorded_text = backend.record_audio()
+                # Each exchange is one trace, from listening to the end of playback
+                with backend.tracer.trace("voice", session.session_id) as trace:
+                    voice_turn(trace)
 
-                if recorded_text:
-                    display_message(recorded_text, "user")
-                    lang_code = backend.detect_language(recorded_text)
-                    main_response, follow_up = backend.get_ai_response(recorded_text, lang_code)
+        def voice_turn(trace):
+            recorded_text = backend.record_audio(session=session)
+
+            if recorded_text:
+                display_message(recorded_text, "user")
+                lang_code = backend.detect_language(recorded_text)
+                trace.set(lang=lang_code)
+                with session.turns.turn() as turn:
+                    main_response, follow_up = backend.get_ai_response(recorded_text, lang_code, cancel_token=turn, session=session)
 
                     # Speak ONLY, don't show text
                     if main_response:
-                        backend.speak_text(main_response, lang_code)
+                        backend.speak_text(main_response, lang_code, cancel_token=turn, session=session)
 
                     if follow_up:
-                        backend.speak_text(follow_up, lang_code)
+                        backend.speak_text(follow_up, lang_code, cancel_token=turn, session=session)
 
-                else:
-                    backend.speak_text("Sorry, I didn't catch that.", lang='en')
+            else:
+                if not trace.has_span("stt"):
+                    trace.discard()  # Nobody spoke before the listen timeout; not worth a trace
+                backend.speak_text("Sorry, I didn't catch that.", lang='en', session=session)
 
         threading.Thread(target=listen_loop, daemon=True).start()
 
     else:
         is_listening = False
-        backend.speak_enabled = False
+        session.speak_enabled = False
         display_message("Listening stopped.", "assistant")
-        backend.speak_text("Listening stopped.", lang='en')
+        backend.speak_text_async("Listening stopped.", lang='en', session=session)
 
 
 # === Load Custom Font ===
@@ -367,38 +421,68 @@ def submit_message(event=None):
     display_message(message, "user")
     command_entry.delete(0, ctk.END)
 
-    # Run response in background thread
-    threading.Thread(target=process_message, args=(message,), daemon=True).start()
-
-def process_message(message):
-    lang_code = backend.detect_language(message)
-    intent_data = backend.detect_intent(message)
+    # Run response as a coroutine on the backend event loop; the trace starts now to include the hand-off
+    trace = backend.tracer.start("text", session.session_id)
+    deliver_to_tk(async_backend.aura_loop.submit(process_message(message, trace)), app)
+
+async def process_message(message, trace):
+    with tracing.activate(trace):
+        trace.add_span("loop_queue", trace.started)
+        # A repeat of a message still being answered (double-click plus Enter) joins that turn instead of
+        # superseding it; any other new message is its own turn and by default cancels the one in progress
+        await backend.single_flight.do_async(("turn", " ".join(message.lower().split())), start_turn, message)
+
+async def start_turn(message):
+    async with session.turns.turn_async() as turn:
+        await run_turn(message, turn)
+
+async def run_turn(message, turn):
+    # langdetect and the intent rules are CPU work; keep them off the loop every turn shares
+    lang_code = await async_backend.run_blocking(backend.detect_language, message)
+    intent_data = await async_backend.run_blocking(backend.detect_intent, message)
     intent = intent_data.get("intent")
     query = intent_data.get("query")
+    tracing.annotate(lang=lang_code, intent=intent)
 
+    loop = asyncio.get_running_loop()
     if intent == "save_previous":
-        if backend.last_generated_text:
-            backend.save_pdf_dialog(backend.last_generated_text, lang=lang_code)
+        if session.last_generated_text:
+            await loop.run_in_executor(None, backend.save_pdf_dialog, session.last_generated_text, lang_code)
         else:
-            display_message("No previous response to save.", "assistant")
+            await run_in_tk(app, display_message, "No previous response to save.", "assistant")
 
     elif intent in ["chat", "chat_and_save"]:
-        main_response, follow_up = backend.get_ai_response(query, lang_code)
-
-        if main_response:
-            display_message(main_response, "assistant")
-        if follow_up:
-            display_message(follow_up, "assistant")
-
+        # Stream the reply: the main response and the follow-up each get their own bubble
+        streamed = {"response": "", "follow_up": ""}
+        bubbles = {}
+        async for kind, text in async_backend.stream_ai_response(query, lang_code, cancel_token=turn, session=session):
+            streamed[kind] += text
+            if kind in bubbles:
+                bubbles[kind].append_text(text)
+            elif streamed[kind].strip():
+                bubbles[kind] = await run_in_tk(app, display_message, streamed[kind], "assistant", True)
+        for bubble in bubbles.values():
+            bubble.finish_stream()
+        if turn.cancelled:
+            return
+
+        main_response = streamed["response"]
         if intent == "chat_and_save" and main_response:
-            backend.save_pdf_dialog(main_response, lang=lang_code)
+            await loop.run_in_executor(None, backend.save_pdf_dialog, main_response, lang_code)
 
     elif intent == "image_generation":
-        backend.handle_image_generation(query)
+        await async_backend.handle_image_generation(query, session=session)
 
 
 def image_upload():
-    backend.get_image_description()
+    # The file dialog stays on the Tk main loop; upload, description and speech run on the event loop
+    image_path = backend.select_local_image()
+    trace = backend.tracer.start("image", session.session_id)
+    deliver_to_tk(async_backend.aura_loop.submit(describe_image(image_path, trace)), app)
+
+async def describe_image(image_path, trace):
+    with tracing.activate(trace):
+        return await async_backend.get_image_description(image_path, session)
 
 
 def power_action():
@@ -406,14 +490,14 @@ def power_action():
 
 
 def save_chat():
-    if backend.last_generated_text:
-        backend.save_pdf_dialog(backend.last_generated_text)
+    if session.last_generated_text:
+        backend.save_pdf_dialog(session.last_generated_text)
     else:
         print("No recent chat to save.")
 
 
 def chat_history():
-    history = backend.conversation_history
+    history = session.history
 
     if not history:
         display_message("No chat history available yet.", "assistant")
@@ -429,6 +513,57 @@ def chat_history():
 
 
 
+# === Latency Debug Panel ===
+class LatencyPanel(ctk.CTkToplevel):
+    """Live per-stage timings: the latest turn as a waterfall plus medians over recent turns."""
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Aura Latency")
+        self.geometry("620x520")
+        self.text = ctk.CTkTextbox(self, font=("Consolas", 12), wrap="none")
+        self.text.pack(fill="both", expand=True, padx=10, pady=10)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        backend.tracer.subscribe(self.on_trace)
+        self.refresh()
+
+    def on_trace(self, trace):
+        # Called from whichever thread finished the turn
+        self.after(0, self.refresh)
+
+    def refresh(self):
+        traces = backend.tracer.recent(LATENCY_PANEL_TURNS)
+        if not traces:
+            report = "No turns traced yet. Send a message or speak to Aura."
+        else:
+            lines = ["Latest turn", tracing.format_trace(traces[-1]), "",
+                     f"Last {len(traces)} turns (per stage, ms)",
+                     f"  {'stage':<18}{'turns':>6}{'p50':>9}{'p95':>9}"]
+            for stage, stats in sorted(backend.tracer.stage_stats(LATENCY_PANEL_TURNS).items(),
+                                       key=lambda item: -(item[1]["p50_ms"] or 0)):
+                lines.append(f"  {stage:<18}{stats['calls']:>6}{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}")
+            report = "\n".join(lines)
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", report)
+        self.text.configure(state="disabled")
+
+    def close(self):
+        global latency_panel
+        backend.tracer.unsubscribe(self.on_trace)
+        latency_panel = None
+        self.destroy()
+
+latency_panel = None
+
+def toggle_latency_panel(event=None):
+    global latency_panel
+    if latency_panel is None:
+        latency_panel = LatencyPanel(app)
+    else:
+        latency_panel.close()
+
+
 # === Apply Theme Function ===
 def apply_theme(theme_dict):
     # Configure frames
@@ -577,12 +712,12 @@ location_button.place(x = 100, y=-4,)
 
 
 def update_weather():
-    try:
-        api_key = os.getenv("OPEN_WEATHER_API_KEY")
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-        response = requests.get(url)
-        data = response.json()
+    # Fetched on the event loop so a slow weather API never freezes the window
+    weather = async_backend.get_weather(city, OPEN_WEATHER_API_KEY)
+    deliver_to_tk(async_backend.aura_loop.submit(weather), app, show_weather, show_weather_error)
 
+def show_weather(data):
+    try:
         if data.get("main"):
             temp = data["main"]["temp"]
             desc = data["weather"][0]["description"].capitalize()
@@ -600,10 +735,13 @@ def update_weather():
     
 
     except Exception as e:
-        print(f"Weather error: {e}")
-        temperature_label.configure(text="Error")
-        condition_label.configure(text="Error")
-        humidity_label.configure(text="--")
+        show_weather_error(e)
+
+def show_weather_error(e):
+    print(f"Weather error: {e}")
+    temperature_label.configure(text="Error")
+    condition_label.configure(text="Error")
+    humidity_label.configure(text="--")
         
     
 
@@ -715,6 +853,7 @@ command_entry = ctk.CTkEntry(right_bottom_panel,  # PARENT: right_bottom_panel
                             corner_radius=10, border_width=1)
 command_entry.place(x=entry_x, y=button_y_in_panel)
 command_entry.bind("<Return>", submit_message)  # Bind Enter key
+app.bind("<F12>", toggle_latency_panel)  # Latency debug panel
 
 # --- Submit Button (in right_bottom_panel) ---
 submit_x = right_panel_width - submit_button_width - submit_button_x_padding
@@ -855,6 +994,8 @@ def update_clock():
 # === Initial Setup Calls ===
 apply_theme(current_theme_dict)  # Apply the loaded theme initially
 update_clock()  # Start the clock
+if os.getenv("AURA_DEBUG_PANEL") == "1":
+    toggle_latency_panel()
 
 
 # === Start App ===
@@ -0,0 +1,386 @@
+import asyncio
+import os
+import time
+from io import BytesIO
+
+import httpx
+import replicate
+from groq import AsyncGroq
+from PIL import Image
+
+import backend
+import tracing
+from cancellation import TurnCancelled
+from event_loop import EventLoopThread
+from llm_client import AsyncHedgedLLM
+
+# --- Async Backend ---
+# Coroutine counterparts of backend.py's blocking I/O functions, built on
+# AsyncGroq and httpx.AsyncClient. They share backend's sessions, caches,
+# model router, rate limiter and single-flight table, so sync and async
+# callers can be mixed freely, and they all run on one event loop thread
+# (aura_loop). Speech synthesis engines such as gTTS have no async API and
+# still run on backend's bounded TTS pool; waiting on them costs no thread.
+
+HTTP_TIMEOUT_SECONDS = 30
+
+aura_loop = EventLoopThread()
+async_client = AsyncGroq(api_key=backend.client.api_key)
+llm = AsyncHedgedLLM(async_client, hedge_models=backend.llm.hedge_models, limiter=backend.rate_limiter)
+
+_http = None
+_speech_lock = asyncio.Lock()  # Keeps concurrent speak_text calls in order, like backend.speech_executor
+
+
+def http_client():
+    """The shared httpx.AsyncClient, created on first use."""
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS, follow_redirects=True)
+    return _http
+
+
+async def http_get(url, **kwargs):
+    """Async GET that shares one response between identical concurrent requests for url."""
+    return await backend.single_flight.do_async(("http", url), http_client().get, url, **kwargs)
+
+
+async def run_blocking(func, *args):
+    """Runs a blocking backend step (SQLite, index scans, state file writes) on the default executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, tracing.bind(func), *args)
+
+
+def get_model_stats():
+    """Hedging counters and latency of the async LLM client."""
+    return llm.stats()
+
+async def get_weather(city, api_key=None):
+    """Returns OpenWeatherMap's current weather JSON for city."""
+    api_key = api_key or os.getenv("OPEN_WEATHER_API_KEY")
+    response = await http_get(f"{backend.OPEN_WEATHER_URL}?q={city}&appid={api_key}&units=metric")
+    return response.json()
+
+# --- Image Captioning ---
+
+async def upload_image_to_imgbb(image_path, api_key=None):
+    """Upload a local image to imgbb.com and get a public URL."""
+    if not api_key:
+        print("Error: IMG_BB_API_KEY is required to upload images.")
+        return None
+    try:
+        with open(image_path, 'rb') as img_file:
+            image = img_file.read()
+        response = await http_client().post(
+            backend.IMG_BB_UPLOAD_URL,
+            data={'key': api_key},
+            files={'image': (os.path.basename(image_path), image)})
+        if response.status_code == 200:
+            return response.json()['data']['url']
+        else:
+            print("Error uploading image:", response.json())
+            return None
+    except Exception as e:
+        print(f"Error uploading image: {e}")
+        return None
+
+async def describe_image_with_blip(image_url):
+    """Generate description using Replicate."""
+    try:
+        # Simulating a description from an image URL, as backend.describe_image_with_blip does
+        if os.path.exists(image_url):
+            img = Image.open(image_url)
+        else:
+            response = await http_get(image_url)
+            img = Image.open(BytesIO(response.content))
+        description = "This is a sample description for the selected image."
+        return description
+    except Exception as e:
+        print(f"Error analyzing the image: {e}")
+        return "Sorry, I couldn't analyze the image."
+
+async def get_image_description(image_path, session=None):
+    """
+    Uploads (when imgbb is configured), describes and speaks an image chosen with
+    backend.select_local_image(); the file dialog itself must stay on the Tk main thread.
+    """
+    if not image_path:
+        await speak_text("No image was selected.", lang='en', session=session)
+        return None
+    print(f"Image selected: {image_path}")
+    if backend.IMG_BB_API_KEY:
+        print("Uploading image to get public URL...")
+        with tracing.span("image_upload"):
+            image_url = await upload_image_to_imgbb(image_path, backend.IMG_BB_API_KEY)
+        if not image_url:
+            await speak_text("Failed to upload the image for analysis.", lang='en', session=session)
+            return None
+        print(f"Image uploaded successfully: {image_url}")
+    else:
+        await speak_text("Image upload is not configured. Analyzing locally.", lang='en', session=session)
+        image_url = image_path
+    with tracing.span("image_describe"):
+        description = await describe_image_with_blip(image_url)
+    print("Image Description:", description)
+    await speak_text(description, session=session)
+    return description
+
+# --- Image Generation ---
+
+async def run_replicate(model, model_input):
+    """replicate.async_run where the installed client has it, else replicate.run on the default executor."""
+    async_run = getattr(replicate, "async_run", None)
+    if async_run is not None:
+        return await async_run(model, input=model_input)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: replicate.run(model, input=model_input))
+
+async def generate_image(prompt):
+    """Generates an image based on the given prompt using Replicate."""
+    try:
+        output = await run_replicate(backend.SDXL_MODEL, {"prompt": prompt})
+        if output:
+            print("Generated Image URL:", output[0])
+            return output[0]
+        else:
+            print("No output generated.")
+            return None
+    except Exception as e:
+        print(f"Image generation failed: {e}")
+        return None
+
+async def show_generated_image(url):
+    """Displays the generated image from a URL."""
+    try:
+        response = await http_get(str(url))
+        img = Image.open(BytesIO(response.content))
+        img.show()
+    except Exception as e:
+        print(f"Couldn't display image: {e}")
+
+async def handle_image_generation(user_input, session=None):
+    """Handles the image generation process; returns the image URL or None."""
+    print("Aura: Generating image, please wait...")
+    try:
+        with tracing.span("image_generate"):
+            output_url = await run_replicate(backend.SDXL_MODEL, {
+                "prompt": user_input,
+                "num_outputs": 1,  # 1 image
+                "width": 1024,
+                "height": 1024,
+                "guidance_scale": 7.5,
+                "num_inference_steps": 30
+            })
+        if output_url:
+            print(f"Aura: Image generated successfully! Here is the URL:\n{output_url[0]}")
+            await speak_text("Here’s the image I created based on your prompt.", lang="en", session=session)
+            with tracing.span("image_show"):
+                await show_generated_image(output_url[0])
+            return str(output_url[0])
+        print("Aura: Failed to generate the image.")
+        await speak_text("Sorry, I couldn't generate the image.", lang="en", session=session)
+    except Exception as e:
+        print(f"Image generation failed: {e}")
+        print("Aura: Failed to generate the image.")
+        await speak_text("Sorry, I encountered an error during image generation.", lang='en', session=session)
+    return None
+
+# --- Speech ---
+
+def play_clip(audio, cancel_token=None):
+    """Queues a clip on the shared audio output; returns an asyncio future resolved when it ends."""
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+
+    def on_done(utterance):
+        loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(utterance))
+
+    backend.play_audio(audio, on_done=on_done, owner=cancel_token)
+    return finished
+
+async def speak_text(text, lang='en', wait=True, cancel_token=None, session=None):
+    """
+    Async counterpart of backend.speak_text. Sentences are synthesized in parallel on
+    backend's TTS pool and queued in order; with wait, returns once playback has ended.
+    """
+    if not (session if session is not None else backend.default_session).speak_enabled:
+        print(f"(Aura speaking disabled): {text}")
+        return None
+    if cancel_token is not None and cancel_token.cancelled:
+        return None
+    loop = asyncio.get_running_loop()
+    futures = []
+    last_clip = None
+    try:
+        async with _speech_lock:
+            phrase_audio = backend.phrase_bank.get(text, lang)
+            if phrase_audio is not None:
+                last_clip = play_clip(phrase_audio, cancel_token)
+            else:
+                futures = [loop.run_in_executor(backend.tts_executor, tracing.bind(backend.synthesize_chunk, "tts_queue"),
+                                                chunk, lang)
+                           for chunk in backend.split_into_sentences(text)]
+            if cancel_token is not None:
+                cancel_token.on_cancel(lambda: loop.call_soon_threadsafe(lambda: [f.cancel() for f in futures]))
+                cancel_token.on_cancel(lambda: backend.audio_output.stop(owner=cancel_token))
+
+            for future in futures:
+                audio = await future
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+                last_clip = play_clip(audio, cancel_token)
+
+        if wait and last_clip is not None:
+            await last_clip  # A cancelled turn's clips are finished as stopped by the audio thread
+
+    except asyncio.CancelledError:
+        for future in futures:
+            future.cancel()
+        if cancel_token is None or not cancel_token.cancelled:
+            raise  # The task itself was cancelled, not just this turn's synthesis
+    except Exception as e:
+        print(f"Error speaking text: {e}")
+        for future in futures:
+            future.cancel()
+
+    return last_clip.result() if last_clip is not None and last_clip.done() else None
+
+# --- LLM Replies ---
+
+async def wait_for_flight(flight, cancel_token=None):
+    """Waits for the (main_response, follow_up) of an identical in-flight request."""
+    started = time.monotonic()
+    waiting = asyncio.wrap_future(flight)
+    while True:
+        done, _ = await asyncio.wait({waiting}, timeout=0.1)
+        if done:
+            tracing.add_span("flight_wait", started)
+            return waiting.result() or (None, None)
+        if cancel_token is not None and cancel_token.cancelled:
+            tracing.add_span("flight_wait", started, ok=False)
+            return None, None
+
+async def get_ai_response(user_input, lang_code='en', cancel_token=None, session=None):
+    """
+    Async counterpart of backend.get_ai_response; shares its caches and in-flight requests.
+    Returns (None, None) if cancel_token is cancelled before the reply is complete.
+    """
+    session = session if session is not None else backend.default_session
+    flight_key = backend.llm_flight_key(user_input, lang_code, session)
+    flight, leader = backend.single_flight.claim(flight_key)
+    if not leader:
+        return await wait_for_flight(flight, cancel_token)
+    reply = (None, None)
+    try:
+        reply = await request_ai_response(user_input, lang_code, cancel_token, session)
+    finally:
+        backend.single_flight.finish(flight_key, flight, reply)
+    return reply
+
+async def request_ai_response(user_input, lang_code, cancel_token, session):
+    """Sends one reply request (or answers from the caches) and records the result in the session."""
+    model, started = None, None
+    try:
+        plan = await run_blocking(backend.prepare_reply, user_input, lang_code, session)
+        model = plan.model
+        if plan.cached:
+            main_response, follow_up = plan.cached
+            await run_blocking(backend.finish_reply, user_input, lang_code, plan, main_response, follow_up, session)
+            return main_response, follow_up
+
+        started = time.monotonic()
+        response = await llm.complete(
+            model,
+            plan.messages,
+            cancel_token=cancel_token,
+            temperature=0.7,
+            max_tokens=backend.MAX_REPLY_TOKENS,
+        )
+        backend.record_llm_call(model, started)
+        ai_full_response = response.choices[0].message.content.strip()
+
+        main_response, follow_up = backend.split_response_and_followup(ai_full_response)
+        await run_blocking(backend.finish_reply, user_input, lang_code, plan, main_response, follow_up, session,
+                           getattr(response, "usage", None))
+        return main_response, follow_up
+
+    except TurnCancelled as e:
+        print(f"[Turn] Reply abandoned ({e})")
+        return None, None
+
+    except Exception as e:
+        backend.fail_reply(e, session, model, started)
+        await speak_text(backend.REPLY_ERROR, lang='en', session=session)
+        return None, None
+
+async def stream_ai_response(user_input, lang_code='en', cancel_token=None, session=None):
+    """
+    Async counterpart of backend.stream_ai_response: yields ("response" | "follow_up", text)
+    pieces as tokens arrive and updates the session's history once the reply is complete.
+    """
+    session = session if session is not None else backend.default_session
+    flight_key = backend.llm_flight_key(user_input, lang_code, session)
+    flight, leader = backend.single_flight.claim(flight_key)
+    if not leader:
+        main_response, follow_up = await wait_for_flight(flight, cancel_token)
+        if main_response:
+            yield "response", main_response
+        if follow_up:
+            yield "follow_up", follow_up
+        return
+    reply = (None, None)
+    try:
+        async for kind, piece in request_ai_stream(user_input, lang_code, cancel_token, session):
+            if kind == "reply":
+                reply = piece
+            else:
+                yield kind, piece
+    finally:
+        backend.single_flight.finish(flight_key, flight, reply)
+
+async def request_ai_stream(user_input, lang_code, cancel_token, session):
+    """Streams one reply (or the cached one), ending with ("reply", (main_response, follow_up)) when complete."""
+    splitter = backend.FollowUpStreamSplitter()
+    model, started = None, None
+    try:
+        plan = await run_blocking(backend.prepare_reply, user_input, lang_code, session)
+        model = plan.model
+        if plan.cached:
+            main_response, follow_up = plan.cached
+            yield "response", main_response
+            if follow_up:
+                yield "follow_up", follow_up
+            await run_blocking(backend.finish_reply, user_input, lang_code, plan, main_response, follow_up, session)
+            yield "reply", (main_response, follow_up)
+            return
+
+        started = time.monotonic()
+        usage = None
+        first_token = True
+        async for chunk in llm.stream(model, plan.messages, cancel_token=cancel_token, temperature=0.7,
+                                      max_tokens=backend.MAX_REPLY_TOKENS):
+            # Groq reports token usage on the final chunk
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token:
+                    first_token = False
+                    tracing.add_span("llm_first_token", started, model=model)
+                for piece in splitter.feed(delta):
+                    yield piece
+        for piece in splitter.close():
+            yield piece
+        backend.record_llm_call(model, started, stream=True)
+
+        main_response, follow_up = splitter.result()
+        await run_blocking(backend.finish_reply, user_input, lang_code, plan, main_response, follow_up, session, usage)
+        yield "reply", (main_response, follow_up)
+
+    except TurnCancelled as e:
+        print(f"[Turn] Reply abandoned ({e})")
+
+    except Exception as e:
+        backend.fail_reply(e, session, model, started, stream=True)
+        await speak_text(backend.REPLY_ERROR, lang='en', session=session)
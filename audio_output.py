@@ -0,0 +1,213 @@
+import queue
+import threading
+import time
+from collections import deque
+from io import BytesIO
+
+import pygame
+
+# --- Audio Output Engine ---
+# A single long-lived thread owns the pygame mixer. Clips (usually in-memory
+# mp3 or wav bytes) are decoded into pygame Sounds and played on one reserved
+# channel; the next clip is queued on the channel while the current one plays,
+# so sentences follow each other without gaps. Completion is tracked from each
+# clip's known length instead of polling get_busy(). Clips may carry an owner
+# (a turn's CancelToken); once the owner is cancelled its clips are skipped,
+# and if one is playing the channel is silenced. If the audio device cannot
+# be opened, every clip fails at once with that error until reopen().
+
+SPEECH_CHANNEL = 0
+
+
+class Utterance:
+    """A clip queued for playback. wait() blocks until it has finished or was stopped."""
+
+    def __init__(self, source, on_done=None, owner=None):
+        self.source = source      # Audio bytes, a file-like object or a file path
+        self.on_done = on_done    # Called with the utterance from the audio thread; keep it short
+        self.owner = owner        # Anything with a .cancelled flag, e.g. a CancelToken
+        self.done = threading.Event()
+        self.stopped = False
+        self.error = None
+        self.queued_at = time.monotonic()
+        self.start_time = None    # time.monotonic() values, set once the clip is on the channel
+        self.end_time = None
+
+    def wait(self, timeout=None):
+        """Waits for playback to end; returns False if the timeout expired first."""
+        return self.done.wait(timeout)
+
+    @property
+    def cancelled(self):
+        return self.owner is not None and self.owner.cancelled
+
+
+class AudioOutput:
+    """Long-lived playback service shared by every part of Aura that speaks."""
+
+    _WAKE = object()      # Queue marker that just wakes the audio thread
+    _SHUTDOWN = object()
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._stop_requested = False
+        self._error = None    # Why the audio device could not be opened; set until reopen()
+        self._thread = None
+
+    def start(self):
+        """Starts the audio thread if it is not running yet (and the device has not failed)."""
+        with self._lock:
+            if self._error is None and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="aura-audio", daemon=True)
+                self._thread.start()
+
+    def reopen(self):
+        """Retries opening the audio device after it failed."""
+        with self._lock:
+            self._error = None
+        self.start()
+
+    def play(self, source, on_done=None, owner=None):
+        """Queues a clip after everything already queued and returns its Utterance."""
+        self.start()
+        utterance = Utterance(source, on_done, owner)
+        with self._lock:
+            error = self._error
+            if error is None:
+                self._queue.put(utterance)
+        if error is not None:
+            self._finish(utterance, error=error)  # No audio device; fail now rather than never finish
+        return utterance
+
+    def stop(self, owner=None):
+        """
+        Drops all queued clips and silences the one currently playing.
+        With an owner that has been cancelled, only that owner's clips are affected
+        (a clip of another owner already handed to the channel is cut as well).
+        """
+        if owner is not None:
+            self._queue.put(self._WAKE)
+            self._wake.set()
+            return
+        self._drain_queue()
+        with self._lock:
+            self._stop_requested = True
+        self._queue.put(self._WAKE)
+        self._wake.set()
+
+    def shutdown(self):
+        """Stops playback, closes the audio device and ends the audio thread."""
+        self.stop()
+        self._queue.put(self._SHUTDOWN)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _drain_queue(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, Utterance):
+                self._finish(item, stopped=True)
+            elif item is self._SHUTDOWN:
+                self._queue.put(item)
+                return
+
+    def _finish(self, utterance, stopped=False, error=None):
+        utterance.stopped = stopped
+        utterance.error = error
+        utterance.done.set()
+        if utterance.on_done:
+            try:
+                utterance.on_done(utterance)
+            except Exception as e:
+                print(f"Error in audio completion callback: {e}")
+
+    def _run(self):
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            pygame.mixer.set_reserved(SPEECH_CHANNEL + 1)
+            channel = pygame.mixer.Channel(SPEECH_CHANNEL)
+        except Exception as e:
+            print(f"Error opening audio device: {e}")
+            self._fail_all(e)
+            return
+
+        playing = deque()  # Utterances handed to the channel, oldest first
+        while True:
+            with self._lock:
+                stop_requested = self._stop_requested
+                self._stop_requested = False
+            if stop_requested or any(u.cancelled for u in playing):
+                channel.stop()
+                while playing:
+                    self._finish(playing.popleft(), stopped=True)
+
+            now = time.monotonic()
+            while playing and playing[0].end_time <= now:
+                self._finish(playing.popleft())
+
+            # The channel holds one playing and one queued sound; wait for a slot
+            if len(playing) >= 2:
+                self._wake.wait(playing[0].end_time - now)
+                self._wake.clear()
+                continue
+
+            timeout = playing[0].end_time - now if playing else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is self._WAKE:
+                continue
+            if item is self._SHUTDOWN:
+                break
+            if item.cancelled:
+                self._finish(item, stopped=True)
+                continue
+
+            try:
+                sound = self._load(item.source)
+            except Exception as e:
+                print(f"Error loading audio: {e}")
+                self._finish(item, error=e)
+                continue
+
+            now = time.monotonic()
+            while playing and playing[0].end_time <= now:
+                self._finish(playing.popleft())
+            if playing:
+                channel.queue(sound)
+                start_time = playing[-1].end_time
+            else:
+                channel.play(sound)
+                start_time = now
+            item.start_time = start_time
+            item.end_time = start_time + sound.get_length()
+            playing.append(item)
+
+        channel.stop()
+        while playing:
+            self._finish(playing.popleft(), stopped=True)
+        pygame.mixer.quit()
+
+    def _load(self, source):
+        """Decodes a clip from bytes, a file-like object or a path."""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = BytesIO(source)
+        return pygame.mixer.Sound(file=source)
+
+    def _fail_all(self, error):
+        with self._lock:
+            self._error = error  # play() finishes new clips itself from now on
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, Utterance):
+                self._finish(item, error=error)
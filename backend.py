@@ -1,7 +1,6 @@
 import speech_recognition as sr
 from groq import Groq
 import playsound
-from gtts import gTTS
 import random
 import os
 from langdetect import detect, LangDetectException
@@ -10,7 +9,6 @@ import tkinter as tk
 from tkinter import filedialog
 from fpdf import FPDF
 import re
-import pygame
 import time
 import replicate
 from PIL import Image
@@ -18,31 +16,104 @@ import requests
 from io import BytesIO
 from dotenv import load_dotenv
 import json
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeout
+from audio_output import AudioOutput
+from tts_cache import TTSCache, cache_key, sweep_stale_audio
+from tts_backends import TTSSelector, GTTSBackend, EspeakBackend, Pyttsx3Backend, parse_preferences
+from phrase_bank import PhraseBank
+from mic_stream import MicrophoneStream
+from stt import create_stt_engine
+from context_window import ContextWindow
+from summarizer import RollingSummarizer, STATE_FILE
+from response_cache import ResponseCache, response_cache_key, normalize_prompt, CONTEXT_MESSAGES as CACHE_CONTEXT_MESSAGES
+from semantic_cache import SemanticCache, is_standalone, SIMILARITY_THRESHOLD
+from memory_index import MemoryIndex, exchange_text
+from model_router import ModelRouter, STRONG_MODEL, FAST_MODEL
+from llm_client import HedgedLLM
+from rate_limiter import RateLimiter
+from cancellation import TurnCancelled
+from singleflight import SingleFlight
+from session import Session
+import tracing
 load_dotenv()
 
+# Missing keys only disable the features that need them, so the module still imports (tests, load runs)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     print("Error: GROQ_API_KEY not set. Please set the key in your environment variables or .env file.")
-    exit()
 
 REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN")
 if not REPLICATE_API_TOKEN:
     print("Error: REPLICATE_API_TOKEN not set. Please set the key in your environment variables or .env file.")
-    exit()
-os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_TOKEN  # Ensure it's set for replicate library
+else:
+    os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_TOKEN  # Ensure it's set for replicate library
 
 IMG_BB_API_KEY = os.getenv("IMG_BB_API_KEY")
 if not IMG_BB_API_KEY:
     print("Warning: IMG_BB_API_KEY not set. Image upload functionality might be limited.")
 
-client = Groq(api_key=GROQ_API_KEY)
+# Service endpoints; overridden to point at local stand-ins (fake_services.py) in load tests.
+# Groq and Replicate read GROQ_BASE_URL and REPLICATE_BASE_URL themselves.
+IMG_BB_UPLOAD_URL = os.getenv("IMG_BB_UPLOAD_URL", "https://api.imgbb.com/1/upload")
+OPEN_WEATHER_URL = os.getenv("OPEN_WEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")
+
+client = Groq(api_key=GROQ_API_KEY or "unset") # Requests fail with an authentication error until the key is set
 r = sr.Recognizer()
+# Speech-to-text engine: "auto" (Google with offline fallback), "google", "sphinx" or "vosk"
+stt_engine = create_stt_engine(os.getenv("AURA_STT_ENGINE", "auto"), r)
 
 # --- Global Settings ---
-interaction_mode = None
-speak_enabled = None
-conversation_history = []
-last_generated_text = None
+# Per-conversation state (history, speak/interaction settings, turns) lives in Session objects below;
+# everything here is shared by all sessions and safe to use from any thread.
+
+# Identical LLM, TTS and HTTP calls already in flight are shared instead of repeated
+single_flight = SingleFlight()
+
+MAX_REPLY_TOKENS = 1024
+
+# All Groq calls share one request/token quota and queue by priority instead of failing on 429s
+rate_limiter = RateLimiter(
+    requests_per_minute=int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+    tokens_per_minute=int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000")),
+)
+# Simple turns go to llama3-8b, reasoning-heavy ones to llama3-70b; AURA_MODEL pins one model
+model_router = ModelRouter(forced_model=os.getenv("AURA_MODEL"))
+# Groq calls get a deadline; slow 70b requests are hedged with an 8b request after their p95 latency
+llm = HedgedLLM(client, hedge_models={STRONG_MODEL: FAST_MODEL}, limiter=rate_limiter)
+
+# Past exchanges are indexed so relevant ones can be recalled in later sessions
+memory_index = MemoryIndex()
+
+# Repeated questions are answered from a persistent exact-match cache
+response_cache = ResponseCache()
+# Stand-alone questions that are worded differently are matched by embedding similarity
+semantic_cache = SemanticCache(threshold=float(os.getenv("AURA_SEMANTIC_CACHE_THRESHOLD", SIMILARITY_THRESHOLD)))
+
+# Each turn's stage timings go to a rotating JSONL file (AURA_TRACING=0 keeps them in memory only)
+tracer = tracing.Tracer(os.getenv("AURA_TRACE_FILE", tracing.TRACE_FILE), enabled=os.getenv("AURA_TRACING", "1") != "0")
+
+# --- Sessions ---
+SESSION_DIR = "sessions"  # Rolling summary and history of each non-local session
+# Overlapping turns within a session: "supersede" (a new message cancels the running reply), "queue" or "parallel"
+TURN_POLICY = os.getenv("AURA_TURN_POLICY", "supersede")
+
+def create_session(session_id=None, state_path=None, resume=False, turn_policy=TURN_POLICY, **settings):
+    """
+    Creates a conversation session with its own rolling summary, persisted to state_path
+    (by default sessions/<session id>.json). With resume, the saved history is loaded.
+    """
+    session = Session(session_id, turn_policy=turn_policy, **settings)
+    if state_path is None:
+        os.makedirs(SESSION_DIR, exist_ok=True)
+        state_path = os.path.join(SESSION_DIR, f"{session.session_id}.json")
+    # Old turns are folded into a running summary by a cheaper model in the background
+    session.summarizer = RollingSummarizer(client, state_path=state_path, limiter=rate_limiter)
+    if resume:
+        session.replace_history(session.summarizer.load()) # Continue the previous conversation
+    return session
+
+# The local user's conversation, held by the desktop GUI and the console loop
+default_session = create_session("local", state_path=STATE_FILE, resume=os.getenv("AURA_RESUME_CONVERSATION") == "1")
 
 # --- Dynamic Greetings ---
 GREETINGS = [
@@ -53,8 +124,47 @@ GREETINGS = [
     "Good to see you! How can I help?",
 ]
 
+# Languages Aura speaks in (see detect_language)
+SUPPORTED_LANGS = ["en", "hi"]
+
+# Fixed phrases spoken by Aura itself (backend and GUI); their audio is kept cached
+SYSTEM_PHRASES = GREETINGS + [
+    "Sorry, I didn't hear anything.",
+    "Sorry, I didn't quite catch that.",
+    "Sorry, I didn't catch that.",
+    "Sorry, my speech service is currently unavailable.",
+    "Sorry, an error occurred while trying to listen.",
+    "Sorry, I encountered an error trying to process that request.",
+    "Sorry, I couldn't generate a response.",
+    "Sorry, I'm not sure how to handle that specific request.",
+    "There doesn't seem to be anything to save.",
+    "There doesn't seem to be a recent response for me to save.",
+    "Okay, where would you like to save the PDF?",
+    "I've saved the draft as a PDF.",
+    "Okay, I didn't save the draft.",
+    "Sorry, I'm missing some tools needed to save PDFs.",
+    "Sorry, I encountered an error while trying to save the PDF.",
+    "Chat history saved.",
+    "Error saving chat history.",
+    "Chat history loaded.",
+    "Error loading chat history.",
+    "Failed to upload the image for analysis.",
+    "Image upload is not configured. Analyzing locally.",
+    "No image was selected.",
+    "Here’s the image I created based on your prompt.",
+    "Sorry, I couldn't generate the image.",
+    "Sorry, I encountered an error during image generation.",
+    "Listening activated. Say something!",
+    "Listening stopped.",
+    "Goodbye! Have a great day.",
+]
+
 # --- Core Functions ---
 
+def http_get(url, **kwargs):
+    """requests.get that shares one response between identical concurrent requests for url."""
+    return single_flight.do(("http", url), requests.get, url, **kwargs)
+
 # --- Image Captioning ---
 
 def upload_image_to_imgbb(image_path, api_key=None):
@@ -65,7 +175,7 @@ def upload_image_to_imgbb(image_path, api_key=None):
     try:
         with open(image_path, 'rb') as img_file:
             response = requests.post(
-                'https://api.imgbb.com/1/upload', 
+                IMG_BB_UPLOAD_URL, 
                 data={'key': api_key}, 
                 files={'image': img_file})
         if response.status_code == 200:
@@ -81,7 +191,7 @@ def describe_image_with_blip(image_url):
     """Generate description using Replicate."""
     try:
         # Simulating a description from an image URL (you would replace this with an actual API call)
-        response = requests.get(image_url)
+        response = http_get(image_url)
         img = Image.open(BytesIO(response.content))
         description = "This is a sample description for the selected image."
         return description
@@ -133,11 +243,13 @@ def get_image_description():
 
 # --- Image Generation ---
 
+SDXL_MODEL = "stability-ai/sdxl:db21e45a3d465e36eaa1a02a7585e8b5c4e1eeb26e245cd72c3b70d3b9b5b9d4"
+
 def generate_image(prompt):
     """Generates an image based on the given prompt using Replicate."""
     try:
         output = replicate.run(
-            "stability-ai/sdxl:db21e45a3d465e36eaa1a02a7585e8b5c4e1eeb26e245cd72c3b70d3b9b5b9d4",
+            SDXL_MODEL,
             input={"prompt": prompt}
         )
         if output:
@@ -153,7 +265,7 @@ def generate_image(prompt):
 def show_generated_image(url):
     """Displays the generated image from a URL."""
     try:
-        response = requests.get(url)
+        response = http_get(url)
         img = Image.open(BytesIO(response.content))
         img.show()
     except Exception as e:
@@ -169,7 +281,7 @@ def handle_image_generation(user_input):
     print("Aura: Generating image, please wait...")
     try:
         output_url = replicate.run(
-            "stability-ai/sdxl:db21e45a3d465e36eaa1a02a7585e8b5c4e1eeb26e245cd72c3b70d3b9b5b9d4",
+            SDXL_MODEL,
             input={
                 "prompt": user_input,
                 "num_outputs": 1,  # 1 image
@@ -191,70 +303,200 @@ def handle_image_generation(user_input):
         print("Aura: Failed to generate the image.")
         speak_text("Sorry, I encountered an error during image generation.", lang='en')
 
-# --- Speak Function Using GTTS---
-
-def speak_text(text, lang='en'):
-    """Speaks the given text using GTTS and plays it with pygame."""
-    if not speak_enabled:
+# --- Speak Function (pluggable TTS backends) ---
+
+TTS_WORKERS = 3           # Sentences synthesized in parallel
+TTS_MAX_CHUNK_CHARS = 200 # Long sentences are split further at commas/spaces
+TTS_MIN_CHUNK_CHARS = 20  # Tiny fragments are merged into their neighbour
+
+tts_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="aura-tts")
+speech_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aura-speech")  # Keeps async requests in order
+audio_output = AudioOutput()
+# TTS backends in default preference order; AURA_TTS_ENGINES overrides it per language,
+# e.g. "en:gtts,espeak;hi:espeak"
+tts_selector = TTSSelector(
+    [GTTSBackend(), EspeakBackend(), Pyttsx3Backend()],
+    parse_preferences(os.getenv("AURA_TTS_ENGINES")),
+)
+
+def tts_cache_key(engine, text, lang):
+    return cache_key(text, lang, engine=engine.name, **engine.voice)
+
+def system_phrase_keys():
+    """Cache keys of the fixed system phrases for every language and backend."""
+    return [tts_cache_key(engine, phrase, lang)
+            for phrase in SYSTEM_PHRASES for lang in SUPPORTED_LANGS for engine in tts_selector.backends]
+
+tts_cache = TTSCache(pinned=system_phrase_keys())  # Pinned before the startup sweep evicts anything
+sweep_stale_audio()  # Clean up per-reply mp3s left over from older versions
+
+def split_into_sentences(text, max_chars=TTS_MAX_CHUNK_CHARS, min_chars=TTS_MIN_CHUNK_CHARS):
+    """Splits text into sentence-sized chunks for incremental synthesis."""
+    sentences = [part.strip() for part in re.split(r"(?<=[.!?।])\s+|\n+", text) if part.strip()]
+
+    chunks = []
+    for sentence in sentences:
+        # Break overly long sentences at the last comma or space before the limit
+        while len(sentence) > max_chars:
+            cut = max(sentence.rfind(", ", 0, max_chars), sentence.rfind(" ", 0, max_chars))
+            if cut <= 0:
+                cut = max_chars
+            chunks.append(sentence[:cut + 1].strip())
+            sentence = sentence[cut + 1:].strip()
+        if not sentence:
+            continue
+        # Merge very short fragments ("Sure.", "Yes!") so each request carries useful audio
+        if chunks and len(chunks[-1]) < min_chars and len(chunks[-1]) + len(sentence) < max_chars:
+            chunks[-1] = f"{chunks[-1]} {sentence}"
+        else:
+            chunks.append(sentence)
+    return chunks
+
+def synthesize_chunk(text, lang='en'):
+    """Returns audio bytes for one chunk; identical chunks being synthesized right now are shared."""
+    return single_flight.do(("tts", text, lang), render_chunk, text, lang)
+
+def render_chunk(text, lang='en'):
+    """Returns audio bytes for one chunk, synthesizing only when no usable backend has it cached."""
+    started = time.monotonic()
+    candidates = tts_selector.candidates(lang)
+    for engine in candidates:
+        audio = tts_cache.get(tts_cache_key(engine, text, lang))
+        if audio is not None:
+            tracing.add_span("tts_synthesis", started, engine=engine.name, chars=len(text), cached=True)
+            return audio
+    with tracing.span("tts_synthesis", chars=len(text), cached=False):
+        engine, audio = tts_selector.synthesize(text, lang)
+    tts_cache.put(tts_cache_key(engine, text, lang), audio)
+    return audio
+
+def get_tts_stats():
+    """Returns measured synthesis latency per language and backend."""
+    return tts_selector.latency_report()
+
+phrase_bank = PhraseBank(SYSTEM_PHRASES, SUPPORTED_LANGS, synthesize_chunk) # Short phrases are rendered whole
+phrase_bank.warm()  # Pre-render fixed phrases in the background
+
+def speak_text(text, lang='en', wait=True, cancel_token=None, session=None):
+    """
+    Speaks the given text with the selected TTS backend and plays it through the shared audio output.
+    The text is split into sentences that are synthesized in parallel and queued
+    strictly in order, so playback starts as soon as the first sentence is ready.
+    If cancel_token is cancelled, pending synthesis is dropped and playback stops.
+    Nothing is spoken unless speaking is enabled for the session (default: the local one).
+    Returns the Utterance of the last sentence (None if nothing was queued).
+    """
+    if not (session if session is not None else default_session).speak_enabled:
         print(f"(Aura speaking disabled): {text}")
-        return
+        return None
+    if cancel_token is not None and cancel_token.cancelled:
+        return None
+    futures = []
+    last_utterance = None
     try:
-        if not os.path.exists("temp_audio"):
-            os.makedirs("temp_audio")
-        file_name = f"temp_audio/response_{random.randint(10000, 99999)}.mp3"
-        tts = gTTS(text=text, lang=lang, slow = False)
-        tts.save(file_name)
-
-        pygame.mixer.init()
-        pygame.mixer.music.load(file_name)
-        pygame.mixer.music.play()
-
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.3)
-
-        pygame.mixer.quit()
-
-        try:
-            os.remove(file_name)
-        except Exception as e:
-            print(f"Failed to delete the file: {file_name}. Error: {e}")
-
+        # Fixed system phrases are already rendered and need no synthesis at all
+        phrase_audio = phrase_bank.get(text, lang)
+        if phrase_audio is not None:
+            last_utterance = play_audio(phrase_audio, owner=cancel_token)
+        else:
+            chunks = split_into_sentences(text)
+            futures = [tts_executor.submit(tracing.bind(synthesize_chunk, "tts_queue"), chunk, lang) for chunk in chunks]
+        if cancel_token is not None:
+            cancel_token.on_cancel(lambda: [future.cancel() for future in futures])
+            cancel_token.on_cancel(lambda: audio_output.stop(owner=cancel_token))
+
+        for future in futures:
+            audio = future.result()
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            last_utterance = play_audio(audio, owner=cancel_token)
+
+        if wait and last_utterance:
+            # A cancelled turn's clips are skipped by the audio thread; don't wait for it to get there
+            while not last_utterance.wait(0.1):
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+
+    except CancelledError:
+        pass  # Synthesis of a cancelled turn was dropped before it started
     except Exception as e:
         print(f"Error speaking text: {e}")
-
-def record_audio(ask=""):
+        for future in futures:
+            future.cancel()
+
+    return last_utterance
+
+def speak_text_async(text, lang='en', cancel_token=None, session=None):
+    """Speaks text without blocking the caller; the returned Future resolves once playback ends."""
+    return speech_executor.submit(tracing.bind(speak_text, "speech_queue"), text, lang, True, cancel_token, session)
+
+def play_audio(audio, on_done=None, owner=None):
+    """audio_output.play() that records the clip's wait in the playback queue and its playback in the current trace."""
+    trace = tracing.current_trace()
+    if trace is None:
+        return audio_output.play(audio, on_done=on_done, owner=owner)
+
+    def finished(utterance):
+        # Runs on the audio thread, which has no current trace
+        if utterance.start_time is not None:
+            trace.add_span("playback_queue", utterance.queued_at, utterance.start_time)
+            trace.add_span("playback", utterance.start_time, min(time.monotonic(), utterance.end_time),
+                           ok=utterance.error is None, stopped=utterance.stopped)
+        if on_done:
+            on_done(utterance)
+    return audio_output.play(audio, on_done=finished, owner=owner)
+
+_mic_stream = None
+
+def get_microphone_stream():
+    """Returns the shared microphone stream, opening and calibrating it on first use."""
+    global _mic_stream
+    if _mic_stream is None:
+        _mic_stream = MicrophoneStream()
+        with tracing.span("mic_calibration"):
+            _mic_stream.start()
+    return _mic_stream
+
+def record_audio(ask="", session=None):
     """Records audio from the microphone and returns the recognized text."""
-    with sr.Microphone() as source:
-        r.adjust_for_ambient_noise(source, duration=0.5) # Adjust for noise
+    if ask:
+        # Use English for prompts asking for input
+        speak_text(ask, lang='en', session=session)
+        time.sleep(0.5) # Small delay after speaking
+
+    try:
+        source = get_microphone_stream() # Opened and calibrated once, then kept running
         print("Listening...") # User feedback
-        if ask:
-            # Use English for prompts asking for input
-            speak_text(ask, lang='en')
-            time.sleep(0.5) # Small delay after speaking
+        with tracing.span("listen"):
+            audio = source.listen(timeout=5) # The VAD ends the phrase; long utterances are no longer cut at 10 s
+        # print("Recognizing...") # Redundant if "You said:" follows
+        with tracing.span("stt", engine=stt_engine.name):
+            voice_data = stt_engine.transcribe(audio)
+        # Keep this print as it confirms what the assistant heard
+        print(f"You said: {voice_data}")
+        return voice_data.lower()
+    except sr.WaitTimeoutError:
+        # print("No speech detected within the time limit.") # User doesn't need this detail
+        speak_text("Sorry, I didn't hear anything.", lang='en', session=session)
+        return ""
+    except sr.UnknownValueError:
+        speak_text("Sorry, I didn't quite catch that.", lang='en', session=session)
+        return ""
+    except sr.RequestError:
+        # Inform user about connection issue
+        speak_text("Sorry, my speech service is currently unavailable.", lang='en', session=session)
+        return ""
+    except Exception as e:
+        # Generic error for unexpected issues during recording
+        print(f"An error occurred during recording: {e}")
+        speak_text("Sorry, an error occurred while trying to listen.", lang='en', session=session)
+        return ""
 
-        try:
-            audio = r.listen(source, timeout=5, phrase_time_limit=10)
-            # print("Recognizing...") # Redundant if "You said:" follows
-            voice_data = r.recognize_google(audio)
-            # Keep this print as it confirms what the assistant heard
-            print(f"You said: {voice_data}")
-            return voice_data.lower()
-        except sr.WaitTimeoutError:
-            # print("No speech detected within the time limit.") # User doesn't need this detail
-            speak_text("Sorry, I didn't hear anything.", lang='en')
-            return ""
-        except sr.UnknownValueError:
-            speak_text("Sorry, I didn't quite catch that.", lang='en')
-            return ""
-        except sr.RequestError:
-            # Inform user about connection issue
-            speak_text("Sorry, my speech service is currently unavailable.", lang='en')
-            return ""
-        except Exception as e:
-            # Generic error for unexpected issues during recording
-            print(f"An error occurred during recording: {e}")
-            speak_text("Sorry, an error occurred while trying to listen.", lang='en')
-            return ""
+def get_stt_stats():
+    """Returns latency stats of the speech-to-text engine(s) in use."""
+    if hasattr(stt_engine, "engine_stats"):
+        return stt_engine.engine_stats()
+    return {stt_engine.name: stt_engine.stats.snapshot()}
 
 def get_text_input(ask=""):
     """Gets text input from the user via the console."""
@@ -262,13 +504,15 @@ def get_text_input(ask=""):
         print(f"Aura: {ask}") # Use assistant name
     return input("You: ")
 
-def get_user_input(ask=""):
-    """Gets input from the user based on the interaction_mode."""
-    if interaction_mode == "voice":
-        return record_audio(ask)
+def get_user_input(ask="", session=None):
+    """Gets input from the user based on the session's interaction_mode."""
+    session = session if session is not None else default_session
+    if session.interaction_mode == "voice":
+        return record_audio(ask, session)
     else: # Assumes text mode
         return get_text_input(ask)
 
+@tracing.traced("detect_language")
 def detect_language(text):
     """Detects the language (primarily English or Hindi)."""
     try:
@@ -286,15 +530,6 @@ def detect_language(text):
         # Catch any other unexpected error during detection
         return 'en'
 
-def update_conversation_history(user_input, bot_response):
-    """Adds the user input and bot response to the conversation history."""
-    conversation_history.append({"role": "user", "content": user_input})
-    conversation_history.append({"role": "assistant", "content": bot_response})
-    # Optional: Limit history size
-    # max_history = 5  # Keep the last 5 turns
-    # if len(conversation_history) > max_history * 2:
-    #     conversation_history[:] = conversation_history[-(max_history * 2):]
-
 def split_response_and_followup(ai_reply):
     """
     Splits an AI reply into the main response and an optional follow-up question.
@@ -324,18 +559,88 @@ def split_response_and_followup(ai_reply):
     return main_response, follow_up
 
 
-def get_ai_response(user_input, lang_code='en'):
-    """Gets an AI response from Groq, considering conversation history."""
-    global last_generated_text # Allow updating the global variable
-    try:
-        model = "llama3-70b-8192" # Or "llama3-8b-8192"
+class FollowUpStreamSplitter:
+    """
+    Incremental counterpart of split_response_and_followup for streamed replies.
+    Feed it raw deltas; it returns ("response" | "follow_up", text) pieces that are
+    safe to show, holding back anything that could still turn into a "Follow-up:" label.
+    """
 
-        # Determine language instruction based on detected code (Simplified)
-        language_name = Language.get(lang_code).display_name() if lang_code == 'hi' else 'English'
-        language_instruction = f"Respond clearly and naturally in {language_name}."
+    FOLLOW_UP_LABEL = "follow-up:"
+    RESPONSE_LABEL = "response:"
+
+    def __init__(self):
+        self.text = ""
+        self._main_sent = 0
+        self._follow_up_sent = 0
+
+    def feed(self, delta):
+        """Adds a streamed delta and returns the newly displayable pieces."""
+        self.text += delta
+        return self._drain(final=False)
+
+    def close(self):
+        """Flushes whatever is still held back once the stream has ended."""
+        return self._drain(final=True)
+
+    def result(self):
+        """Returns (main_response, follow_up) for the full text seen so far."""
+        return split_response_and_followup(self.text)
+
+    def _drain(self, final):
+        pieces = []
+        follow_up_match = re.search(r"(?:^|\n)\s*Follow-up:", self.text, re.IGNORECASE)
+
+        if follow_up_match:
+            main_region = self.text[:follow_up_match.start()]
+            main_complete = True
+        else:
+            main_region = self._hold_back_label(self.text) if not final else self.text
+            main_complete = final
+
+        main_text = self._clean_main(main_region, main_complete)
+        if main_text is not None:
+            main_text = main_text.rstrip()  # Trailing whitespace is only sent once more text follows
+            if len(main_text) > self._main_sent:
+                pieces.append(("response", main_text[self._main_sent:]))
+                self._main_sent = len(main_text)
+
+        if follow_up_match:
+            follow_up = self.text[follow_up_match.end():].strip()
+            if len(follow_up) > self._follow_up_sent:
+                pieces.append(("follow_up", follow_up[self._follow_up_sent:]))
+                self._follow_up_sent = len(follow_up)
+
+        return pieces
+
+    def _hold_back_label(self, text):
+        """Cuts off a trailing line that might still become a "Follow-up:" label."""
+        last_newline = text.rfind("\n")
+        tail = text[last_newline + 1:].lstrip().lower()
+        if self.FOLLOW_UP_LABEL.startswith(tail):
+            return text[:last_newline] if last_newline != -1 else ""
+        return text
+
+    def _clean_main(self, main_region, complete):
+        """Strips the optional "Response:" prefix; returns None while it is still ambiguous."""
+        stripped = main_region.lstrip()
+        if not complete and self.RESPONSE_LABEL.startswith(stripped.lower()):
+            return None
+        return re.sub(r"^\s*Response:", "", main_region, count=1, flags=re.IGNORECASE).lstrip()
 
-        # Simplified system prompt (removed rules about labels as they are handled by split function)
-        system_prompt = f"""
+
+@tracing.traced("build_context")
+def build_messages(user_input, lang_code='en', model=STRONG_MODEL, session=None):
+    """
+    Builds the message list (system prompt, session history, new input) sent to Groq.
+    Returns (messages, stats) where stats describes the token budget used.
+    """
+    # Determine language instruction based on detected code (Simplified)
+    language_name = Language.get(lang_code).display_name() if lang_code == 'hi' else 'English'
+    language_instruction = f"Respond clearly and naturally in {language_name}."
+
+    # Simplified system prompt (removed rules about labels as they are handled by split function)
+    system_prompt = f"""
 You are Aura, a helpful, friendly, and concise AI assistant.
 {language_instruction}
 Keep the following conversation history in mind to provide relevant responses.
@@ -348,41 +653,321 @@ If user asks you to analyze images, then accept images directly by opening a dia
 If no follow-up is needed, just provide the response:
 Response: <your main response in the correct language/script>
 """
-        messages_to_send = [
-            {"role": "system", "content": system_prompt}
-        ] + conversation_history + [
-            {"role": "user", "content": user_input}
-        ]
-
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages_to_send,
+    # Older turns are represented by the rolling summary; fit the rest into the token budget
+    session = session if session is not None else default_session
+    summary_messages, recent_history = session_context(session)
+    # Relevant exchanges from earlier sessions, minus those already sent verbatim
+    memory_messages = []
+    if session.remember:
+        verbatim = {exchange_text(a["content"], b["content"]) for a, b in zip(recent_history, recent_history[1:])}
+        memory_messages = memory_index.prompt_context(user_input, exclude_texts=verbatim)
+    return ContextWindow(model, MAX_REPLY_TOKENS).build(
+        [{"role": "system", "content": system_prompt}] + memory_messages + summary_messages,
+        recent_history,
+        {"role": "user", "content": user_input},
+    )
+
+
+def session_context(session):
+    """Returns (summary messages, recent history) of a session; sessions without a summarizer send all history."""
+    history = session.history
+    if session.summarizer is None:
+        return [], history
+    return session.summarizer.prompt_context(history)
+
+
+def report_context_usage(stats, usage=None, session=None):
+    """Records and prints how many prompt tokens a request sent."""
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        stats["prompt_tokens"] = usage.prompt_tokens # Exact count reported by Groq
+    (session if session is not None else default_session).last_context_stats = stats
+    sent = stats.get("prompt_tokens", stats["estimated_prompt_tokens"])
+    print(f"[Context] {stats['model']}: sent {sent} prompt tokens "
+          f"({stats['history_messages_sent']}/{stats['history_messages_total']} history messages, "
+          f"budget {stats['budget_tokens']})")
+
+
+@tracing.traced("record_reply")
+def record_ai_reply(user_input, main_response, follow_up, session=None):
+    """Stores a finished reply in the session's history and as its last generated text."""
+    session = session if session is not None else default_session
+    # Update history and last generated text *only* if a main response exists
+    if main_response:
+        history = session.add_exchange(user_input, main_response, follow_up)
+        if session.summarizer is not None:
+            session.summarizer.save(history)
+            # Summarize old turns in the background, then save the history as it is by then
+            session.summarizer.maybe_fold(history, lambda: session.history)
+        if session.remember:
+            memory_index.add_exchange(user_input, main_response)
+    # If only a follow-up exists, don't overwrite last_generated_text
+
+
+def reply_cache_key(user_input, lang_code, model, session=None):
+    """Response cache key: the prompt plus the context its answer depends on (summary and last exchange)."""
+    summary_messages, recent_history = session_context(session if session is not None else default_session)
+    context = summary_messages + recent_history[-CACHE_CONTEXT_MESSAGES:]
+    return response_cache_key(user_input, lang_code, model, context)
+
+
+def get_single_flight_stats():
+    """Returns calls and coalesced hits per kind of call (llm, tts, http)."""
+    return single_flight.stats()
+
+
+def get_response_cache_stats():
+    """Returns hit/miss counters of the exact-match and semantic response caches."""
+    return {"exact": response_cache.stats(), "semantic": semantic_cache.stats()}
+
+
+def lookup_cached_reply(user_input, lang_code, model, session=None):
+    """
+    Returns (exact cache key, cached (main_response, follow_up) or None).
+    The exact-match cache is tried first; stand-alone questions then fall back to the semantic cache.
+    """
+    started = time.monotonic()
+    key = reply_cache_key(user_input, lang_code, model, session)
+    cached = response_cache.get(key)
+    hit = "exact" if cached is not None else None
+    if cached is None and is_standalone(user_input):
+        match = semantic_cache.lookup(user_input, lang_code, model)
+        if match:
+            main_response, follow_up, similarity = match
+            print(f"[Cache] Semantic hit (similarity {similarity:.2f})")
+            cached = main_response, follow_up
+            hit = "semantic"
+    tracing.add_span("cache_lookup", started, hit=hit)
+    return key, cached
+
+
+def store_reply_in_caches(key, user_input, lang_code, model, main_response, follow_up):
+    """Caches a fresh reply by exact key and, for stand-alone questions, by meaning."""
+    if not main_response:
+        return
+    response_cache.put(key, main_response, follow_up)
+    if is_standalone(user_input):
+        semantic_cache.add(user_input, lang_code, model, main_response, follow_up)
+
+
+# --- Reply Steps ---
+# Everything around the LLM call itself, shared by the sync request functions
+# below and their async counterparts. Every step here may block (SQLite,
+# index scans, state file writes), so async callers run them on an executor.
+
+REPLY_ERROR = "Sorry, I encountered an error trying to process that request."
+
+
+class ReplyPlan:
+    """A routed turn: its model, its exact cache key and either a cached reply or the prompt to send."""
+
+    def __init__(self, model, cache_key, cached=None, messages=None, context_stats=None):
+        self.model = model
+        self.cache_key = cache_key
+        self.cached = cached                # (main_response, follow_up) served from the caches
+        self.messages = messages
+        self.context_stats = context_stats
+
+
+def prepare_reply(user_input, lang_code, session):
+    """Routes the turn and looks it up in the caches; on a miss builds the prompt. Returns a ReplyPlan."""
+    model = model_router.route(user_input, session.session_id)
+    key, cached = lookup_cached_reply(user_input, lang_code, model, session)
+    if cached:
+        return ReplyPlan(model, key, cached)
+    messages, context_stats = build_messages(user_input, lang_code, model, session)
+    return ReplyPlan(model, key, None, messages, context_stats)
+
+
+def record_llm_call(model, started, ok=True, **attributes):
+    """Feeds the latency of an LLM call to the model router and the current trace."""
+    model_router.record(model, time.monotonic() - started, ok=ok)
+    tracing.add_span("llm", started, ok=ok, model=model, **attributes)
+
+
+def finish_reply(user_input, lang_code, plan, main_response, follow_up, session, usage=None):
+    """Records a reply in the session; a fresh one also reports its token usage and goes into the caches."""
+    if plan.cached is None:
+        report_context_usage(plan.context_stats, usage, session)
+    record_ai_reply(user_input, main_response, follow_up, session)
+    if plan.cached is None:
+        store_reply_in_caches(plan.cache_key, user_input, lang_code, plan.model, main_response, follow_up)
+
+
+def fail_reply(error, session, model=None, started=None, **attributes):
+    """Records a failed reply request; the caller then apologises aloud with REPLY_ERROR."""
+    if started is not None:
+        record_llm_call(model, started, ok=False, error=type(error).__name__, **attributes)
+    print(f"Aura: {REPLY_ERROR} ({error})")
+    session.last_generated_text = None # Clear last text on error
+
+
+def get_model_stats():
+    """Returns per-model routing counts, latency and re-ask rate, plus hedging counters."""
+    return {"routing": model_router.stats(), "requests": llm.stats(), "rate_limit": rate_limiter.stats()}
+
+
+def llm_flight_key(user_input, lang_code, session=None):
+    """Requests are identical if the session, normalized prompt, language and history are."""
+    session = session if session is not None else default_session
+    return ("llm", session.session_id, normalize_prompt(user_input), lang_code, len(session))
+
+
+def wait_for_flight(flight, cancel_token=None):
+    """Waits for the (main_response, follow_up) of an identical in-flight request."""
+    started = time.monotonic()
+    while True:
+        try:
+            reply = flight.result(timeout=0.1) or (None, None)
+            tracing.add_span("flight_wait", started)
+            return reply
+        except FutureTimeout:
+            if cancel_token is not None and cancel_token.cancelled:
+                tracing.add_span("flight_wait", started, ok=False)
+                return None, None
+
+
+def get_ai_response(user_input, lang_code='en', cancel_token=None, session=None):
+    """
+    Gets an AI response from Groq, considering the session's conversation history
+    (default: the local session).
+    A caller asking the same thing while it is being answered gets that answer.
+    Returns (None, None) if cancel_token is cancelled before the reply is complete.
+    """
+    session = session if session is not None else default_session
+    flight_key = llm_flight_key(user_input, lang_code, session)
+    flight, leader = single_flight.claim(flight_key)
+    if not leader:
+        return wait_for_flight(flight, cancel_token)
+    reply = (None, None)
+    try:
+        reply = request_ai_response(user_input, lang_code, cancel_token, session)
+    finally:
+        single_flight.finish(flight_key, flight, reply)
+    return reply
+
+
+def request_ai_response(user_input, lang_code, cancel_token, session):
+    """Sends one reply request (or answers from the caches) and records the result in the session."""
+    model, started = None, None
+    try:
+        plan = prepare_reply(user_input, lang_code, session)
+        model = plan.model
+        if plan.cached:
+            main_response, follow_up = plan.cached
+            finish_reply(user_input, lang_code, plan, main_response, follow_up, session)
+            return main_response, follow_up
+
+        started = time.monotonic()
+        response = llm.complete(
+            model,
+            plan.messages,
+            cancel_token=cancel_token,
             temperature=0.7,
-            max_tokens=1024,
+            max_tokens=MAX_REPLY_TOKENS,
         )
+        record_llm_call(model, started)
         ai_full_response = response.choices[0].message.content.strip()
 
         # Split response here
         main_response, follow_up = split_response_and_followup(ai_full_response)
-
-        # Update last generated text *only* if a main response exists
-        if main_response:
-            last_generated_text = main_response
-            update_conversation_history(user_input, main_response) # Update history on successful response
-            if follow_up:
-                update_conversation_history("Aura", follow_up) # Add Aura's follow-up to history
-        # If only a follow-up exists, don't overwrite last_generated_text
+        finish_reply(user_input, lang_code, plan, main_response, follow_up, session, getattr(response, "usage", None))
 
         return main_response, follow_up # Return split parts
 
+    except TurnCancelled as e:
+        print(f"[Turn] Reply abandoned ({e})")
+        return None, None
+
     except Exception as e:
-        # Provide minimal user feedback on AI error
-        print(f"Aura: Sorry, I encountered an error trying to process that request. ({e})")
+        fail_reply(e, session, model, started)
         # Speak the error in English as it's a system issue
-        speak_text("Sorry, I encountered an error trying to process that request.", lang='en')
-        last_generated_text = None # Clear last text on error
+        speak_text(REPLY_ERROR, lang='en', session=session)
         return None, None # Indicate error
 
+def stream_ai_response(user_input, lang_code='en', cancel_token=None, session=None):
+    """
+    Streaming variant of get_ai_response.
+    Yields ("response" | "follow_up", text) pieces as tokens arrive from Groq and
+    updates the session's history once the reply is complete. A cancelled
+    turn simply stops yielding and leaves the history untouched. A caller asking
+    the same thing while it is being answered receives the finished answer at once.
+    """
+    session = session if session is not None else default_session
+    flight_key = llm_flight_key(user_input, lang_code, session)
+    flight, leader = single_flight.claim(flight_key)
+    if not leader:
+        main_response, follow_up = wait_for_flight(flight, cancel_token)
+        if main_response:
+            yield "response", main_response
+        if follow_up:
+            yield "follow_up", follow_up
+        return
+    reply = None
+    try:
+        reply = yield from request_ai_stream(user_input, lang_code, cancel_token, session)
+    finally:
+        single_flight.finish(flight_key, flight, reply or (None, None))
+
+
+def request_ai_stream(user_input, lang_code, cancel_token, session):
+    """Streams one reply (or the cached one); returns (main_response, follow_up) when complete."""
+    splitter = FollowUpStreamSplitter()
+    model, started = None, None
+    try:
+        plan = prepare_reply(user_input, lang_code, session)
+        model = plan.model
+        if plan.cached:
+            main_response, follow_up = plan.cached
+            yield "response", main_response
+            if follow_up:
+                yield "follow_up", follow_up
+            finish_reply(user_input, lang_code, plan, main_response, follow_up, session)
+            return main_response, follow_up
+
+        started = time.monotonic()
+        usage = None
+        first_token = True
+        for chunk in llm.stream(model, plan.messages, cancel_token=cancel_token, temperature=0.7,
+                                max_tokens=MAX_REPLY_TOKENS):
+            # Groq reports token usage on the final chunk
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token:
+                    first_token = False
+                    tracing.add_span("llm_first_token", started, model=model)
+                yield from splitter.feed(delta)
+        yield from splitter.close()
+        record_llm_call(model, started, stream=True)
+
+        main_response, follow_up = splitter.result()
+        finish_reply(user_input, lang_code, plan, main_response, follow_up, session, usage)
+        return main_response, follow_up
+
+    except TurnCancelled as e:
+        print(f"[Turn] Reply abandoned ({e})")
+
+    except Exception as e:
+        fail_reply(e, session, model, started, stream=True)
+        speak_text(REPLY_ERROR, lang='en', session=session)
+
+def write_pdf(text, file_path):
+    """Writes text to a one-column PDF at file_path."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font("Arial", size=12)
+
+    try:
+        cleaned_text = text.encode('latin-1', 'replace').decode('latin-1')
+    except Exception:
+        cleaned_text = text
+
+    pdf.multi_cell(0, 10, cleaned_text)
+    pdf.output(file_path)
+
 def save_pdf_dialog(text, lang='en'):
     """Opens a save file dialog and saves the given text as a PDF."""
     if not text:
@@ -410,20 +995,7 @@ def save_pdf_dialog(text, lang='en'):
             if not file_path.endswith('.pdf'):
                 file_path += '.pdf'
 
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.set_font("Arial", size=12)
-
-            try:
-                cleaned_text = text.encode('latin-1', 'replace').decode('latin-1')
-            except Exception:
-                cleaned_text = text
-
-            print(f"Cleaned text: {cleaned_text}")  # Debugging cleaned text
-
-            pdf.multi_cell(0, 10, cleaned_text)
-            pdf.output(file_path)
+            write_pdf(text, file_path)
 
             speak_text("I've saved the draft as a PDF.", lang=lang)
 
@@ -438,6 +1010,7 @@ def save_pdf_dialog(text, lang='en'):
         speak_text("Sorry, I encountered an error while trying to save the PDF.", lang='en')
 
 
+@tracing.traced("intent")
 def detect_intent(user_input):
     """
     Detects user intent, focusing on save actions.
@@ -472,44 +1045,52 @@ def detect_intent(user_input):
     # Default to chat
     return {"intent": "chat", "query": user_input}
 
-def save_chat_history(filepath):
-    """Saves the conversation history to a JSON file."""
+def save_chat_history(filepath, session=None):
+    """Saves the session's conversation history to a JSON file."""
+    session = session if session is not None else default_session
     try:
+        history = session.history
         with open(filepath, 'w') as f:
-            json.dump(conversation_history, f, indent=4)
+            json.dump(history, f, indent=4)
+        memory_index.add_history(history)
         print(f"Chat history saved to {filepath}")
-        speak_text(f"Chat history saved.", lang='en')
+        speak_text(f"Chat history saved.", lang='en', session=session)
     except Exception as e:
         print(f"Error saving chat history: {e}")
-        speak_text(f"Error saving chat history.", lang='en')
+        speak_text(f"Error saving chat history.", lang='en', session=session)
 
-def load_chat_history(filepath):
-    """Loads the conversation history from a JSON file."""
+def load_chat_history(filepath, session=None):
+    """
+    Loads a conversation history from a JSON file into the long-term memory index.
+    Its exchanges are then recalled by relevance instead of being sent in full.
+    """
     try:
         with open(filepath, 'r') as f:
             loaded_history = json.load(f)
-        print(f"Chat history loaded from {filepath}")
-        speak_text(f"Chat history loaded.", lang='en')
+        added = memory_index.add_history(loaded_history)
+        print(f"Chat history loaded from {filepath} ({added} new exchanges indexed)")
+        speak_text(f"Chat history loaded.", lang='en', session=session)
         return loaded_history
     except FileNotFoundError:
         print("No previous chat history found.")
         return []
     except Exception as e:
         print(f"Error loading chat history: {e}")
-        speak_text(f"Error loading chat history.", lang='en')
+        speak_text(f"Error loading chat history.", lang='en', session=session)
         return []
 
 # --- Main Execution ---
 if __name__ == "__main__":
     print("Initializing...")
 
-    speak_enabled = False
+    session = default_session
+    session.speak_enabled = False
     # 1. Dynamic Greeting
     greeting = random.choice(GREETINGS)
     print(f"Aura: {greeting}")
     # Enable speaking for greeting
-    speak_enabled = True
-    # speak_text(greeting, lang='en') # Greet in English
+    session.speak_enabled = True
+    speak_text_async(greeting, lang='en') # Greet in English without delaying the first prompt
 
     
     # 3. Main Interaction Loop
@@ -525,7 +1106,7 @@ if __name__ == "__main__":
         if any(exit_word in user_input for exit_word in exit_keywords):
             goodbye_message = "Goodbye! Have a great day."
             print(f"Aura: {goodbye_message}")
-            if speak_enabled:
+            if session.speak_enabled:
                 speak_text(goodbye_message, lang='en')
             break
 
@@ -544,12 +1125,12 @@ if __name__ == "__main__":
             continue # Skip to the next iteration after image generation
 
         if intent == "save_previous":
-            if last_generated_text:
-                save_pdf_dialog(last_generated_text, lang_code)
+            if session.last_generated_text:
+                save_pdf_dialog(session.last_generated_text, lang_code)
             else:
                 no_prev_text_msg = "There doesn't seem to be a recent response for me to save."
                 print(f"Aura: {no_prev_text_msg}")
-                if speak_enabled:
+                if session.speak_enabled:
                     speak_text(no_prev_text_msg, lang=lang_code)
 
         elif intent == "chat" or intent == "chat_and_save":
@@ -558,17 +1139,17 @@ if __name__ == "__main__":
             # Output the main response (print and speak)
             if main_response:
                 print(f"Aura: {main_response}")
-                if speak_enabled:
+                if session.speak_enabled:
                     speak_text(main_response, lang=lang_code)
             # If no main response but there's a follow-up (e.g., AI only asks a question)
             elif follow_up and not main_response:
                 print(f"Aura: {follow_up}")
-                if speak_enabled:
+                if session.speak_enabled:
                     speak_text(follow_up, lang=lang_code)
             # Handle case where AI failed to respond entirely
             elif not main_response and not follow_up:
                 print(f"Aura: (No response generated)")
-                if speak_enabled:
+                if session.speak_enabled:
                     speak_text("Sorry, I couldn't generate a response.", lang='en')
 
             # Automatic Save Logic (if requested in the *same* command)
@@ -580,14 +1161,14 @@ if __name__ == "__main__":
                 # Print follow-up for both modes
                 print(f"Aura: {follow_up}")
                 # Speak follow-up if speaking is enabled
-                if speak_enabled:
+                if session.speak_enabled:
                     speak_text(follow_up, lang=lang_code)
 
         else:
             # Fallback for any unexpected intent results
             fallback_message = "Sorry, I'm not sure how to handle that specific request."
             print(f"Aura: {fallback_message}")
-            if speak_enabled:
+            if session.speak_enabled:
                 speak_text(fallback_message, lang='en') # Use English for generic fallback
 
    
\ No newline at end of file
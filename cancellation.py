@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import tracing
+
+# --- Turn Cancellation ---
+# Every user turn carries a CancelToken. The LLM request, speech synthesis and
+# the playback queue check it or register callbacks on it, so a cancelled turn
+# stops using the network, the CPU and the speaker as soon as possible.
+# TurnManager applies the policy for overlapping turns:
+#   supersede - a new turn cancels the ones still running (default)
+#   queue     - turns run one after another in arrival order
+#   parallel  - turns run independently
+# turn_async() applies the same policy to coroutines, waiting on the event loop.
+
+POLICIES = ("supersede", "queue", "parallel")
+SUPERSEDE_WAIT_SECONDS = 2.0  # How long a new turn waits for superseded ones to wind down
+ASYNC_POLL_SECONDS = 0.02     # How often an async turn re-checks whether it may start
+
+
+class TurnCancelled(Exception):
+    """Raised inside a turn once its CancelToken has been cancelled."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with callbacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """Cancels the token and runs its callbacks once; later calls do nothing."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in cancellation callback: {e}")
+
+    def on_cancel(self, callback):
+        """Runs callback when the token is cancelled (right away if it already is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TurnCancelled(self.reason)
+
+    def wait(self, timeout=None):
+        """Blocks until the token is cancelled; returns False if the timeout expired first."""
+        return self._event.wait(timeout)
+
+
+class TurnManager:
+    """Hands out a CancelToken per turn and coordinates overlapping turns by policy."""
+
+    def __init__(self, policy="supersede"):
+        if policy not in POLICIES:
+            print(f"Unknown turn policy '{policy}', using 'supersede'.")
+            policy = "supersede"
+        self.policy = policy
+        self._cond = threading.Condition()
+        self._active = []       # Tokens of running or waiting turns, oldest first
+        self.started = 0
+        self.cancelled = 0
+
+    def _begin(self):
+        """Registers a new turn; returns (token, may_start) where may_start() says whether it can run yet."""
+        token = CancelToken()
+        self.started += 1
+        previous = list(self._active)
+        self._active.append(token)
+        if self.policy == "supersede":
+            for other in previous:
+                self._cancel(other, "superseded")
+            # Let superseded turns unwind first so their partial replies don't interleave with this one
+            return token, lambda: not any(t in self._active for t in previous)
+        if self.policy == "queue":
+            return token, lambda: self._active[0] is token or token.cancelled
+        return token, lambda: True
+
+    def _end(self, token):
+        with self._cond:
+            self._active.remove(token)
+            self._cond.notify_all()
+
+    @contextmanager
+    def turn(self):
+        """Context manager around one turn; yields its CancelToken."""
+        started = time.monotonic()
+        with self._cond:
+            token, may_start = self._begin()
+            timeout = SUPERSEDE_WAIT_SECONDS if self.policy == "supersede" else None
+            self._cond.wait_for(may_start, timeout)
+        tracing.add_span("turn_wait", started, policy=self.policy)
+        try:
+            yield token
+        finally:
+            self._end(token)
+
+    @asynccontextmanager
+    async def turn_async(self):
+        """asyncio variant of turn(); waits without blocking the event loop."""
+        started = time.monotonic()
+        with self._cond:
+            token, may_start = self._begin()
+        try:
+            give_up = time.monotonic() + SUPERSEDE_WAIT_SECONDS if self.policy == "supersede" else None
+            while True:
+                with self._cond:
+                    if may_start():
+                        break
+                if give_up is not None and time.monotonic() >= give_up:
+                    break
+                await asyncio.sleep(ASYNC_POLL_SECONDS)
+            tracing.add_span("turn_wait", started, policy=self.policy)
+            yield token
+        finally:
+            self._end(token)
+
+    def _cancel(self, token, reason):
+        if not token.cancelled:
+            self.cancelled += 1
+            token.cancel(reason)
+
+    def cancel_all(self, reason="cancelled"):
+        """Cancels every running or waiting turn."""
+        with self._cond:
+            for token in list(self._active):
+                self._cancel(token, reason)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {"policy": self.policy, "active": len(self._active),
+                    "started": self.started, "cancelled": self.cancelled}
@@ -0,0 +1,81 @@
+import math
+
+# --- Context Window Manager ---
+# Conversation history is fitted into a per-model token budget before each
+# request. Tokens are estimated locally (no tokenizer download). History is
+# added newest first, so the most recent turns are always kept; a turn that no
+# longer fits is shortened, and everything older than that is dropped.
+
+MODEL_CONTEXT_TOKENS = {
+    "llama3-70b-8192": 8192,
+    "llama3-8b-8192": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+MESSAGE_OVERHEAD_TOKENS = 4    # Role markers and separators per chat message
+SAFETY_MARGIN = 0.1            # Share of the window left free to absorb estimation error
+CONDENSED_CHARS = 240          # Older messages are cut to this length before being dropped
+
+
+def estimate_tokens(text):
+    """Rough token count: ~4 ASCII characters per token, ~1 token per non-ASCII character."""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return math.ceil((len(text) - non_ascii) / 4) + non_ascii
+
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def condense(message, max_chars=CONDENSED_CHARS):
+    """Returns a copy of message cut to max_chars."""
+    content = message["content"]
+    if len(content) <= max_chars:
+        return message
+    return {"role": message["role"], "content": content[:max_chars].rstrip() + " …"}
+
+
+class ContextWindow:
+    """Fits system prompt, history and the new input into a model's token budget."""
+
+    def __init__(self, model, max_output_tokens=1024):
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        window = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+        self.budget = int(window * (1 - SAFETY_MARGIN)) - max_output_tokens
+
+    def build(self, system_messages, history, user_message):
+        """
+        Returns (messages, stats). system_messages and user_message are always sent;
+        history is added newest first while it fits.
+        """
+        fixed = list(system_messages) + [user_message]
+        remaining = self.budget - sum(message_tokens(m) for m in fixed)
+
+        kept = []
+        condensed = 0
+        for message in reversed(history):
+            cost = message_tokens(message)
+            if cost > remaining:
+                # Turns that no longer fit are sent in shortened form, then dropped
+                short = condense(message)
+                cost = message_tokens(short)
+                if short is message or cost > remaining:
+                    break
+                message = short
+                condensed += 1
+            kept.append(message)
+            remaining -= cost
+        kept.reverse()
+
+        messages = list(system_messages) + kept + [user_message]
+        stats = {
+            "model": self.model,
+            "estimated_prompt_tokens": self.budget - remaining,
+            "budget_tokens": self.budget,
+            "history_messages_sent": len(kept),
+            "history_messages_total": len(history),
+            "condensed_messages": condensed,
+        }
+        return messages, stats
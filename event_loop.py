@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+# --- Background Event Loop ---
+# One asyncio event loop runs on a long-lived daemon thread and hosts every
+# coroutine of the async backend (async_backend.py). Threads hand work to it
+# with submit(), which returns a concurrent.futures Future. The GUI gets
+# results back on the Tk main loop with deliver_to_tk(), and coroutines
+# touch widgets through run_in_tk(), so a busy session costs coroutines on
+# one thread instead of an OS thread per action.
+
+
+class EventLoopThread:
+    """An asyncio event loop running on its own daemon thread."""
+
+    def __init__(self, name="aura-asyncio"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    @property
+    def loop(self):
+        """The running loop; started on first use."""
+        self.start()
+        return self._loop
+
+    def start(self):
+        """Starts the loop thread if it is not running yet."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ready = threading.Event()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(ready.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def in_loop_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Schedules a coroutine on the loop from any thread; returns a concurrent.futures Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Runs a coroutine on the loop and blocks the calling (non-loop) thread for its result."""
+        if self.in_loop_thread():
+            raise RuntimeError("EventLoopThread.run() would block its own loop; await the coroutine instead")
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, func, *args):
+        """Calls a plain function on the loop thread."""
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def stop(self, timeout=2):
+        """Cancels pending tasks and stops the loop thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop)
+        thread.join(timeout)
+
+
+def deliver_to_tk(future, widget, on_done=None, on_error=None):
+    """
+    Calls on_done(result) or on_error(exception) on the Tk main loop once a
+    concurrent Future from EventLoopThread.submit() settles. Errors without
+    an on_error handler are printed. Returns the future.
+    """
+    def settled(f):
+        if f.cancelled():
+            return
+        error = f.exception()
+        if error is None:
+            if on_done:
+                widget.after(0, on_done, f.result())
+        elif on_error:
+            widget.after(0, on_error, error)
+        else:
+            print(f"Background task failed: {error}")
+
+    future.add_done_callback(settled)
+    return future
+
+
+async def run_in_tk(widget, func, *args):
+    """Runs func on the Tk main loop from a coroutine and returns its result without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    result = loop.create_future()
+
+    def call():
+        try:
+            value = func(*args)
+        except Exception as e:
+            loop.call_soon_threadsafe(result.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(result.set_result, value)
+
+    widget.after(0, call)
+    return await result
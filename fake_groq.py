@@ -0,0 +1,196 @@
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Fake Groq Server ---
+# A local stand-in for the Groq chat completions API with injectable latency,
+# stalls, errors and a requests-per-minute quota (429 + x-ratelimit headers),
+# for exercising deadlines, hedging, rate limiting and load behaviour without
+# network access or API usage. The Groq client talks to it when
+# GROQ_BASE_URL is set, e.g.:
+#   python fake_groq.py --port 8900 --latency 0.4 --stall-rate 0.1
+#   GROQ_BASE_URL=http://127.0.0.1:8900 GROQ_API_KEY=test python Main.py
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+DISTRIBUTIONS = ("uniform", "exponential", "lognormal")
+
+
+def sample_latency(latency, jitter, distribution="uniform"):
+    """
+    latency plus a random extra drawn from distribution: uniform in 0..jitter,
+    exponential with mean jitter, or lognormal with median jitter (long tail).
+    """
+    if jitter <= 0:
+        return latency
+    if distribution == "exponential":
+        return latency + random.expovariate(1 / jitter)
+    if distribution == "lognormal":
+        return latency + jitter * random.lognormvariate(0, 1)
+    return latency + random.uniform(0, jitter)
+
+
+class FakeGroqConfig:
+    """Latency and failure injection settings; can be changed while the server runs."""
+
+    def __init__(self, latency=0.3, jitter=0.1, stall_rate=0.0, stall_seconds=15.0, error_rate=0.0,
+                 chunk_delay=0.02, model_latency=None, requests_per_minute=None, distribution="uniform"):
+        self.latency = latency              # Seconds before the first byte
+        self.jitter = jitter                # Scale of the random extra latency (see sample_latency)
+        self.distribution = distribution
+        self.stall_rate = stall_rate        # Share of requests that stall for stall_seconds first
+        self.stall_seconds = stall_seconds
+        self.error_rate = error_rate        # Share of requests answered with HTTP 500
+        self.chunk_delay = chunk_delay      # Seconds between streamed chunks
+        self.model_latency = dict(model_latency or {})  # model -> latency override
+        self.requests_per_minute = requests_per_minute  # None: no quota
+        self.requests = 0
+        self.throttled = 0
+        self._recent = collections.deque()             # Accepted request times in the last minute
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Counts a request; returns None if admitted, else the seconds until the quota frees up."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            while self._recent and self._recent[0] <= now - 60:
+                self._recent.popleft()
+            if self.requests_per_minute and len(self._recent) >= self.requests_per_minute:
+                self.throttled += 1
+                return self._recent[0] + 60 - now
+            self._recent.append(now)
+            return None
+
+    def quota_headers(self):
+        if not self.requests_per_minute:
+            return {}
+        with self._lock:
+            remaining = max(0, self.requests_per_minute - len(self._recent))
+        return {"x-ratelimit-limit-requests": str(self.requests_per_minute),
+                "x-ratelimit-remaining-requests": str(remaining),
+                "x-ratelimit-reset-requests": "60s"}
+
+    def delay_for(self, model):
+        delay = sample_latency(self.model_latency.get(model, self.latency), self.jitter, self.distribution)
+        if random.random() < self.stall_rate:
+            delay += self.stall_seconds
+        return delay
+
+
+def fake_reply(messages):
+    last = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    return f"Response: You said: {last}\nFollow-up: Anything else?"
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    config = FakeGroqConfig()
+
+    def log_message(self, format, *args):
+        pass  # Keep load tests quiet
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != COMPLETIONS_PATH:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.config
+        retry_after = config.admit()
+        if retry_after is not None:
+            self._send_json(429, {"error": {"message": "rate limit reached", "type": "tokens"}},
+                            dict(config.quota_headers(), **{"retry-after": f"{retry_after:.2f}"}))
+            return
+        model = request.get("model", "llama3-8b-8192")
+        time.sleep(config.delay_for(model))
+        if random.random() < config.error_rate:
+            self._send_json(500, {"error": {"message": "injected failure", "type": "internal_server_error"}})
+            return
+
+        content = fake_reply(request.get("messages", []))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in request.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "total_tokens": prompt_tokens + len(content) // 4}
+        try:
+            if not request.get("stream"):
+                self._send_json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                }, config.quota_headers())
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            for name, value in config.quota_headers().items():
+                self.send_header(name, value)
+            self.end_headers()
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                delta = word if i == 0 else " " + word
+                self._send_event({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                                  "model": model, "choices": [{"index": 0, "delta": {"content": delta},
+                                                               "finish_reason": None}]})
+                time.sleep(config.chunk_delay)
+            self._send_event({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                              "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                              "x_groq": {"id": completion_id, "usage": usage}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client cancelled (e.g. a losing hedge)
+
+    def _send_event(self, payload):
+        self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+
+def start_fake_groq(port=0, config=None):
+    """Starts the server in a daemon thread; returns (server, base_url). Stop with server.shutdown()."""
+    handler = type("Handler", (FakeGroqHandler,), {"config": config or FakeGroqConfig()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-groq", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Groq chat completions server.")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform", help="shape of the extra latency")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of requests that stall")
+    parser.add_argument("--stall-seconds", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS")
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute before answering 429")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.model_latency)
+    server, url = start_fake_groq(args.port, FakeGroqConfig(
+        latency=args.latency, jitter=args.jitter, stall_rate=args.stall_rate, stall_seconds=args.stall_seconds,
+        error_rate=args.error_rate, model_latency={m: float(s) for m, s in overrides.items()},
+        requests_per_minute=args.rpm, distribution=args.distribution,
+    ))
+    print(f"Fake Groq listening on {url} (set GROQ_BASE_URL={url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
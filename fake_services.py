@@ -0,0 +1,384 @@
+import argparse
+import base64
+import itertools
+import json
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from fake_groq import DISTRIBUTIONS, FakeGroqConfig, sample_latency, start_fake_groq
+
+# --- Fake External Services ---
+# Local stand-ins for every service Aura talks to besides Groq (see
+# fake_groq.py): Google Translate TTS (gTTS), the Google Web Speech API,
+# Replicate, imgbb and OpenWeatherMap. Each speaks just enough of the real
+# protocol for the real client code to work unchanged, with injectable
+# latency (uniform, exponential or lognormal), stalls and errors.
+# start_fake_services() runs all of them and returns the environment
+# variables that point Aura at them:
+#   python fake_services.py --latency 0.2 --distribution lognormal
+#   (then export the printed variables and run Main.py, server.py or loadtest.py)
+
+GTTS_PATH = "/_/TranslateWebserverUi/data/batchexecute"
+STT_PATH = "/speech-api/v2/recognize"
+WEATHER_PATH = "/data/2.5/weather"
+TRANSCRIPTS = [
+    "what is the capital of france",
+    "tell me a fun fact about space",
+    "how do i make a cup of tea",
+    "what is the weather like today",
+]
+MP3_FRAME_SECONDS = 1152 / 44100
+SECONDS_PER_CHARACTER = 0.06    # Rough speaking rate of the fake speech
+
+
+class FakeServiceConfig:
+    """Latency and failure injection for one fake service; can be changed while it runs."""
+
+    def __init__(self, latency=0.2, jitter=0.1, distribution="uniform", error_rate=0.0,
+                 stall_rate=0.0, stall_seconds=10.0, processing_seconds=2.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.processing_seconds = processing_seconds  # Replicate: time from prediction start to output
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        delay = sample_latency(self.latency, self.jitter, self.distribution)
+        if random.random() < self.stall_rate:
+            delay += self.stall_seconds
+        return delay
+
+    def admit(self):
+        """Counts a request, waits out its latency and returns False if it should fail."""
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.delay())
+        if random.random() < self.error_rate:
+            with self._lock:
+                self.failures += 1
+            return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "failures": self.failures}
+
+
+def silent_mp3(seconds):
+    """MPEG-1 Layer III frames (128 kbit/s, 44.1 kHz) of silence lasting about seconds."""
+    frame = b"\xff\xfb\x90\x64" + bytes(413)
+    return frame * max(1, int(seconds / MP3_FRAME_SECONDS))
+
+
+def gray_png(size=64):
+    """A small valid grayscale PNG."""
+    def chunk(kind, data):
+        return struct.pack("!I", len(data)) + kind + data + struct.pack("!I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    rows = b"".join(b"\x00" + bytes([128]) * size for _ in range(size))
+    header = struct.pack("!IIBBBBB", size, size, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    """Shared plumbing of the fake services; subclasses implement routes."""
+
+    config = FakeServiceConfig()
+    base_url = ""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep load tests quiet
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _fail(self):
+        self._send(500, {"error": "injected failure"})
+
+    def _route(self, method):
+        path = urlsplit(self.path).path
+        route = self.route_name(path)
+        handler = getattr(self, f"{method}_{route}", None) if route else None
+        if handler is None:
+            self._body()
+            self._send(404, {"error": f"no route for {method} {path}"})
+            return
+        handler()
+
+    def route_name(self, path):
+        return None
+
+    def do_GET(self):
+        self._route("get")
+
+    def do_POST(self):
+        self._route("post")
+
+
+class FakeGTTSHandler(FakeServiceHandler):
+    """Google Translate's batchexecute endpoint as used by gTTS; answers with silent mp3 audio."""
+
+    def route_name(self, path):
+        return "tts" if path == GTTS_PATH else None
+
+    def post_tts(self):
+        form = parse_qs(self._body().decode("utf-8"))
+        if not self.config.admit():
+            return self._fail()
+        try:
+            # f.req = [[["jQ1olc", "[\"<text>\",\"<lang>\",...]", null, "generic"]]]
+            text = json.loads(json.loads(form["f.req"][0])[0][0][1])[0]
+        except (KeyError, IndexError, TypeError, ValueError):
+            text = ""
+        audio = base64.b64encode(silent_mp3(len(text) * SECONDS_PER_CHARACTER)).decode("ascii")
+        line = json.dumps([["wrb.fr", "jQ1olc", f'["{audio}"]', None, None, None, "generic"]], separators=(",", ":"))
+        self._send(200, f")]}}'\n\n{len(line)}\n{line}\n", "application/json; charset=utf-8")
+
+
+class FakeSTTHandler(FakeServiceHandler):
+    """The Google Web Speech API used by recognize_google; returns canned transcripts in turn."""
+
+    transcripts = itertools.cycle(TRANSCRIPTS)
+
+    def route_name(self, path):
+        return "recognize" if path == STT_PATH else None
+
+    def post_recognize(self):
+        self._body()
+        if not self.config.admit():
+            return self._fail()
+        transcript = next(self.transcripts)
+        result = {"result": [{"alternative": [{"transcript": transcript, "confidence": 0.92}], "final": True}],
+                  "result_index": 0}
+        self._send(200, '{"result":[]}\n' + json.dumps(result) + "\n")
+
+
+class FakeReplicateHandler(FakeServiceHandler):
+    """Replicate predictions: created, then polled until they succeed with an image URL served here."""
+
+    predictions = {}
+    lock = threading.Lock()
+
+    def route_name(self, path):
+        if path == "/v1/predictions" or (path.startswith("/v1/models/") and path.endswith("/predictions")):
+            return "create"
+        if path.startswith("/v1/predictions/"):
+            return "prediction"
+        if path.startswith("/v1/models/") and "/versions/" in path:
+            return "version"
+        if path.startswith("/files/"):
+            return "file"
+        return None
+
+    def _prediction(self, prediction):
+        now = time.time()
+        done = now >= prediction["ready_at"]
+        prediction_id = prediction["id"]
+        created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(prediction["created"]))
+        return {
+            "id": prediction_id, "model": prediction["model"], "version": prediction["version"],
+            "status": prediction["status"] if done else "processing", "input": prediction["input"],
+            "output": [f"{self.base_url}/files/{prediction_id}.png"] if done and prediction["status"] == "succeeded" else None,
+            "error": prediction.get("error") if done else None, "logs": "", "metrics": {},
+            "created_at": created, "started_at": created, "completed_at": created if done else None,
+            "urls": {"get": f"{self.base_url}/v1/predictions/{prediction_id}",
+                     "cancel": f"{self.base_url}/v1/predictions/{prediction_id}/cancel"},
+        }
+
+    def post_create(self):
+        request = json.loads(self._body() or b"{}")
+        ok = self.config.admit()
+        if not ok and random.random() < 0.5:
+            return self._fail()  # Half of the injected errors fail creation, the rest fail the prediction
+        path = urlsplit(self.path).path
+        model = path[len("/v1/models/"):-len("/predictions")] if path.startswith("/v1/models/") else "stability-ai/sdxl"
+        prediction = {
+            "id": uuid.uuid4().hex[:16], "model": model, "version": request.get("version", ""),
+            "input": request.get("input", {}), "created": time.time(),
+            "ready_at": time.time() + self.config.processing_seconds,
+            "status": "succeeded" if ok else "failed", "error": None if ok else "injected failure",
+        }
+        with self.lock:
+            self.predictions[prediction["id"]] = prediction
+        if "wait" in self.headers.get("Prefer", ""):
+            time.sleep(max(0.0, prediction["ready_at"] - time.time()))
+        self._send(201, self._prediction(prediction))
+
+    def get_prediction(self):
+        prediction_id = urlsplit(self.path).path.rsplit("/", 1)[-1]
+        with self.lock:
+            prediction = self.predictions.get(prediction_id)
+        if prediction is None:
+            return self._send(404, {"detail": "Not found."})
+        self._send(200, self._prediction(prediction))
+
+    def get_version(self):
+        # replicate.run() looks up "owner/name:version" before polling
+        version_id = urlsplit(self.path).path.rsplit("/", 1)[-1]
+        self._send(200, {"id": version_id, "created_at": "2024-01-01T00:00:00Z", "cog_version": "0.9.0",
+                         "openapi_schema": {}})
+
+    def get_file(self):
+        self._send(200, gray_png(), "image/png")
+
+
+class FakeImgbbHandler(FakeServiceHandler):
+    """imgbb's upload API; uploaded images are served back as a fixed PNG."""
+
+    def route_name(self, path):
+        if path == "/1/upload":
+            return "upload"
+        if path.startswith("/files/"):
+            return "file"
+        return None
+
+    def post_upload(self):
+        self._body()
+        if not self.config.admit():
+            return self._send(400, {"status_code": 400, "error": {"message": "injected failure"}})
+        image_id = uuid.uuid4().hex[:8]
+        url = f"{self.base_url}/files/{image_id}.png"
+        self._send(200, {"data": {"id": image_id, "url": url, "display_url": url}, "success": True, "status": 200})
+
+    def get_file(self):
+        self._send(200, gray_png(), "image/png")
+
+
+class FakeWeatherHandler(FakeServiceHandler):
+    """OpenWeatherMap's current weather endpoint; the city "nowhere" is not found."""
+
+    def route_name(self, path):
+        return "weather" if path == WEATHER_PATH else None
+
+    def get_weather(self):
+        city = parse_qs(urlsplit(self.path).query).get("q", [""])[0]
+        if not self.config.admit():
+            return self._fail()
+        if not city or city.lower() == "nowhere":
+            return self._send(404, {"cod": "404", "message": "city not found"})
+        self._send(200, {"name": city, "main": {"temp": round(random.uniform(-5, 35), 1),
+                                                "humidity": random.randint(20, 95)},
+                         "weather": [{"description": random.choice(["clear sky", "light rain", "scattered clouds"])}]})
+
+
+SERVICES = {
+    "gtts": FakeGTTSHandler,
+    "stt": FakeSTTHandler,
+    "replicate": FakeReplicateHandler,
+    "imgbb": FakeImgbbHandler,
+    "weather": FakeWeatherHandler,
+}
+
+
+def start_fake_service(name, config=None, port=0):
+    """Starts one fake service in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), SERVICES[name])
+    server.daemon_threads = True
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    attributes = {"config": config or FakeServiceConfig(), "base_url": base_url}
+    if name == "replicate":
+        attributes.update(predictions={}, lock=threading.Lock())
+    server.RequestHandlerClass = type(f"{SERVICES[name].__name__}Instance", (SERVICES[name],), attributes)
+    threading.Thread(target=server.serve_forever, name=f"fake-{name}", daemon=True).start()
+    return server, base_url
+
+
+class FakeServices:
+    """All fake services (Groq included) running together."""
+
+    def __init__(self, groq_config=None, service_configs=None):
+        service_configs = service_configs or {}
+        self.groq_config = groq_config or FakeGroqConfig()
+        self.configs = {name: service_configs.get(name) or FakeServiceConfig() for name in SERVICES}
+        self.servers = {}
+        self.urls = {}
+        server, self.urls["groq"] = start_fake_groq(config=self.groq_config)
+        self.servers["groq"] = server
+        for name in SERVICES:
+            self.servers[name], self.urls[name] = start_fake_service(name, self.configs[name])
+
+    def env(self):
+        """Environment variables that point Aura's clients at the fakes."""
+        return {
+            "GROQ_API_KEY": "fake-groq-key",
+            "GROQ_BASE_URL": self.urls["groq"],
+            "REPLICATE_API_TOKEN": "fake-replicate-token",
+            "REPLICATE_BASE_URL": self.urls["replicate"],
+            "IMG_BB_API_KEY": "fake-imgbb-key",
+            "IMG_BB_UPLOAD_URL": f"{self.urls['imgbb']}/1/upload",
+            "OPEN_WEATHER_API_KEY": "fake-weather-key",
+            "OPEN_WEATHER_URL": f"{self.urls['weather']}{WEATHER_PATH}",
+            "AURA_GTTS_URL": self.urls["gtts"],
+            "AURA_GOOGLE_STT_URL": f"{self.urls['stt']}{STT_PATH}",
+        }
+
+    def stats(self):
+        report = {name: config.stats() for name, config in self.configs.items()}
+        report["groq"] = {"requests": self.groq_config.requests, "throttled": self.groq_config.throttled}
+        return report
+
+    def shutdown(self):
+        for server in self.servers.values():
+            server.shutdown()
+
+
+def start_fake_services(latency=0.2, jitter=0.1, distribution="uniform", error_rate=0.0, stall_rate=0.0,
+                        groq_latency=None, chunk_delay=0.02, requests_per_minute=None, image_seconds=2.0):
+    """Starts every fake service with the same latency and failure settings (Groq may get its own latency)."""
+    groq_config = FakeGroqConfig(
+        latency=latency if groq_latency is None else groq_latency, jitter=jitter, distribution=distribution,
+        error_rate=error_rate, stall_rate=stall_rate, chunk_delay=chunk_delay, requests_per_minute=requests_per_minute,
+    )
+    configs = {name: FakeServiceConfig(latency, jitter, distribution, error_rate, stall_rate,
+                                       processing_seconds=image_seconds) for name in SERVICES}
+    return FakeServices(groq_config, configs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Groq, gTTS, speech, Replicate, imgbb and weather services.")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--groq-latency", type=float, default=None)
+    parser.add_argument("--rpm", type=int, default=None, help="Groq requests per minute before answering 429")
+    parser.add_argument("--image-seconds", type=float, default=2.0, help="Replicate prediction run time")
+    args = parser.parse_args()
+
+    services = start_fake_services(args.latency, args.jitter, args.distribution, args.error_rate, args.stall_rate,
+                                   args.groq_latency, requests_per_minute=args.rpm, image_seconds=args.image_seconds)
+    for name, value in services.env().items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        services.shutdown()
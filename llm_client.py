@@ -0,0 +1,381 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
+
+import tracing
+from cancellation import TurnCancelled
+from context_window import message_tokens
+from metrics import LatencyStats
+from rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_HEDGE
+
+# --- Hedged LLM Requests ---
+# Groq calls get a hard deadline, and if the first answer (or first streamed
+# chunk) has not arrived after the model's recent p95 latency, a second
+# "hedge" request is fired, to the same model or a smaller fallback. The
+# first attempt to respond wins; the loser is cancelled (a stream is closed,
+# a plain request is abandoned and bounded by its own timeout). A failed
+# attempt triggers the fallback immediately instead of waiting for the hedge.
+# With a shared RateLimiter, every attempt first queues for quota, 429s are
+# waited out and retried within the deadline, and no hedge is fired while
+# other requests are already queued (it would only add to the congestion).
+# A turn's CancelToken cancels every attempt, including ones still queued.
+# AsyncHedgedLLM is the asyncio counterpart for an AsyncGroq client: the
+# attempts are tasks on the event loop instead of threads, and losers are
+# stopped by cancelling their task. When a hedge wins, the primary's time until
+# the race was decided is recorded as its latency too, as a lower bound.
+
+DEADLINE_SECONDS = 20         # Whole request (first chunk, when streaming)
+STREAM_STALL_SECONDS = 10     # Longest gap allowed between chunks of a winning stream
+DEFAULT_HEDGE_DELAY = 2.0     # Used until a model has latency samples
+MIN_HEDGE_DELAY = 0.3
+MAX_HEDGE_DELAY = 8.0
+EXPECTED_REPLY_TOKENS = 300   # Completion tokens reserved per request; headers correct the estimate
+
+
+def request_tokens(kwargs):
+    """Estimated quota cost of a request: prompt tokens plus a typical reply."""
+    prompt = sum(message_tokens(m) for m in kwargs.get("messages", []))
+    return prompt + min(kwargs.get("max_tokens") or EXPECTED_REPLY_TOKENS, EXPECTED_REPLY_TOKENS)
+
+
+class HedgedLLM:
+    """Deadline-aware chat completions with a p95-timed hedge request and fallback model."""
+
+    def __init__(self, client, hedge_models=None, deadline=DEADLINE_SECONDS, limiter=None):
+        self.client = client
+        self.hedge_models = dict(hedge_models or {})  # model -> model used for its hedge (default: itself)
+        self.deadline = deadline
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._latency = {}          # (model, stream) -> LatencyStats of time to first response
+        self._counters = {"calls": 0, "hedges_fired": 0, "hedges_won": 0, "fallbacks": 0,
+                          "hedges_skipped": 0, "deadline_exceeded": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _stats(self, model, stream):
+        with self._lock:
+            return self._latency.setdefault((model, stream), LatencyStats())
+
+    def hedge_delay(self, model, stream=False):
+        """Seconds to wait for the first attempt before hedging: its recent p95, clamped."""
+        p95 = self._stats(model, stream).percentile(95, DEFAULT_HEDGE_DELAY)
+        return min(max(p95, MIN_HEDGE_DELAY), MAX_HEDGE_DELAY)
+
+    def _create(self, model, kwargs, stream, deadline, cancelled, priority):
+        """Sends one request once the limiter allows it; returns (result, send time) or None if cancelled."""
+        tokens = request_tokens(kwargs)
+        for retry in itertools.count():
+            if self.limiter is not None:
+                self.limiter.acquire(tokens, priority, timeout=deadline - time.monotonic(), cancelled=cancelled)
+            if cancelled.is_set():
+                return None
+            started = time.monotonic()
+            api = self.client.with_options(timeout=max(0.1, deadline - started), max_retries=0)
+            try:
+                raw = api.chat.completions.with_raw_response.create(model=model, stream=stream, **kwargs)
+            except Exception as e:
+                if getattr(e, "status_code", None) != 429 or self.limiter is None:
+                    raise
+                print(f"Groq rate limit hit for {model}; waiting before retry {retry + 1}.")
+                response = getattr(e, "response", None)
+                self.limiter.on_throttled(response.headers if response is not None else None, retry)
+                continue  # The next acquire waits out the pause; the deadline bounds the retries
+            if self.limiter is not None:
+                self.limiter.observe_headers(raw.headers)
+            return raw.parse(), started
+
+    def _attempt(self, attempt_id, model, kwargs, stream, deadline, events, cancelled, priority):
+        started = attempt_started = time.monotonic()
+        try:
+            created = self._create(model, kwargs, stream, deadline, cancelled, priority)
+            if created is None:
+                return
+            result, started = created
+            if not stream:
+                events.put(("done", attempt_id, result, time.monotonic() - started))
+                return
+            try:
+                for chunk in result:
+                    if cancelled.is_set():
+                        return
+                    events.put(("chunk", attempt_id, chunk, time.monotonic() - started))
+            finally:
+                close = getattr(result, "close", None) or getattr(getattr(result, "response", None), "close", None)
+                if close:
+                    close()  # Drops the connection of a cancelled stream
+            events.put(("done", attempt_id, None, time.monotonic() - started))
+        except Exception as e:
+            events.put(("error", attempt_id, e, time.monotonic() - started))
+        finally:
+            tracing.add_span("llm_attempt", attempt_started, model=model, attempt=attempt_id, stream=stream,
+                             cancelled=cancelled.is_set())
+
+    def _race(self, model, kwargs, stream, priority, cancel_token=None):
+        """Yields ("chunk" | "done", payload) events of the winning attempt."""
+        self._count("calls")
+        events = queue.Queue()
+        attempts = []                # Per attempt: (model, cancelled Event)
+        failed = set()
+        start = time.monotonic()
+        deadline = start + self.deadline
+        hedge_at = start + self.hedge_delay(model, stream)
+
+        def launch(attempt_model, attempt_priority):
+            cancelled = threading.Event()
+            attempts.append((attempt_model, cancelled))
+            threading.Thread(
+                target=tracing.bind(self._attempt), name="aura-llm-attempt", daemon=True,
+                args=(len(attempts) - 1, attempt_model, kwargs, stream, deadline, events, cancelled, attempt_priority),
+            ).start()
+
+        def cancel_all(except_id=None):
+            for attempt_id, (_, cancelled) in enumerate(attempts):
+                if attempt_id != except_id:
+                    cancelled.set()
+            if self.limiter is not None:
+                self.limiter.wake()  # Lets attempts still queued for quota give up
+
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+            cancel_token.on_cancel(lambda: events.put(("cancelled", None, cancel_token.reason, 0.0)))
+        launch(model, priority)
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                cancel_all()
+                self._count("deadline_exceeded")
+                raise TimeoutError(f"{model} did not respond within {self.deadline:.0f}s")
+            if len(attempts) == 1 and hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if self.limiter is not None and self.limiter.queue_depth() > 0:
+                    self._count("hedges_skipped")
+                else:
+                    launch(self.hedge_models.get(model, model), PRIORITY_HEDGE)
+                    self._count("hedges_fired")
+                continue
+            wait_until = hedge_at if len(attempts) == 1 and hedge_at is not None else deadline
+            try:
+                kind, attempt_id, payload, elapsed = events.get(timeout=max(0.0, min(wait_until, deadline) - now))
+            except queue.Empty:
+                continue
+            if kind == "cancelled":
+                cancel_all()
+                raise TurnCancelled(payload)
+            if kind == "error":
+                print(f"LLM request to {attempts[attempt_id][0]} failed: {payload}")
+                failed.add(attempt_id)
+                if len(failed) == len(attempts) == 2:
+                    raise payload
+                if len(attempts) == 1:
+                    launch(self.hedge_models.get(model, model), PRIORITY_HEDGE)  # Fall back right away
+                    self._count("fallbacks")
+                continue
+            winner = attempt_id
+            break
+
+        cancel_all(except_id=winner)
+        self._stats(attempts[winner][0], stream).record(elapsed)
+        if winner == 1 and 0 not in failed:
+            self._count("hedges_won")
+            # The beaten primary took at least this long; without the sample its p95 (the hedge delay) drifts low
+            self._stats(attempts[0][0], stream).record(time.monotonic() - start)
+        try:
+            while True:
+                yield kind, payload
+                if kind == "done":
+                    return
+                while True:
+                    try:
+                        kind, attempt_id, payload, _ = events.get(timeout=STREAM_STALL_SECONDS)
+                    except queue.Empty:
+                        raise TimeoutError(f"{attempts[winner][0]} stream stalled for {STREAM_STALL_SECONDS}s")
+                    if kind == "cancelled":
+                        raise TurnCancelled(payload)
+                    if attempt_id == winner:
+                        break
+                if kind == "error":
+                    raise payload
+        finally:
+            cancel_all()  # Also stops the winner if the caller abandons the stream
+
+    def complete(self, model, messages, priority=PRIORITY_INTERACTIVE, cancel_token=None, **kwargs):
+        """Returns the chat completion of whichever attempt answers first; raises TurnCancelled if cancelled."""
+        for _, response in self._race(model, dict(kwargs, messages=messages), False, priority, cancel_token):
+            return response
+
+    def stream(self, model, messages, priority=PRIORITY_INTERACTIVE, cancel_token=None, **kwargs):
+        """Yields the chunks of whichever streaming attempt produces its first chunk first."""
+        for kind, chunk in self._race(model, dict(kwargs, messages=messages), True, priority, cancel_token):
+            if kind == "chunk":
+                yield chunk
+
+    def stats(self):
+        """Returns hedge/fallback/deadline counters and time-to-first-response per model."""
+        with self._lock:
+            report = dict(self._counters)
+            latency = dict(self._latency)
+        report["first_response"] = {
+            f"{model}{' (stream)' if stream else ''}": stats.snapshot() for (model, stream), stats in latency.items()
+        }
+        return report
+
+
+class AsyncHedgedLLM(HedgedLLM):
+    """asyncio counterpart of HedgedLLM; pass an AsyncGroq client."""
+
+    async def _create_async(self, model, kwargs, stream, deadline, priority):
+        """Sends one request once the limiter allows it; returns (result, send time)."""
+        tokens = request_tokens(kwargs)
+        for retry in itertools.count():
+            if self.limiter is not None:
+                await self.limiter.acquire_async(tokens, priority, timeout=deadline - time.monotonic())
+            started = time.monotonic()
+            api = self.client.with_options(timeout=max(0.1, deadline - started), max_retries=0)
+            try:
+                raw = await api.chat.completions.with_raw_response.create(model=model, stream=stream, **kwargs)
+            except Exception as e:
+                if getattr(e, "status_code", None) != 429 or self.limiter is None:
+                    raise
+                print(f"Groq rate limit hit for {model}; waiting before retry {retry + 1}.")
+                response = getattr(e, "response", None)
+                self.limiter.on_throttled(response.headers if response is not None else None, retry)
+                continue
+            if self.limiter is not None:
+                self.limiter.observe_headers(raw.headers)
+            return await raw.parse(), started
+
+    async def _attempt_async(self, attempt_id, model, kwargs, stream, deadline, events, priority):
+        started = attempt_started = time.monotonic()
+        cancelled = False
+        try:
+            result, started = await self._create_async(model, kwargs, stream, deadline, priority)
+            if not stream:
+                events.put_nowait(("done", attempt_id, result, time.monotonic() - started))
+                return
+            try:
+                async for chunk in result:
+                    events.put_nowait(("chunk", attempt_id, chunk, time.monotonic() - started))
+            finally:
+                await result.close()  # Drops the connection of a cancelled stream
+            events.put_nowait(("done", attempt_id, None, time.monotonic() - started))
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            events.put_nowait(("error", attempt_id, e, time.monotonic() - started))
+        finally:
+            tracing.add_span("llm_attempt", attempt_started, model=model, attempt=attempt_id, stream=stream,
+                             cancelled=cancelled)
+
+    async def _race_async(self, model, kwargs, stream, priority, cancel_token=None):
+        """Yields ("chunk" | "done", payload) events of the winning attempt."""
+        self._count("calls")
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        attempts = []                # Per attempt: (model, task)
+        failed = set()
+        start = time.monotonic()
+        deadline = start + self.deadline
+        hedge_at = start + self.hedge_delay(model, stream)
+
+        def launch(attempt_model, attempt_priority):
+            task = loop.create_task(self._attempt_async(
+                len(attempts), attempt_model, kwargs, stream, deadline, events, attempt_priority))
+            attempts.append((attempt_model, task))
+
+        def cancel_all(except_id=None):
+            for attempt_id, (_, task) in enumerate(attempts):
+                if attempt_id != except_id:
+                    task.cancel()
+
+        async def next_event(timeout):
+            try:
+                return await asyncio.wait_for(events.get(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                return None
+
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+            # Cancellation may come from any thread; hand it to the loop
+            cancel_token.on_cancel(lambda: loop.call_soon_threadsafe(
+                events.put_nowait, ("cancelled", None, cancel_token.reason, 0.0)))
+        launch(model, priority)
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    self._count("deadline_exceeded")
+                    raise TimeoutError(f"{model} did not respond within {self.deadline:.0f}s")
+                if len(attempts) == 1 and hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if self.limiter is not None and self.limiter.queue_depth() > 0:
+                        self._count("hedges_skipped")
+                    else:
+                        launch(self.hedge_models.get(model, model), PRIORITY_HEDGE)
+                        self._count("hedges_fired")
+                    continue
+                wait_until = hedge_at if len(attempts) == 1 and hedge_at is not None else deadline
+                event = await next_event(min(wait_until, deadline) - now)
+                if event is None:
+                    continue
+                kind, attempt_id, payload, elapsed = event
+                if kind == "cancelled":
+                    raise TurnCancelled(payload)
+                if kind == "error":
+                    print(f"LLM request to {attempts[attempt_id][0]} failed: {payload}")
+                    failed.add(attempt_id)
+                    if len(failed) == len(attempts) == 2:
+                        raise payload
+                    if len(attempts) == 1:
+                        launch(self.hedge_models.get(model, model), PRIORITY_HEDGE)  # Fall back right away
+                        self._count("fallbacks")
+                    continue
+                winner = attempt_id
+                break
+
+            cancel_all(except_id=winner)
+            self._stats(attempts[winner][0], stream).record(elapsed)
+            if winner == 1 and 0 not in failed:
+                self._count("hedges_won")
+                self._stats(attempts[0][0], stream).record(time.monotonic() - start)  # As in _race
+            while True:
+                yield kind, payload
+                if kind == "done":
+                    return
+                while True:
+                    event = await next_event(STREAM_STALL_SECONDS)
+                    if event is None:
+                        raise TimeoutError(f"{attempts[winner][0]} stream stalled for {STREAM_STALL_SECONDS}s")
+                    kind, attempt_id, payload, _ = event
+                    if kind == "cancelled":
+                        raise TurnCancelled(payload)
+                    if attempt_id == winner:
+                        break
+                if kind == "error":
+                    raise payload
+        finally:
+            cancel_all()  # Also stops the winner if the caller abandons the stream
+
+    async def complete(self, model, messages, priority=PRIORITY_INTERACTIVE, cancel_token=None, **kwargs):
+        """Returns the chat completion of whichever attempt answers first; raises TurnCancelled if cancelled."""
+        race = self._race_async(model, dict(kwargs, messages=messages), False, priority, cancel_token)
+        try:
+            async for _, response in race:
+                return response
+        finally:
+            await race.aclose()
+
+    async def stream(self, model, messages, priority=PRIORITY_INTERACTIVE, cancel_token=None, **kwargs):
+        """Yields the chunks of whichever streaming attempt produces its first chunk first."""
+        race = self._race_async(model, dict(kwargs, messages=messages), True, priority, cancel_token)
+        try:
+            async for kind, chunk in race:
+                if kind == "chunk":
+                    yield chunk
+        finally:
+            await race.aclose()
@@ -0,0 +1,398 @@
+import argparse
+import asyncio
+import contextlib
+import glob
+import importlib
+import json
+import math
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import wave
+from collections import OrderedDict
+
+from fake_groq import DISTRIBUTIONS
+from fake_services import start_fake_services
+from metrics import LatencyStats
+import tracing
+
+# --- Load Test ---
+# Drives many concurrent simulated users through the real backend code paths
+# (language and intent detection, streamed LLM replies, sentence TTS, speech
+# recognition, image generation/upload/captioning, PDF export and weather)
+# against the local fake services, and reports p50/p95/p99 latency per stage.
+# Nothing leaves the machine and no API quota is used. Backend state (caches,
+# sessions) goes to a scratch directory so the user's own data is untouched.
+# Replies and speech served from Aura's caches are reported under their own
+# stages (llm_cached, tts_cached) with the hit rate, so they do not pass for
+# service latency; --unique-prompts makes every prompt miss the caches.
+#
+#   python loadtest.py --users 50 --duration 60 --mix text=6,voice=2,image=1,pdf=1,weather=1 \
+#       --latency 0.3 --jitter 0.2 --distribution lognormal --think 2
+
+DEFAULT_MIX = "text=6,voice=2,image=1,pdf=1,weather=1"
+FLOWS = ("text", "voice", "image", "pdf", "weather")
+STATS_WINDOW = 100000        # Keep every sample so percentiles cover the whole run
+HISTORY_MESSAGES = 20        # Per simulated user
+SAMPLE_RATE = 16000
+
+PROMPTS = [
+    "What is the capital of France?",
+    "Tell me a fun fact about space.",
+    "How do I make a good cup of tea?",
+    "Explain how rainbows form.",
+    "Suggest a name for a pet turtle.",
+    "Mujhe ek achhi kitaab batao.",
+]
+IMAGE_PROMPTS = ["generate an image of a lighthouse at dusk", "draw an image of a cat astronaut"]
+PDF_PROMPTS = ["write a short note about healthy sleep and save as pdf"]
+CITIES = ["Delhi", "London", "Tokyo", "Nairobi", "Lima"]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imported by load_backend() once the fake services' environment is set
+backend = None
+async_backend = None
+
+
+def load_backend():
+    global backend, async_backend
+    backend = importlib.import_module("backend")
+    async_backend = importlib.import_module("async_backend")
+
+
+def parse_mix(text):
+    """'text=6,voice=2' -> {"text": 6.0, "voice": 2.0}; unknown flows are rejected."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in FLOWS:
+            raise argparse.ArgumentTypeError(f"unknown flow {name!r}; choose from {', '.join(FLOWS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one flow with a positive weight")
+    return mix
+
+
+def write_wav_fixture(path, seconds=1.5):
+    """A quiet 16 kHz tone; the fake speech API does not listen to it, but the upload size is realistic."""
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        frames = (struct.pack("<h", int(1500 * math.sin(2 * math.pi * 220 * n / SAMPLE_RATE)))
+                  for n in range(int(seconds * SAMPLE_RATE)))
+        wav.writeframes(b"".join(frames))
+    return path
+
+
+def load_audio(paths, recognizer):
+    """Reads WAV files into speech_recognition AudioData once, so STT is all that is timed."""
+    import speech_recognition as sr
+    clips = []
+    for path in paths:
+        with sr.AudioFile(path) as source:
+            clips.append(recognizer.record(source))
+    return clips
+
+
+class LoadReport:
+    """Latency per stage and per whole turn, plus turn counts."""
+
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.turns = 0
+        self.failed_turns = 0
+        self.cache = {"llm": [0, 0], "tts": [0, 0]}  # kind -> [served from cache, total]
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, stage, seconds, ok=True):
+        if stage not in self.stages:
+            self.stages[stage] = LatencyStats(window=STATS_WINDOW)
+        self.stages[stage].record(seconds, ok)
+
+    def count(self, kind, cached):
+        self.cache[kind][0] += cached
+        self.cache[kind][1] += 1
+
+    def hit_rates(self):
+        return {kind: round(hits / total, 3) if total else None for kind, (hits, total) in self.cache.items()}
+
+    async def measure(self, stage, awaitable, check=bool):
+        """Awaits awaitable, recording its latency under stage; failed if it raises or check(result) is false."""
+        started = time.perf_counter()
+        try:
+            result = await awaitable
+        except Exception:
+            self.record(stage, time.perf_counter() - started, ok=False)
+            raise
+        self.record(stage, time.perf_counter() - started, ok=check(result))
+        return result
+
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def rows(self):
+        rows = []
+        for stage, stats in self.stages.items():
+            row = dict(stage=stage, **stats.snapshot())
+            top = stats.percentile(100)
+            row["max_ms"] = round(top * 1000, 1) if top is not None else None
+            rows.append(row)
+        return rows
+
+    def summary(self):
+        elapsed = self.elapsed()
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "turns": self.turns,
+            "failed_turns": self.failed_turns,
+            "turns_per_second": round(self.turns / elapsed, 2) if elapsed else None,
+            "cache_hit_rate": self.hit_rates(),
+            "stages": self.rows(),
+        }
+
+    def print_table(self):
+        summary = self.summary()
+        print(f"\n{summary['turns']} turns ({summary['failed_turns']} failed) in {summary['elapsed_seconds']} s"
+              f" = {summary['turns_per_second']} turns/s")
+        header = f"{'stage':<22}{'calls':>7}{'errors':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        print(header)
+        print("-" * len(header))
+        for row in summary["stages"]:
+            cells = [row[key] if row[key] is not None else "-" for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+            print(f"{row['stage']:<22}{row['calls']:>7}{row['errors']:>7}" + "".join(f"{cell:>10}" for cell in cells))
+        for kind, (hits, total) in self.cache.items():
+            if total:
+                print(f"{kind} served from cache: {hits}/{total} ({hits / total:.0%})")
+
+
+def served_from_cache(trace):
+    """True if the reply came from the response caches rather than a Groq call."""
+    return any(span["name"] == "cache_lookup" and span.get("hit") for span in trace.to_dict()["spans"])
+
+
+def speech_from_cache(trace, chunks):
+    """True if every sentence's audio came from the TTS cache (none synthesized or shared with another user)."""
+    spans = [span for span in trace.to_dict()["spans"] if span["name"] == "tts_synthesis"]
+    return len(spans) == chunks and all(span.get("cached") for span in spans)
+
+
+class SimulatedUser:
+    """One user with their own session, taking turns drawn from the flow mix."""
+
+    def __init__(self, index, args, report, clips):
+        self.index = index
+        self.args = args
+        self.report = report
+        self.clips = clips
+        self.turn = 0
+        self.session = backend.create_session(f"load-{index}", max_history=HISTORY_MESSAGES, remember=False)
+        self.tracer = tracing.Tracer(enabled=False, keep=1)  # Spans tell cache hits from real calls
+
+    def prompt(self, choices):
+        text = random.choice(choices)
+        if self.args.unique_prompts:
+            text = f"{text} (user {self.index}, turn {self.turn})"
+        return text
+
+    async def run(self, deadline):
+        flows, weights = zip(*self.args.mix.items())
+        await asyncio.sleep(random.uniform(0, self.args.think))  # Stagger the first turns
+        while (self.args.turns and self.turn < self.args.turns) or (not self.args.turns and time.monotonic() < deadline):
+            flow = random.choices(flows, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = await getattr(self, f"{flow}_turn")()
+            except Exception as e:
+                print(f"[Load] user {self.index} {flow} turn failed: {e}")
+                ok = False
+            self.report.record(f"turn:{flow}", time.perf_counter() - started, ok)
+            self.report.turns += 1
+            self.report.failed_turns += not ok
+            self.turn += 1
+            if self.args.think:
+                await asyncio.sleep(random.expovariate(1 / self.args.think))
+
+    async def reply(self, prompt):
+        """Intent detection, the streamed LLM reply and its synthesized speech; returns the reply text."""
+        started = time.perf_counter()
+        lang = await async_backend.run_blocking(backend.detect_language, prompt)
+        await async_backend.run_blocking(backend.detect_intent, prompt)
+        self.report.record("intent", time.perf_counter() - started)
+
+        with tracing.activate(self.tracer.start("load", self.session.session_id)) as trace:
+            started = time.perf_counter()
+            cached = None
+            pieces = []
+            async for kind, piece in async_backend.stream_ai_response(prompt, lang, None, self.session):
+                if cached is None:
+                    cached = served_from_cache(trace)
+                    if not cached:
+                        self.report.record("llm_first_token", time.perf_counter() - started)
+                if kind == "response":
+                    pieces.append(piece)
+            reply = "".join(pieces)
+            ok = bool(pieces)  # Failed requests apologise aloud and yield nothing
+            self.report.record("llm_cached" if cached else "llm_total", time.perf_counter() - started, ok)
+            if ok:
+                self.report.count("llm", cached)
+            if ok and reply:
+                started = time.perf_counter()
+                chunks = backend.split_into_sentences(reply)
+                clips = await self.synthesize(chunks, lang)
+                cached = speech_from_cache(trace, len(chunks))
+                self.report.record("tts_cached" if cached else "tts", time.perf_counter() - started, all(clips))
+                self.report.count("tts", cached)
+        return reply if ok else None
+
+    async def synthesize(self, chunks, lang):
+        """Synthesizes every sentence on the TTS pool, as speak_text does, without playing it."""
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(loop.run_in_executor(backend.tts_executor, tracing.bind(backend.synthesize_chunk),
+                                                           chunk, lang)
+                                      for chunk in chunks))
+
+    async def text_turn(self):
+        return await self.reply(self.prompt(PROMPTS)) is not None
+
+    async def voice_turn(self):
+        loop = asyncio.get_running_loop()
+        audio = random.choice(self.clips)
+        transcript = await self.report.measure(
+            "stt", loop.run_in_executor(None, backend.stt_engine.transcribe, audio))
+        if self.args.unique_prompts:
+            transcript = f"{transcript} (user {self.index}, turn {self.turn})"
+        return await self.reply(transcript) is not None
+
+    async def image_turn(self):
+        url = await self.report.measure("image_generate", async_backend.generate_image(self.prompt(IMAGE_PROMPTS)))
+        if not url:
+            return False
+        response = await self.report.measure("image_download", async_backend.http_get(str(url)),
+                                             check=lambda r: r.status_code == 200)
+        path = os.path.join("load_images", f"user-{self.index}.png")
+        with open(path, "wb") as f:
+            f.write(response.content)
+        public_url = await self.report.measure("image_upload",
+                                               async_backend.upload_image_to_imgbb(path, backend.IMG_BB_API_KEY))
+        if not public_url:
+            return False
+        description = await self.report.measure("image_describe", async_backend.describe_image_with_blip(public_url),
+                                                check=lambda d: d and not d.startswith("Sorry"))
+        return not description.startswith("Sorry")
+
+    async def pdf_turn(self):
+        reply = await self.reply(self.prompt(PDF_PROMPTS))
+        if not reply:
+            return False
+        loop = asyncio.get_running_loop()
+        path = os.path.join("load_pdfs", f"user-{self.index}.pdf")
+        await self.report.measure("pdf", loop.run_in_executor(None, backend.write_pdf, reply, path), check=lambda _: True)
+        return True
+
+    async def weather_turn(self):
+        data = await self.report.measure("weather", async_backend.get_weather(random.choice(CITIES)),
+                                         check=lambda d: "main" in d)
+        return "main" in data
+
+
+async def run_load(args, clips):
+    report = LoadReport()
+    deadline = time.monotonic() + args.duration
+    users = [SimulatedUser(i, args, report, clips) for i in range(args.users)]
+    await asyncio.gather(*(user.run(deadline) for user in users))
+    report.finished = time.perf_counter()
+    return report
+
+
+def backend_stats():
+    return {
+        "llm": async_backend.get_model_stats(),
+        "tts": backend.get_tts_stats(),
+        "stt": backend.get_stt_stats(),
+        "single_flight": backend.get_single_flight_stats(),
+        "response_cache": backend.get_response_cache_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test Aura's backend against local fake services.")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run (ignored with --turns)")
+    parser.add_argument("--turns", type=int, default=None, help="turns per user instead of a fixed duration")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"flow weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds a user waits between turns")
+    parser.add_argument("--latency", type=float, default=0.2, help="base latency of every fake service")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--groq-latency", type=float, default=None, help="Groq time to first byte (default --latency)")
+    parser.add_argument("--image-seconds", type=float, default=2.0, help="Replicate prediction run time")
+    parser.add_argument("--rpm", type=int, default=None, help="Groq requests per minute before answering 429")
+    parser.add_argument("--client-rpm", type=int, default=None,
+                        help="Aura's own Groq request quota (default GROQ_REQUESTS_PER_MINUTE or 30)")
+    parser.add_argument("--client-tpm", type=int, default=None,
+                        help="Aura's own Groq token quota (default GROQ_TOKENS_PER_MINUTE or 6000)")
+    parser.add_argument("--unique-prompts", action="store_true", help="make every prompt unique so caches never hit")
+    parser.add_argument("--workdir", default=None, help="scratch directory for caches and sessions (default: a new temp dir)")
+    parser.add_argument("--wav-dir", default=None, help="directory of WAV files for voice turns (default: generated tones)")
+    parser.add_argument("--json", default=None, help="also write the report to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show backend output instead of logging it to the workdir")
+    args = parser.parse_args()
+
+    services = start_fake_services(args.latency, args.jitter, args.distribution, args.error_rate, args.stall_rate,
+                                   args.groq_latency, requests_per_minute=args.rpm, image_seconds=args.image_seconds)
+    os.environ.update(services.env())
+    os.environ.update({"AURA_STT_ENGINE": "google", "AURA_TTS_ENGINES": "en:gtts;hi:gtts"})
+    if args.client_rpm:
+        os.environ["GROQ_REQUESTS_PER_MINUTE"] = str(args.client_rpm)
+    if args.client_tpm:
+        os.environ["GROQ_TOKENS_PER_MINUTE"] = str(args.client_tpm)
+    wav_paths = sorted(glob.glob(os.path.join(os.path.abspath(args.wav_dir), "*.wav"))) if args.wav_dir else []
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    # Backend keeps its caches and state in the working directory
+    workdir = args.workdir or tempfile.mkdtemp(prefix="aura-load-")
+    os.makedirs(workdir, exist_ok=True)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    for directory in ("load_images", "load_pdfs"):
+        os.makedirs(directory, exist_ok=True)
+    print(f"Fake services up; working directory {workdir}")
+
+    log = None if args.verbose else open("loadtest.log", "w", encoding="utf-8")
+    try:
+        with contextlib.redirect_stdout(log) if log else contextlib.nullcontext():
+            load_backend()
+            backend.phrase_bank.wait()  # Let the fixed phrases finish rendering before the clock starts
+            if not wav_paths:
+                wav_paths = [write_wav_fixture("load_voice.wav")]
+            clips = load_audio(wav_paths, backend.r)
+            report = asyncio.run(run_load(args, clips))
+            stats = backend_stats()
+    finally:
+        if log:
+            log.close()
+        services.shutdown()
+
+    report.print_table()
+    result = dict(report.summary(), backend=stats, services=services.stats(),
+                  settings=vars(args))
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Report written to {json_path}")
+    if log:
+        print(f"Backend output logged to {os.path.join(workdir, 'loadtest.log')}")
+
+
+if __name__ == "__main__":
+    main()
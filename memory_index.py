@@ -0,0 +1,205 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from context_window import estimate_tokens
+from semantic_cache import embed, EMBEDDING_DIM, STOP_WORDS
+
+# --- Long-Term Memory Index ---
+# Every finished exchange (user message plus Aura's reply) becomes one chunk
+# in a local retrieval index. A query is scored against all chunks by a blend
+# of embedding similarity (the hashing vectorizer of the semantic cache) and
+# BM25 keyword relevance, and only the best few snippets are put into the
+# prompt. Chunks are appended to disk as they arrive (metadata as JSON lines,
+# vectors as raw int8 rows), so updates never rewrite the whole index.
+
+INDEX_PATH = "memory_index"     # Files: memory_index.jsonl and memory_index.vec
+TOP_K = 4
+MAX_MEMORY_TOKENS = 300         # Budget for all retrieved snippets together
+MIN_SCORE = 0.3
+VECTOR_WEIGHT = 0.6             # Remainder goes to the keyword (BM25) score
+SNIPPET_CHARS = 400             # Long exchanges are cut to this length in the prompt
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_HALF_SCORE = 2.0           # BM25 score that earns half the keyword weight (bm25 / (bm25 + this))
+
+
+def _terms(text):
+    return [w for w in re.findall(r"\w+", text.lower().replace("'", "")) if w not in STOP_WORDS]
+
+
+def exchange_text(user_message, assistant_message):
+    return f"User: {user_message}\nAura: {assistant_message}"
+
+
+class MemoryIndex:
+    """Persistent vector + keyword index over past conversation exchanges."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.meta_path = path + ".jsonl"
+        self.vector_path = path + ".vec"
+        self._lock = threading.Lock()
+        self._chunks = []               # Per chunk: {"id", "text", "created"}
+        self._ids = set()
+        self._vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.int8)  # Grows geometrically
+        self._term_counts = []          # Per chunk: Counter of terms
+        self._lengths = []              # Per chunk: number of terms
+        self._postings = {}             # term -> set of chunk indices
+        self._total_terms = 0
+        self._load()
+
+    def __len__(self):
+        return len(self._chunks)
+
+    # --- Indexing ---
+
+    def _index(self, chunk, vector):
+        row = len(self._chunks)
+        if row >= len(self._vectors):
+            grown = np.zeros((max(256, 2 * len(self._vectors)), EMBEDDING_DIM), dtype=np.int8)
+            grown[:row] = self._vectors[:row]
+            self._vectors = grown
+        self._vectors[row] = vector
+        counts = Counter(_terms(chunk["text"]))
+        for term in counts:
+            self._postings.setdefault(term, set()).add(row)
+        self._term_counts.append(counts)
+        self._lengths.append(sum(counts.values()))
+        self._total_terms += self._lengths[-1]
+        self._chunks.append(chunk)
+        self._ids.add(chunk["id"])
+
+    def add_exchange(self, user_message, assistant_message):
+        """Indexes one exchange and appends it to disk; exchanges already indexed are skipped."""
+        text = exchange_text(user_message, assistant_message)
+        chunk_id = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        vector = np.round(embed(text) * 127).astype(np.int8)
+        chunk = {"id": chunk_id, "text": text, "created": time.time()}
+        with self._lock:
+            if chunk_id in self._ids:
+                return False
+            try:
+                # If the two files ever disagree, _load re-embeds the chunks and rewrites the vectors
+                with open(self.vector_path, "ab") as f:
+                    f.write(vector.tobytes())
+                with open(self.meta_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"Error saving memory index: {e}")
+            self._index(chunk, vector)
+            return True
+
+    def add_history(self, history):
+        """Indexes the user/assistant exchanges of a conversation history list."""
+        added = 0
+        for previous, message in zip(history, history[1:]):
+            if previous.get("role") == "user" and message.get("role") == "assistant":
+                added += self.add_exchange(previous["content"], message["content"])
+        return added
+
+    # --- Retrieval ---
+
+    def _keyword_scores(self, terms):
+        count = len(self._chunks)
+        average_length = self._total_terms / count if count else 0
+        scores = np.zeros(count, dtype=np.float32)
+        for term in set(terms):
+            rows = self._postings.get(term)
+            if not rows:
+                continue
+            idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            for row in rows:
+                tf = self._term_counts[row][term]
+                scores[row] += idf * tf * (BM25_K1 + 1) / (
+                    tf + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[row] / (average_length or 1)))
+        return scores
+
+    def search(self, query, top_k=TOP_K, exclude_texts=()):
+        """
+        Returns up to top_k (score, text) pairs for the chunks most relevant to query.
+        Chunks whose text is in exclude_texts (e.g. turns already in the prompt) are skipped.
+        """
+        query_vector = embed(query)
+        with self._lock:
+            if not self._chunks:
+                return []
+            vector_scores = (self._vectors[:len(self._chunks)].astype(np.float32) / 127) @ query_vector
+            keyword_scores = self._keyword_scores(_terms(query))
+            # Absolute scale: a single weak shared word must not earn the full keyword weight
+            keyword_scores /= keyword_scores + BM25_HALF_SCORE
+            scores = VECTOR_WEIGHT * vector_scores + (1 - VECTOR_WEIGHT) * keyword_scores
+            results = []
+            for row in np.argsort(-scores):
+                if scores[row] < MIN_SCORE or len(results) == top_k:
+                    break
+                text = self._chunks[row]["text"]
+                if text not in exclude_texts:
+                    results.append((float(scores[row]), text))
+            return results
+
+    def prompt_context(self, query, exclude_texts=(), max_tokens=MAX_MEMORY_TOKENS):
+        """Returns a system message with the relevant past snippets (as a list, empty if none)."""
+        lines, used = [], 0
+        for _, text in self.search(query, exclude_texts=exclude_texts):
+            snippet = text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS].rstrip() + " …"
+            cost = estimate_tokens(snippet)
+            if used + cost > max_tokens:
+                break
+            lines.append(snippet)
+            used += cost
+        if not lines:
+            return []
+        notes = "\n---\n".join(lines)
+        return [{"role": "system", "content": f"Possibly relevant notes from earlier conversations:\n{notes}"}]
+
+    # --- Persistence ---
+
+    def _load(self):
+        chunks = []
+        good_bytes = 0              # End of the last complete, parseable line
+        try:
+            with open(self.meta_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete line")
+                        chunks.append(json.loads(line.decode("utf-8")))
+                    except ValueError:
+                        break  # Torn line from an interrupted write
+                    good_bytes += len(line)
+                torn = f.seek(0, 2) > good_bytes
+            if torn:
+                # Cut the file back so new exchanges are not appended onto the partial line
+                print("Memory index: dropping a partially written record.")
+                with open(self.meta_path, "r+b") as f:
+                    f.truncate(good_bytes)
+            vectors = np.fromfile(self.vector_path, dtype=np.int8)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error loading memory index: {e}")
+            return
+        if len(vectors) > len(chunks) * EMBEDDING_DIM and len(vectors) % EMBEDDING_DIM == 0:
+            # The vector of a record whose metadata never made it to disk; trim it
+            vectors = vectors[:len(chunks) * EMBEDDING_DIM]
+            try:
+                with open(self.vector_path, "r+b") as f:
+                    f.truncate(len(vectors))
+            except Exception as e:
+                print(f"Error saving memory index: {e}")
+        if len(vectors) != len(chunks) * EMBEDDING_DIM:
+            print("Memory index vectors out of sync; re-embedding past conversations.")
+            vectors = np.round(np.array([embed(c["text"]) for c in chunks]) * 127).astype(np.int8)
+            try:
+                vectors.reshape(-1).tofile(self.vector_path)
+            except Exception as e:
+                print(f"Error saving memory index: {e}")
+        vectors = vectors.reshape(-1, EMBEDDING_DIM)
+        for chunk, vector in zip(chunks, vectors):
+            self._index(chunk, vector)
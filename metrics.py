@@ -0,0 +1,63 @@
+import threading
+from collections import deque
+
+# --- Latency Metrics ---
+# Small thread-safe latency recorder shared by the speech engines and the LLM
+# client. It keeps running totals plus a window of recent samples for
+# percentiles, which is all the engine selection logic needs.
+
+WINDOW_SIZE = 200
+
+
+class LatencyStats:
+    """Counts calls and errors and keeps recent latencies (seconds) for percentiles."""
+
+    def __init__(self, window=WINDOW_SIZE):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self._recent.append(seconds)
+                self.total_seconds += seconds
+            else:
+                self.errors += 1
+
+    def percentile(self, pct, default=None):
+        """Returns the pct-th percentile of recent successful calls, or default if there are none."""
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return default
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    @property
+    def mean(self):
+        with self._lock:
+            ok_calls = self.calls - self.errors
+            return self.total_seconds / ok_calls if ok_calls else None
+
+    @property
+    def error_rate(self):
+        with self._lock:
+            return self.errors / self.calls if self.calls else 0.0
+
+    def snapshot(self):
+        """Returns the stats as a plain dict (for printing or JSON)."""
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": ms(self.mean),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
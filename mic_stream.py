@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+
+import speech_recognition as sr
+
+from vad import VadConfig, VoiceActivityDetector, Endpointer
+
+# --- Persistent Microphone Stream ---
+# The microphone is opened once and calibrated once. A capture thread keeps
+# reading frames into a ring buffer and classifies them with the VAD (whose
+# noise floor keeps adapting while nobody is speaking), so each voice turn only
+# has to cut its phrase out of the buffer instead of reopening the device and
+# recalibrating. End of speech is decided by the VAD endpointer.
+
+CALIBRATION_SECONDS = 0.5
+RING_SECONDS = 10           # Audio kept in the ring buffer
+PRE_ROLL_SECONDS = 0.3      # Audio kept from just before speech onset
+
+
+class MicrophoneStream:
+    """Long-lived microphone capture with VAD endpointing and a ring buffer."""
+
+    def __init__(self, device_index=None, vad_config=None):
+        self.device_index = device_index
+        self.vad_config = vad_config or VadConfig()
+        self.vad = None
+        self._microphone = None
+        self._frames = None         # deque of (sequence number, frame bytes, speech flags)
+        self._next_seq = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._error = None
+
+    def start(self):
+        """Opens the microphone, calibrates the noise floor and starts capturing."""
+        if self._running:
+            return
+        if self._microphone is not None:
+            self.stop()  # Capture died (or calibration failed); release the old device before reopening
+        self._microphone = sr.Microphone(device_index=self.device_index)
+        self._microphone.__enter__()
+        self.sample_rate = self._microphone.SAMPLE_RATE
+        self.sample_width = self._microphone.SAMPLE_WIDTH
+        self.chunk = self._microphone.CHUNK
+        self.frame_seconds = self.chunk / self.sample_rate
+        self._frames = deque(maxlen=int(RING_SECONDS / self.frame_seconds))
+
+        # One-time calibration; afterwards the VAD keeps adapting on quiet frames
+        self.vad = VoiceActivityDetector(self.sample_rate, self.vad_config)
+        calibration_frames = max(1, int(CALIBRATION_SECONDS / self.frame_seconds))
+        self.vad.calibrate(b"".join(self._read() for _ in range(calibration_frames)))
+
+        self._running = True
+        self._error = None
+        self._thread = threading.Thread(target=self._capture, name="aura-mic", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops capturing and releases the microphone."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        if self._microphone is not None:
+            self._microphone.__exit__(None, None, None)
+            self._microphone = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def _read(self):
+        return self._microphone.stream.read(self.chunk)
+
+    def _capture(self):
+        while self._running:
+            try:
+                frame = self._read()
+            except Exception as e:
+                print(f"Microphone capture stopped: {e}")
+                self._error = e
+                self._running = False
+                break
+            flags = self.vad.classify(frame)
+            with self._condition:
+                self._frames.append((self._next_seq, frame, flags))
+                self._next_seq += 1
+                self._condition.notify_all()
+        with self._condition:
+            self._condition.notify_all()
+
+    def _frames_from(self, seq, deadline):
+        """Blocks until frames newer than seq exist (or the deadline passes) and returns them."""
+        with self._condition:
+            while self._running and self._next_seq <= seq:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+            if not self._running and self._error is not None:
+                raise OSError(f"Microphone is not capturing: {self._error}")
+            oldest = self._frames[0][0] if self._frames else self._next_seq
+            start = max(seq, oldest)
+            return [item for item in self._frames if item[0] >= start]
+
+    def listen(self, timeout=None, phrase_time_limit=None):
+        """
+        Returns the next spoken phrase as sr.AudioData.
+        Only audio captured after the call is considered (plus a short pre-roll).
+        Raises sr.WaitTimeoutError if nobody starts speaking within timeout seconds.
+        """
+        self.start()
+        with self._condition:
+            seq = self._next_seq
+        start_time = time.monotonic()
+        endpointer = Endpointer(self.vad_config, max_utterance_s=phrase_time_limit)
+        pre_roll = deque(maxlen=max(1, int(PRE_ROLL_SECONDS / self.frame_seconds)))
+        phrase = []
+
+        while True:
+            deadline = start_time + timeout if (timeout and not phrase) else None
+            items = self._frames_from(seq, deadline)
+            if not items:
+                if not self._running:
+                    raise OSError("Microphone stream stopped.")
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+            for item_seq, frame, flags in items:
+                seq = item_seq + 1
+                event = endpointer.update(flags)
+                if not phrase:
+                    pre_roll.append(frame)
+                    if event is None:
+                        continue
+                    phrase.extend(pre_roll)
+                else:
+                    phrase.append(frame)
+                if event == "end":
+                    return sr.AudioData(b"".join(phrase), self.sample_rate, self.sample_width)
+            if not phrase and timeout and time.monotonic() - start_time > timeout:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
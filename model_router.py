@@ -0,0 +1,136 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from metrics import LatencyStats
+from semantic_cache import embed
+
+# --- Model Router ---
+# Each turn is routed to the fast 8b model or the stronger 70b model using
+# cheap local features of the prompt: length, greetings and small talk,
+# yes/no answers, reasoning and coding keywords, math. Explicit rules (regex
+# -> model) are checked first and can be supplied in a JSON file, so routing
+# can be corrected without code changes. Latency and a simple quality signal
+# (did the user immediately re-ask the same question?) are kept per model.
+# Re-asks are detected within a session, so concurrent conversations never
+# count as re-asking each other.
+
+FAST_MODEL = "llama3-8b-8192"
+STRONG_MODEL = "llama3-70b-8192"
+RULES_FILE = "model_rules.json"   # Optional: [{"pattern": "<regex>", "model": "<model id>"}, ...]
+LONG_PROMPT_WORDS = 40
+STRONG_SCORE = 2                  # Prompts scoring at least this go to the strong model
+REASK_SIMILARITY = 0.75           # Next prompt this similar to the last one counts as a re-ask
+REASK_SESSIONS = 1000             # Sessions whose previous turn is remembered, least recently used dropped
+
+SMALL_TALK = {
+    "hi", "hello", "hey", "namaste", "thanks", "thank you", "ok", "okay", "cool", "nice", "great",
+    "good morning", "good night", "good evening", "how are you", "whats up", "who are you",
+    "yes", "no", "yeah", "nope", "sure", "haan", "nahi", "theek hai", "shukriya", "dhanyavad",
+}
+REASONING_WORDS = {
+    "why", "explain", "compare", "analyze", "analyse", "difference", "prove", "derive", "calculate",
+    "solve", "plan", "design", "evaluate", "summarize", "summarise", "essay", "story", "code",
+    "program", "function", "debug", "algorithm", "step", "steps", "pros", "cons", "strategy",
+    "translate", "detailed", "detail", "write",
+}
+MATH_PATTERN = re.compile(r"\d+\s*[-+*/^%]\s*\d+|\b(integral|derivative|equation|probability)\b")
+CODE_PATTERN = re.compile(r"```|\bdef |\bclass |[{};]\s*$|\bSELECT\b", re.MULTILINE)
+
+
+def prompt_features(text):
+    """Cheap local features of a prompt used for routing."""
+    lowered = " ".join(re.findall(r"\w+", text.lower().replace("'", "")))
+    words = lowered.split()
+    return {
+        "words": len(words),
+        "small_talk": lowered in SMALL_TALK or (len(words) <= 4 and any(p in lowered for p in SMALL_TALK if " " in p)),
+        "reasoning_words": sum(1 for w in words if w in REASONING_WORDS),
+        "math": bool(MATH_PATTERN.search(text.lower())),
+        "code": bool(CODE_PATTERN.search(text)),
+        "questions": text.count("?"),
+    }
+
+
+def load_rules(path=RULES_FILE):
+    """Reads routing rules from a JSON file; returns [] if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [(re.compile(rule["pattern"], re.IGNORECASE), rule["model"]) for rule in json.load(f)]
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        print(f"Error loading model routing rules: {e}")
+        return []
+
+
+class ModelRouter:
+    """Chooses between a fast and a strong model per turn and keeps per-model stats."""
+
+    def __init__(self, fast_model=FAST_MODEL, strong_model=STRONG_MODEL, rules=None, forced_model=None):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.rules = list(rules) if rules is not None else load_rules()
+        self.forced_model = forced_model          # Routes everything to one model when set
+        self._lock = threading.Lock()
+        self._latency = {}                        # model -> LatencyStats
+        self._reasks = {}                         # model -> re-asked answers
+        self._routed = {}                         # model -> turns routed
+        self._last = OrderedDict()                # session id -> (prompt vector, model) of its previous turn
+
+    def add_rule(self, pattern, model):
+        """Adds a rule ahead of the existing ones; prompts matching pattern go to model."""
+        self.rules.insert(0, (re.compile(pattern, re.IGNORECASE), model))
+
+    def choose(self, prompt):
+        """Returns (model, reason) for a prompt."""
+        if self.forced_model:
+            return self.forced_model, "forced"
+        for pattern, model in self.rules:
+            if pattern.search(prompt):
+                return model, f"rule {pattern.pattern!r}"
+        features = prompt_features(prompt)
+        if features["small_talk"]:
+            return self.fast_model, "small talk"
+        score = features["reasoning_words"] + 2 * (features["math"] or features["code"])
+        score += features["words"] >= LONG_PROMPT_WORDS
+        score += features["questions"] > 1
+        if score >= STRONG_SCORE:
+            return self.strong_model, f"complexity {score}"
+        return self.fast_model, f"complexity {score}"
+
+    def route(self, prompt, session_id=None):
+        """Chooses a model for this turn, logs the decision and notes whether it re-asks the session's last turn."""
+        model, reason = self.choose(prompt)
+        vector = embed(prompt)
+        with self._lock:
+            last = self._last.pop(session_id, None)
+            if last is not None and float(last[0] @ vector) >= REASK_SIMILARITY:
+                # The previous answer apparently did not satisfy; count it against that model
+                self._reasks[last[1]] = self._reasks.get(last[1], 0) + 1
+            self._last[session_id] = (vector, model)
+            while len(self._last) > REASK_SESSIONS:
+                self._last.popitem(last=False)
+            self._routed[model] = self._routed.get(model, 0) + 1
+        print(f"[Router] {model} ({reason})")
+        return model
+
+    def record(self, model, seconds, ok=True):
+        """Records the latency and outcome of one request to model."""
+        with self._lock:
+            stats = self._latency.setdefault(model, LatencyStats())
+        stats.record(seconds, ok)
+
+    def stats(self):
+        """Returns per-model routing counts, latency and re-ask rate."""
+        with self._lock:
+            models = set(self._routed) | set(self._latency)
+            report = {}
+            for model in models:
+                routed = self._routed.get(model, 0)
+                entry = self._latency[model].snapshot() if model in self._latency else {}
+                entry["routed"] = routed
+                entry["reask_rate"] = round(self._reasks.get(model, 0) / routed, 3) if routed else 0.0
+                report[model] = entry
+            return report
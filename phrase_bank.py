@@ -0,0 +1,60 @@
+import threading
+
+# --- Phrase Bank ---
+# Fixed assistant phrases (greetings, error and acknowledgement prompts) are
+# rendered once per language in a low-priority background thread and kept as
+# a single audio blob each, so speaking them needs no synthesis at all.
+
+
+class PhraseBank:
+    """Pre-rendered audio for the fixed phrases Aura speaks, per language."""
+
+    def __init__(self, phrases, langs, render):
+        self.phrases = list(phrases)
+        self.langs = list(langs)
+        self._render = render     # render(text, lang) -> audio bytes
+        self._audio = {}          # (phrase, lang) -> audio bytes
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @staticmethod
+    def _normalize(text):
+        return " ".join(text.split())
+
+    def warm(self):
+        """Starts rendering every phrase in the background (no-op if already running)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._warm_all, name="aura-phrase-bank", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Blocks until the background rendering has finished; returns False on timeout."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def _warm_all(self):
+        for lang in self.langs:
+            for phrase in self.phrases:
+                try:
+                    self.load(phrase, lang)
+                except Exception as e:
+                    print(f"Phrase bank could not render '{phrase}' ({lang}): {e}")
+
+    def load(self, phrase, lang):
+        """Renders a phrase now (if needed) and returns its audio."""
+        key = (self._normalize(phrase), lang)
+        with self._lock:
+            audio = self._audio.get(key)
+        if audio is None:
+            audio = self._render(phrase, lang)
+            with self._lock:
+                self._audio[key] = audio
+        return audio
+
+    def get(self, text, lang):
+        """Returns the pre-rendered audio for text, or None if it is not a ready phrase."""
+        with self._lock:
+            return self._audio.get((self._normalize(text), lang))
@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+
+import tracing
+from metrics import LatencyStats
+
+# --- Groq Rate Limiter ---
+# One limiter is shared by every Groq caller (chat turns from the GUI and the
+# voice loop, hedge requests, the background summarizer). It keeps a token
+# bucket for requests and one for tokens, re-synchronizes them from Groq's
+# x-ratelimit-* response headers, and pauses everyone after a 429 until the
+# retry-after time. Callers wait in a priority queue instead of failing, and
+# only the head of the queue may take from the buckets, so interactive turns
+# overtake background work. asyncio callers share the same queue through
+# acquire_async(), which sleeps on the event loop instead of blocking a thread.
+
+REQUESTS_PER_MINUTE = 30
+TOKENS_PER_MINUTE = 6000
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+ASYNC_POLL_SECONDS = 0.05     # How often asyncio waiters re-check the queue (they can't be notified)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_HEDGE = 1
+PRIORITY_BACKGROUND = 2
+
+
+def parse_duration(value):
+    """Parses Groq reset durations such as "7.66s", "2m59.56s", "1h2m3s" or "120ms" into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE_SECONDS, cap=BACKOFF_MAX_SECONDS):
+    """Exponential backoff with jitter: a random delay between half and all of base * 2^attempt (capped)."""
+    delay = min(cap, base * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate tokens per second."""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self._last = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def sync(self, remaining, now):
+        """Adopts the server's view of what is left in the current window."""
+        self._refill(now)
+        self.level = min(self.capacity, remaining)
+
+
+class RateLimiter:
+    """Shared request/token quota with priority queueing, header sync and 429 pauses."""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self._waiting = []                 # Heap of (priority, ticket number)
+        self._tickets = itertools.count()
+        self._paused_until = 0.0
+        self.wait_stats = LatencyStats()
+        self.throttled = 0                 # 429 responses seen
+        self.max_queue_depth = 0
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._waiting)
+
+    def acquire(self, tokens=1, priority=PRIORITY_INTERACTIVE, timeout=None, cancelled=None):
+        """
+        Blocks until this caller is first in line and both quotas allow the request.
+        Returns the seconds waited, or None if the cancelled Event was set while
+        waiting (call wake() after setting it); raises TimeoutError if timeout passes first.
+        """
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        return None
+                    delay = self._poll(ticket, tokens, start, timeout)
+                    if delay == 0:
+                        break
+                    self._cond.wait(delay)
+            finally:
+                self._dequeue(ticket)
+        waited = time.monotonic() - start
+        self.wait_stats.record(waited)
+        tracing.add_span("rate_limit_wait", start, priority=priority)
+        return waited
+
+    async def acquire_async(self, tokens=1, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        asyncio variant of acquire(); cancel the awaiting task to give up.
+        Returns the seconds waited; raises TimeoutError if timeout passes first.
+        """
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._poll(ticket, tokens, start, timeout)
+                if delay == 0:
+                    break
+                await asyncio.sleep(ASYNC_POLL_SECONDS if delay is None else min(delay, ASYNC_POLL_SECONDS * 4))
+        finally:
+            with self._cond:
+                self._dequeue(ticket)
+        waited = time.monotonic() - start
+        self.wait_stats.record(waited)
+        tracing.add_span("rate_limit_wait", start, priority=priority)
+        return waited
+
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._tickets))
+        heapq.heappush(self._waiting, ticket)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+        return ticket
+
+    def _dequeue(self, ticket):
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+        self._cond.notify_all()
+
+    def _poll(self, ticket, tokens, start, timeout):
+        """
+        Takes the quota if ticket is first in line and both buckets allow it (returns 0).
+        Otherwise returns how long to wait (None: until the queue changes). Call with the lock held.
+        """
+        now = time.monotonic()
+        delay = None
+        if self._waiting[0] == ticket:
+            delay = max(self._paused_until - now,
+                        self._requests.wait_time(1, now),
+                        self._tokens.wait_time(tokens, now))
+            if delay <= 0:
+                self._requests.take(1, now)
+                self._tokens.take(tokens, now)
+                return 0
+        if timeout is not None:
+            remaining = start + timeout - now
+            if remaining <= 0 or (delay is not None and delay > remaining):
+                # Out of time, or first in line but the quota frees up too late
+                self.wait_stats.record(now - start, ok=False)
+                raise TimeoutError(f"Rate limiter queue wait exceeded {timeout:.1f}s")
+            delay = remaining if delay is None else min(delay, remaining)
+        return delay
+
+    def wake(self):
+        """Makes waiting callers re-check their cancellation flags."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def observe_headers(self, headers):
+        """Re-synchronizes the buckets from Groq's x-ratelimit-* and retry-after headers."""
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._cond:
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            if limit_tokens and limit_tokens.isdigit() and int(limit_tokens) != self._tokens.capacity:
+                # Groq token limits are per minute; follow the account's real quota
+                self._tokens.capacity = int(limit_tokens)
+                self._tokens.rate = int(limit_tokens) / 60
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens and remaining_tokens.isdigit():
+                self._tokens.sync(int(remaining_tokens), now)
+            # Groq request limits are per day; only an exhausted quota matters here
+            if headers.get("x-ratelimit-remaining-requests") == "0":
+                reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+            retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            self._cond.notify_all()
+
+    def on_throttled(self, headers=None, attempt=0):
+        """Records a 429 and pauses all callers (retry-after, or jittered backoff without one)."""
+        with self._cond:
+            self.throttled += 1
+            if not headers or not headers.get("retry-after"):
+                self._paused_until = max(self._paused_until, time.monotonic() + backoff_delay(attempt))
+        self.observe_headers(headers)
+
+    def stats(self):
+        """Returns queue depth, wait-time and throttling metrics."""
+        with self._cond:
+            now = time.monotonic()
+            report = {
+                "queue_depth": len(self._waiting),
+                "max_queue_depth": self.max_queue_depth,
+                "throttled": self.throttled,
+                "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+                "tokens_available": int(self._tokens.level),
+            }
+        report["wait"] = self.wait_stats.snapshot()
+        return report
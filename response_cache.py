@@ -0,0 +1,95 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+# --- Exact-Match Response Cache ---
+# Replies are cached in SQLite under a hash of the normalized prompt, language,
+# model and the bit of context the answer depends on (the running summary and
+# the last exchange). Entries expire after a TTL and the table is kept to a
+# maximum size by evicting the least recently used rows.
+
+CACHE_FILE = "response_cache.sqlite3"
+TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 2000
+CONTEXT_MESSAGES = 2  # Trailing history messages that make a reply context-dependent
+
+
+def normalize_prompt(text):
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    text = " ".join(text.lower().split())
+    return re.sub(r"[\s.!?।]+$", "", text)
+
+
+def response_cache_key(prompt, lang_code, model, context_messages=()):
+    """Returns the cache key for a prompt in a given language, model and context."""
+    context_hash = hashlib.sha256(
+        json.dumps(list(context_messages), ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    payload = json.dumps([normalize_prompt(prompt), lang_code, model, context_hash], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed reply cache with TTL, LRU eviction and hit/miss counters."""
+
+    def __init__(self, path=CACHE_FILE, ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, main_response TEXT, follow_up TEXT,"
+                " created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl_seconds,))
+
+    def get(self, key):
+        """Returns (main_response, follow_up) for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT main_response, follow_up, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[2] < now - self.ttl_seconds:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0], row[1]
+
+    def put(self, key, main_response, follow_up=None):
+        """Stores a reply and evicts the least recently used rows beyond max_entries."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, main_response, follow_up, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, main_response, follow_up, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        """Returns hit/miss counters and the current number of entries."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+            }
@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from response_cache import TTL_SECONDS
+
+# --- Semantic Response Cache ---
+# Stand-alone questions are embedded locally with a hashing vectorizer (word
+# unigrams/bigrams plus character trigrams, no model download) and stored as
+# rows of a compact int8 (or float16) matrix. A lookup scores candidates by
+# cosine similarity and serves the cached answer above a threshold.
+# With approximate search on, candidates come from SimHash LSH buckets, so a
+# lookup only scores a few hundred rows even with tens of thousands cached.
+# Entries expire after the same TTL as the exact-match cache; expired rows are
+# skipped by lookups and dropped when the cache is loaded.
+
+EMBEDDING_DIM = 256
+SIMILARITY_THRESHOLD = 0.88
+MAX_ENTRIES = 50000
+LSH_BANDS = 10           # SimHash bands; sharing any one band makes a row a candidate
+LSH_BAND_BITS = 10       # Bits per band: ~30 candidates per band per 30k entries, ~86% recall at 0.88
+SCORE_BLOCK_ROWS = 8192  # Rows converted to float32 at a time during exact search
+CACHE_FILE = "semantic_cache.npz"
+
+# Words that point back into the conversation or at the people in it; questions using them are
+# not stand-alone. Deliberately broad: the semantic cache is shared by every session, so a
+# personal answer ("Your name is Alice.") must never be stored there.
+CONTEXT_WORDS = {
+    "it", "its", "that", "this", "these", "those", "he", "she", "him", "her", "they", "them",
+    "their", "above", "previous", "earlier", "again", "more", "also", "same", "else", "another",
+    "yes", "no", "ok", "okay",
+    "i", "im", "ive", "me", "my", "mine", "myself", "we", "us", "our", "ours",
+    "you", "your", "yours", "yourself", "just", "last", "before", "said", "say", "says", "told",
+    "asked", "ask", "mentioned", "conversation", "chat", "discussed", "far", "remember",
+}
+
+
+def is_standalone(question):
+    """True if the question can be answered without the conversation before it."""
+    words = re.findall(r"\w+", question.lower().replace("'", ""))
+    return len(words) >= 3 and not any(word in CONTEXT_WORDS for word in words)
+
+
+# Function words carry little meaning; they get a small weight so questions match on their content words
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "am", "do", "does", "did", "can", "could",
+    "would", "should", "will", "what", "whats", "i", "me",
+    "my", "you", "your", "we", "of", "to", "in", "on", "for", "with", "about", "and", "or", "please",
+    "tell", "explain", "give", "s",
+}
+STOP_WORD_WEIGHT = 0.1
+
+
+def _features(text):
+    words = re.findall(r"\w+", text.lower().replace("'", ""))
+    content = [w for w in words if w not in STOP_WORDS]
+    features = [(f"w:{w}", STOP_WORD_WEIGHT if w in STOP_WORDS else 1.0) for w in words]
+    features += [(f"b:{a} {b}", 0.7) for a, b in zip(content, content[1:])]
+    for word in content:
+        padded = f" {word} "
+        features += [(f"c:{padded[i:i + 3]}", 0.3) for i in range(len(padded) - 2)]
+    return features
+
+
+def embed(text, dim=EMBEDDING_DIM):
+    """Returns the L2-normalized hashing-vectorizer embedding of text (float32)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, weight in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))  # Stable across runs, unlike hash()
+        vector[h % dim] += weight if (h >> 31) & 1 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Near-duplicate question cache over a compact embedding matrix."""
+
+    def __init__(self, path=CACHE_FILE, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES,
+                 dtype="int8", approximate=True, ttl_seconds=TTL_SECONDS):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.dtype = np.dtype(dtype)   # int8 (smallest, fastest to score) or float16
+        self.approximate = approximate
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._storage = np.zeros((0, EMBEDDING_DIM), dtype=self.dtype)  # Grows geometrically
+        self._entries = []          # Per row: {"question", "lang", "model", "main", "follow_up", "created"}
+        self._next_slot = 0         # Once full, new entries overwrite the oldest row
+        rng = np.random.default_rng(0)
+        self._planes = rng.standard_normal((EMBEDDING_DIM, LSH_BANDS * LSH_BAND_BITS)).astype(np.float32)
+        self._buckets = [dict() for _ in range(LSH_BANDS)]  # Per band: {band value: set of rows}
+        self._dirty = False
+        self._saver = None
+        self._load()
+
+    @property
+    def _matrix(self):
+        return self._storage[:len(self._entries)]
+
+    # --- Encoding ---
+
+    def _encode(self, vectors):
+        if self.dtype == np.int8:
+            return np.round(vectors * 127).astype(np.int8)
+        return vectors.astype(self.dtype)
+
+    def _decode(self, rows):
+        rows = rows.astype(np.float32)
+        return rows / 127 if self.dtype == np.int8 else rows
+
+    def _bands(self, vectors):
+        bits = (np.atleast_2d(vectors) @ self._planes) > 0
+        weights = 1 << np.arange(LSH_BAND_BITS)
+        return [(bits[:, b * LSH_BAND_BITS:(b + 1) * LSH_BAND_BITS] * weights).sum(axis=1).tolist()
+                for b in range(LSH_BANDS)]
+
+    def _index_rows(self, start, end):
+        # Signatures come from the stored (quantized) rows so eviction removes exactly what was added
+        for band, values in enumerate(self._bands(self._decode(self._storage[start:end]))):
+            for row, value in enumerate(values, start):
+                self._buckets[band].setdefault(value, set()).add(row)
+
+    def _unindex_row(self, row):
+        for band, values in enumerate(self._bands(self._decode(self._storage[row:row + 1]))):
+            self._buckets[band].get(values[0], set()).discard(row)
+
+    def _reserve(self, rows):
+        if rows <= len(self._storage):
+            return
+        capacity = min(self.max_entries, max(1024, 2 * len(self._storage), rows))
+        storage = np.zeros((capacity, EMBEDDING_DIM), dtype=self.dtype)
+        storage[:len(self._storage)] = self._storage
+        self._storage = storage
+
+    # --- Lookup / insert ---
+
+    def _candidates(self, query):
+        """Rows sharing at least one LSH band with the query, or None for exact search."""
+        if not self.approximate:
+            return None
+        rows = set()
+        for band, values in enumerate(self._bands(query)):
+            rows |= self._buckets[band].get(values[0], set())
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+    def _score(self, query, rows):
+        if rows is not None:
+            return self._decode(self._storage[rows]) @ query
+        matrix = self._matrix
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            scores[start:start + SCORE_BLOCK_ROWS] = self._decode(matrix[start:start + SCORE_BLOCK_ROWS]) @ query
+        return scores
+
+    def lookup(self, question, lang, model):
+        """Returns (main_response, follow_up, similarity) of the closest match, or None."""
+        query = embed(question)
+        expired_before = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._candidates(query)
+            scores = self._score(query, rows) if self._entries else np.empty(0, dtype=np.float32)
+            row_ids = rows if rows is not None else np.arange(len(scores))
+            for index in np.argsort(-scores)[:8]:
+                if scores[index] < self.threshold:
+                    break
+                row = int(row_ids[index])
+                entry = self._entries[row]
+                if entry["created"] < expired_before:
+                    if self.approximate:
+                        self._unindex_row(row)  # Stale; not a candidate again until the row is reused
+                    continue
+                if entry["lang"] == lang and entry["model"] == model:
+                    self.hits += 1
+                    return entry["main"], entry["follow_up"], float(scores[index])
+            self.misses += 1
+            return None
+
+    def add(self, question, lang, model, main_response, follow_up=None):
+        """Caches the answer to a stand-alone question; the file is rewritten in the background."""
+        vector = embed(question)
+        entry = {"question": question, "lang": lang, "model": model,
+                 "main": main_response, "follow_up": follow_up, "created": time.time()}
+        with self._lock:
+            if len(self._entries) < self.max_entries:
+                row = len(self._entries)
+                self._reserve(row + 1)
+                self._entries.append(entry)
+            else:
+                row = self._next_slot
+                if self.approximate:
+                    self._unindex_row(row)
+                self._entries[row] = entry
+                self._next_slot = (row + 1) % self.max_entries
+            self._storage[row] = self._encode(vector)
+            if self.approximate:
+                self._index_rows(row, row + 1)
+            self._dirty = True
+            if self._saver is None or not self._saver.is_alive():
+                self._saver = threading.Thread(target=self.save, name="aura-semantic-cache", daemon=True)
+                self._saver.start()
+
+    def stats(self):
+        """Returns hit/miss counters, the number of entries and the matrix size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "matrix_bytes": int(self._matrix.nbytes),
+            }
+
+    # --- Persistence ---
+
+    def save(self):
+        """Atomically writes the matrix and entries to disk while there are unsaved changes."""
+        while True:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                matrix = self._matrix.copy()
+                entries, next_slot = list(self._entries), self._next_slot
+            meta = json.dumps({"entries": entries, "next_slot": next_slot}, ensure_ascii=False)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, matrix=matrix, meta=np.array(meta))
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"Error saving semantic cache: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                matrix = data["matrix"]
+                meta = json.loads(str(data["meta"]))
+        except Exception as e:
+            print(f"Error loading semantic cache: {e}")
+            return
+        entries = meta.get("entries", [])[:min(self.max_entries, len(matrix))]
+        next_slot = meta.get("next_slot", 0) % self.max_entries
+        expired_before = time.time() - self.ttl_seconds
+        keep = list(range(len(entries)))
+        if any(entry["created"] < expired_before for entry in entries):
+            # Drop expired rows, keeping the rest oldest first so the next overwrite still hits the oldest
+            order = list(range(next_slot, len(entries))) + list(range(min(next_slot, len(entries))))
+            keep = [row for row in order if entries[row]["created"] >= expired_before]
+            print(f"Semantic cache: dropped {len(entries) - len(keep)} expired entries")
+            next_slot = 0
+            self._dirty = True  # Written with the next added entry
+        entries = [entries[row] for row in keep]
+        scale = 127 if matrix.dtype == np.int8 else 1
+        self._reserve(len(entries))
+        self._storage[:len(entries)] = self._encode(matrix[keep].astype(np.float32) / scale)
+        self._entries = entries
+        self._next_slot = next_slot
+        if self.approximate:
+            self._index_rows(0, len(entries))
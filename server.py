@@ -0,0 +1,642 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+import backend
+import async_backend
+from cancellation import POLICIES
+
+# --- Headless Server ---
+# Serves the backend to many clients (e.g. a room of kiosks) from one process
+# without the GUI. Everything runs as coroutines on one asyncio event loop:
+# a plain HTTP/1.1 JSON API plus a WebSocket per session for streamed chat
+# turns. Sessions are kept in memory with bounded history, evicted when idle
+# or least recently used, and persisted under sessions/ so a client can
+# reconnect with its session id. Server sessions never speak aloud and stay
+# out of the shared long-term memory index.
+#
+#   POST   /sessions                      {"session_id"?, "turn_policy"?} -> session settings
+#   GET    /sessions/<id>                 session settings
+#   DELETE /sessions/<id>                 ends the session and deletes its saved state
+#   GET    /sessions/<id>/history         {"summary", "history"}
+#   POST   /sessions/<id>/messages        {"message", "lang"?} -> {"response", "follow_up", "cancelled", "trace_id"}
+#   GET    /sessions/<id>/ws              WebSocket, see handle_websocket
+#   POST   /tts                           {"text", "lang"?} -> audio bytes
+#   POST   /images                        {"prompt"} -> 202 {"job_id", "status"}
+#   GET    /images/<job id>               {"job_id", "status", "url"?, "error"?}
+#   GET    /stats, GET /health
+#
+#   python server.py --host 0.0.0.0 --port 8765
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_SESSIONS = 1000             # Least recently used sessions are evicted beyond this
+SESSION_IDLE_SECONDS = 1800     # Sessions unused for this long are evicted
+MAX_SESSION_MESSAGES = 40       # History messages kept in memory per session (older ones live in the summary)
+MAX_HEADER_BYTES = 16 * 1024
+REQUEST_IDLE_SECONDS = 30       # Connections that send no complete request within this are closed
+MAX_BODY_BYTES = 1024 * 1024
+MAX_WS_MESSAGE_BYTES = 64 * 1024
+MAX_MESSAGE_CHARS = 4000
+MAX_TTS_CHARS = 2000
+MAX_IMAGE_JOBS = 1000           # Finished image jobs are forgotten oldest first beyond this
+IMAGE_CONCURRENCY = 4
+EVICTION_INTERVAL_SECONDS = 60
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+REASONS = {200: "OK", 202: "Accepted", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """Turned into a JSON error response with the given status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    def __init__(self, method, target, version, headers, body=b""):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.version = version
+        self.headers = headers      # Lower-cased names
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return data
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        return connection != "close" if self.version == "HTTP/1.1" else connection == "keep-alive"
+
+
+class Response:
+    def __init__(self, status=200, body=b"", content_type="application/json", headers=None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    @classmethod
+    def json(cls, payload, status=200):
+        return cls(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+
+def audio_content_type(audio):
+    """Guesses the MIME type of synthesized audio from its first bytes."""
+    if audio[:4] == b"RIFF":
+        return "audio/wav"
+    if audio[:4] == b"OggS":
+        return "audio/ogg"
+    return "audio/mpeg"
+
+
+def required_text(data, key, limit):
+    value = data.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, f"'{key}' must be a non-empty string")
+    if len(value) > limit:
+        raise HTTPError(413, f"'{key}' is longer than {limit} characters")
+    return value.strip()
+
+# --- WebSocket ---
+
+class WebSocket:
+    """Minimal RFC 6455 server side: text messages, ping/pong, fragmentation and close."""
+
+    def __init__(self, reader, writer, max_message_bytes=MAX_WS_MESSAGE_BYTES):
+        self.reader = reader
+        self.writer = writer
+        self.max_message_bytes = max_message_bytes
+        self.closed = False
+        self._write_lock = asyncio.Lock()
+
+    @staticmethod
+    def accept_key(key):
+        digest = hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()
+        return base64.b64encode(digest).decode("ascii")
+
+    async def receive(self):
+        """Returns the next text message, or None once the connection is closed."""
+        fragments = []
+        size = 0
+        while not self.closed:
+            try:
+                opcode, fin, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                return None
+            if opcode == 0x8:       # Close
+                await self.close()
+                return None
+            if opcode == 0x9:       # Ping
+                await self._send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:       # Pong
+                continue
+            size += len(payload)
+            if size > self.max_message_bytes:
+                await self.close(1009)
+                return None
+            fragments.append(payload)
+            if fin:
+                try:
+                    return b"".join(fragments).decode("utf-8")
+                except UnicodeDecodeError:
+                    await self.close(1007)
+                    return None
+        return None
+
+    async def _read_frame(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await self.reader.readexactly(8))[0]
+        if length > self.max_message_bytes:
+            raise ConnectionError("WebSocket frame too large")
+        mask = await self.reader.readexactly(4) if second & 0x80 else None
+        payload = await self.reader.readexactly(length)
+        if mask and payload:
+            # XOR with the repeated 4-byte key, done on big integers instead of byte by byte
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+        return first & 0x0F, bool(first & 0x80), payload
+
+    async def _send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        async with self._write_lock:
+            self.writer.write(header + payload)
+            await self.writer.drain()
+
+    async def send_json(self, payload):
+        if self.closed:
+            return
+        try:
+            await self._send_frame(0x1, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        except ConnectionError:
+            self.closed = True
+
+    async def close(self, code=1000):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._send_frame(0x8, struct.pack("!H", code))
+        except ConnectionError:
+            pass
+
+# --- Sessions and Jobs ---
+
+class SessionStore:
+    """In-memory sessions with LRU and idle eviction; evicted sessions can be resumed from disk."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS,
+                 max_history=MAX_SESSION_MESSAGES):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_history = max_history
+        self._sessions = OrderedDict()    # session_id -> [Session, last used], least recently used first
+        self.created = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def open(self, session_id=None, turn_policy=None):
+        """Returns the session with session_id (resumed from its saved state if needed) or a new one."""
+        if session_id is not None:
+            if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+                raise HTTPError(400, "session_id may only contain letters, digits, '-' and '_' (max 64)")
+            if session_id in self._sessions:
+                return self.get(session_id)
+        turn_policy = turn_policy or backend.TURN_POLICY
+        if turn_policy not in POLICIES:
+            raise HTTPError(400, f"turn_policy must be one of {', '.join(POLICIES)}")
+        session = backend.create_session(session_id or uuid.uuid4().hex[:12], resume=session_id is not None,
+                                         turn_policy=turn_policy, max_history=self.max_history, remember=False)
+        self._sessions[session.session_id] = [session, time.monotonic()]
+        self.created += 1
+        while len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions)))
+        return session
+
+    def get(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            raise HTTPError(404, f"Unknown session '{session_id}'")
+        entry[1] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return entry[0]
+
+    def delete(self, session_id):
+        session = self.get(session_id)
+        self._evict(session_id)
+        try:
+            os.remove(session.summarizer.state_path)
+        except OSError:
+            pass
+
+    def _evict(self, session_id):
+        session, _ = self._sessions.pop(session_id)
+        session.turns.cancel_all("session closed")
+        self.evicted += 1
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for session_id, (session, last_used) in list(self._sessions.items()):
+            if last_used < cutoff and session.turns.stats()["active"] == 0:
+                self._evict(session_id)
+
+    def stats(self):
+        return {"active": len(self._sessions), "created": self.created, "evicted": self.evicted,
+                "max_sessions": self.max_sessions, "max_history": self.max_history}
+
+
+class ImageJobs:
+    """Image generation jobs running in the background, polled by id."""
+
+    def __init__(self, concurrency=IMAGE_CONCURRENCY, max_jobs=MAX_IMAGE_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()        # job_id -> job dict, oldest first
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+
+    def submit(self, prompt):
+        job = {"job_id": uuid.uuid4().hex[:12], "status": "pending", "prompt": prompt}
+        self._jobs[job["job_id"]] = job
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._forget_finished()
+        return job
+
+    async def _run(self, job):
+        async with self._slots:
+            job["status"] = "running"
+            url = await async_backend.generate_image(job["prompt"])
+        if url:
+            job.update(status="done", url=str(url))
+        else:
+            job.update(status="failed", error="Image generation failed")
+
+    def _forget_finished(self):
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) <= self.max_jobs:
+                return
+            if job["status"] in ("done", "failed"):
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"Unknown image job '{job_id}'")
+        return job
+
+    def stats(self):
+        statuses = {}
+        for job in self._jobs.values():
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return statuses
+
+# --- Server ---
+
+class AuraServer:
+    """HTTP + WebSocket front-end for many concurrent sessions."""
+
+    ROUTES = [
+        ("GET", r"/health", "health"),
+        ("GET", r"/stats", "stats"),
+        ("POST", r"/sessions", "create_session"),
+        ("GET", r"/sessions/(?P<session_id>[^/]+)", "get_session"),
+        ("DELETE", r"/sessions/(?P<session_id>[^/]+)", "delete_session"),
+        ("GET", r"/sessions/(?P<session_id>[^/]+)/history", "history"),
+        ("POST", r"/sessions/(?P<session_id>[^/]+)/messages", "chat"),
+        ("POST", r"/tts", "tts"),
+        ("POST", r"/images", "create_image"),
+        ("GET", r"/images/(?P<job_id>[^/]+)", "get_image"),
+    ]
+    WEBSOCKET_ROUTE = re.compile(r"^/sessions/(?P<session_id>[^/]+)/ws$")
+
+    def __init__(self, sessions=None):
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.images = None              # Created on the running loop
+        self.connections = 0
+        self.requests = 0
+        self.started = time.monotonic()
+        self._routes = [(method, re.compile(f"^{pattern}$"), getattr(self, name)) for method, pattern, name in self.ROUTES]
+        self._server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.images = ImageJobs()
+        self._server = await asyncio.start_server(self.handle_connection, host, port,
+                                                  limit=MAX_HEADER_BYTES, backlog=1024)
+        asyncio.get_running_loop().create_task(self._evict_idle_sessions())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def _evict_idle_sessions(self):
+        while True:
+            await asyncio.sleep(EVICTION_INTERVAL_SECONDS)
+            self.sessions.evict_idle()
+
+    # --- Connection handling ---
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), REQUEST_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    return  # Idle keep-alive connection or a client trickling its request
+                except HTTPError as e:
+                    await self._write(writer, Response.json({"error": str(e)}, e.status), keep_alive=False)
+                    return
+                if request is None:
+                    return
+                self.requests += 1
+                if request.headers.get("upgrade", "").lower() == "websocket":
+                    await self._upgrade(request, reader, writer)
+                    return
+                response = await self._dispatch(request)
+                await self._write(writer, response, request.keep_alive)
+                if not request.keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None  # Client closed the keep-alive connection
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(400, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, version.upper(), headers, body)
+
+    async def _dispatch(self, request):
+        allowed = False
+        for method, pattern, handler in self._routes:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            if method != request.method:
+                allowed = True
+                continue
+            try:
+                return await handler(request, **match.groupdict())
+            except HTTPError as e:
+                return Response.json({"error": str(e)}, e.status)
+            except Exception as e:
+                print(f"[Server] {request.method} {request.path} failed: {e}")
+                return Response.json({"error": "Internal server error"}, 500)
+        if allowed:
+            return Response.json({"error": f"{request.method} not allowed on {request.path}"}, 405)
+        return Response.json({"error": f"No route for {request.path}"}, 404)
+
+    async def _write(self, writer, response, keep_alive=True):
+        headers = {"Content-Type": response.content_type, "Content-Length": str(len(response.body)),
+                   "Connection": "keep-alive" if keep_alive else "close"}
+        headers.update(response.headers)
+        head = f"HTTP/1.1 {response.status} {REASONS.get(response.status, '')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + response.body)
+        await writer.drain()
+
+    async def _upgrade(self, request, reader, writer):
+        match = self.WEBSOCKET_ROUTE.match(request.path)
+        key = request.headers.get("sec-websocket-key")
+        if not match or not key or request.method != "GET":
+            await self._write(writer, Response.json({"error": "WebSocket is only served on /sessions/<id>/ws"}, 400), False)
+            return
+        try:
+            session = self.sessions.get(match.group("session_id"))
+        except HTTPError as e:
+            await self._write(writer, Response.json({"error": str(e)}, e.status), False)
+            return
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {WebSocket.accept_key(key)}\r\n\r\n"
+        ).encode("latin-1"))
+        await writer.drain()
+        await self.handle_websocket(WebSocket(reader, writer), session)
+
+    # --- Chat turns ---
+
+    async def run_turn(self, session, message, lang=None, on_piece=None):
+        """Runs one chat turn in the session; streams pieces to on_piece if given. Returns the reply dict."""
+        with backend.tracer.trace("server", session.session_id, stream=on_piece is not None) as trace:
+            lang = lang or await async_backend.run_blocking(backend.detect_language, message)
+            trace.set(lang=lang)
+            async with session.turns.turn_async() as turn:
+                if on_piece is None:
+                    main_response, follow_up = await async_backend.get_ai_response(
+                        message, lang, cancel_token=turn, session=session)
+                else:
+                    streamed = {"response": "", "follow_up": ""}
+                    async for kind, text in async_backend.stream_ai_response(message, lang, cancel_token=turn, session=session):
+                        streamed[kind] += text
+                        await on_piece(kind, text)
+                    main_response, follow_up = streamed["response"].strip(), streamed["follow_up"].strip() or None
+                return {"response": main_response, "follow_up": follow_up, "lang": lang, "cancelled": turn.cancelled,
+                        "trace_id": trace.trace_id}
+
+    async def handle_websocket(self, ws, session):
+        """
+        Client messages:  {"type": "chat", "message", "lang"?}, {"type": "cancel"}, {"type": "ping"}
+        Server messages:  {"type": "token", "turn", "kind", "text"}, {"type": "done", "turn", "response",
+                          "follow_up", "cancelled", "trace_id"}, {"type": "error", "error"}, {"type": "pong"}
+        A new chat message applies the session's turn policy (by default it supersedes the running turn).
+        """
+        turns = set()
+        turn_numbers = iter(range(1, 1 << 62))
+
+        async def chat(number, message, lang):
+            async def send_piece(kind, text):
+                await ws.send_json({"type": "token", "turn": number, "kind": kind, "text": text})
+            try:
+                reply = await self.run_turn(session, message, lang, send_piece)
+                await ws.send_json(dict(reply, type="done", turn=number))
+            except Exception as e:
+                print(f"[Server] WebSocket turn failed: {e}")
+                await ws.send_json({"type": "error", "turn": number, "error": "Turn failed"})
+
+        try:
+            while True:
+                text = await ws.receive()
+                if text is None:
+                    break
+                try:
+                    data = json.loads(text)
+                    kind = data.get("type")
+                    if kind == "chat":
+                        message = required_text(data, "message", MAX_MESSAGE_CHARS)
+                        task = asyncio.get_running_loop().create_task(chat(next(turn_numbers), message, data.get("lang")))
+                        turns.add(task)
+                        task.add_done_callback(turns.discard)
+                    elif kind == "cancel":
+                        session.turns.cancel_all("cancelled by client")
+                    elif kind == "ping":
+                        await ws.send_json({"type": "pong"})
+                    else:
+                        raise HTTPError(400, f"Unknown message type '{kind}'")
+                except (ValueError, AttributeError):
+                    await ws.send_json({"type": "error", "error": "Messages must be JSON objects"})
+                except HTTPError as e:
+                    await ws.send_json({"type": "error", "error": str(e)})
+        finally:
+            for task in list(turns):
+                task.cancel()
+            await ws.close()
+
+    # --- HTTP handlers ---
+
+    async def health(self, request):
+        return Response.json({"status": "ok", "uptime_s": round(time.monotonic() - self.started, 1)})
+
+    async def stats(self, request):
+        return Response.json({
+            "server": {"connections": self.connections, "requests": self.requests, "images": self.images.stats()},
+            "sessions": self.sessions.stats(),
+            "models": backend.get_model_stats(),
+            "async_requests": async_backend.get_model_stats(),
+            "response_cache": backend.get_response_cache_stats(),
+            "single_flight": backend.get_single_flight_stats(),
+            "stages": backend.tracer.stage_stats(),
+        })
+
+    async def create_session(self, request):
+        data = request.json()
+        session = self.sessions.open(data.get("session_id"), data.get("turn_policy"))
+        return Response.json(session.settings())
+
+    async def get_session(self, request, session_id):
+        return Response.json(self.sessions.get(session_id).settings())
+
+    async def delete_session(self, request, session_id):
+        self.sessions.delete(session_id)
+        return Response(204)
+
+    async def history(self, request, session_id):
+        session = self.sessions.get(session_id)
+        return Response.json({"session_id": session_id, "summary": session.summarizer.summary,
+                              "history": session.history})
+
+    async def chat(self, request, session_id):
+        session = self.sessions.get(session_id)
+        data = request.json()
+        message = required_text(data, "message", MAX_MESSAGE_CHARS)
+        return Response.json(await self.run_turn(session, message, data.get("lang")))
+
+    async def tts(self, request):
+        data = request.json()
+        text = required_text(data, "text", MAX_TTS_CHARS)
+        lang = data.get("lang") or await async_backend.run_blocking(backend.detect_language, text)
+        if lang not in backend.SUPPORTED_LANGS:
+            raise HTTPError(400, f"lang must be one of {', '.join(backend.SUPPORTED_LANGS)}")
+        loop = asyncio.get_running_loop()
+        try:
+            audio = await loop.run_in_executor(backend.tts_executor, backend.synthesize_chunk, text, lang)
+        except Exception as e:
+            print(f"[Server] Speech synthesis failed: {e}")
+            raise HTTPError(503, "Speech synthesis is unavailable")
+        return Response(200, audio, audio_content_type(audio))
+
+    async def create_image(self, request):
+        prompt = required_text(request.json(), "prompt", MAX_MESSAGE_CHARS)
+        job = self.images.submit(prompt)
+        return Response.json({"job_id": job["job_id"], "status": job["status"]}, 202)
+
+    async def get_image(self, request, job_id):
+        return Response.json(self.images.get(job_id))
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, sessions=None):
+    server = AuraServer(sessions)
+    host, port = await server.start(host, port)
+    print(f"Aura server listening on http://{host}:{port}")
+    await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Aura as a headless HTTP/WebSocket service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--idle-timeout", type=float, default=SESSION_IDLE_SECONDS, help="Seconds before an idle session is evicted")
+    parser.add_argument("--max-history", type=int, default=MAX_SESSION_MESSAGES, help="History messages kept in memory per session")
+    args = parser.parse_args()
+    sessions = SessionStore(args.max_sessions, args.idle_timeout, args.max_history)
+    try:
+        asyncio.run(serve(args.host, args.port, sessions))
+    except KeyboardInterrupt:
+        print("Aura server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import threading
+import uuid
+
+from cancellation import TurnManager
+
+# --- Sessions ---
+# A Session is one conversation: its history, its settings and its turn
+# policy. Front-ends hold their own sessions (the GUI and the console loop
+# use the local one, the server one per client), and every backend call
+# takes the session it works on, so turns from different sessions share no
+# mutable state and never wait on each other. Within a session, a finished
+# exchange is appended to the history in one step under the session's lock,
+# so concurrent turns cannot interleave half-exchanges. With max_history,
+# the oldest turns are dropped once the summarizer has folded them, which
+# bounds the memory a long-lived session holds.
+
+
+class Session:
+    """One conversation's history, settings and turn coordination."""
+
+    def __init__(self, session_id=None, summarizer=None, turn_policy="supersede",
+                 speak_enabled=False, interaction_mode=None, history=None, max_history=None, remember=True):
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.summarizer = summarizer          # RollingSummarizer for this conversation (optional)
+        self.turns = TurnManager(turn_policy)
+        self.speak_enabled = speak_enabled    # Speak replies and prompts aloud
+        self.interaction_mode = interaction_mode  # "voice" or "text" (console loop)
+        self.last_generated_text = None       # Latest main response, for "save that as PDF"
+        self.last_context_stats = None        # Token budget details of the latest LLM request
+        self.max_history = max_history        # Messages kept in memory (None: unbounded)
+        self.remember = remember              # Share exchanges with the long-term memory index
+        self._lock = threading.Lock()
+        self._history = list(history or [])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._history)
+
+    def __bool__(self):
+        return True  # An empty session is still a session, not a missing one
+
+    @property
+    def history(self):
+        """A snapshot copy of the conversation history."""
+        with self._lock:
+            return list(self._history)
+
+    def add_messages(self, *messages):
+        """Appends messages in one step and returns a snapshot of the updated history."""
+        with self._lock:
+            self._history.extend(messages)
+            self._trim()
+            return list(self._history)
+
+    def _trim(self):
+        """Drops the oldest messages beyond max_history, in whole exchanges; call with the lock held."""
+        if self.max_history is None:
+            return
+        excess = len(self._history) - self.max_history
+        excess -= excess % 2
+        if excess <= 0:
+            return
+        if self.summarizer is not None:
+            # Only turns already in the summary go, unless folding keeps failing and the history has doubled
+            excess = self.summarizer.forget(excess, unfolded=len(self._history) > 2 * self.max_history)
+        del self._history[:excess]
+
+    def add_exchange(self, user_input, main_response, follow_up=None):
+        """Records a finished exchange (and Aura's follow-up) and remembers it as the last generated text."""
+        messages = [{"role": "user", "content": user_input}, {"role": "assistant", "content": main_response}]
+        if follow_up:
+            messages.append({"role": "user", "content": "Aura"})
+            messages.append({"role": "assistant", "content": follow_up})
+        self.last_generated_text = main_response
+        return self.add_messages(*messages)
+
+    def replace_history(self, history):
+        with self._lock:
+            self._history = list(history)
+
+    def settings(self):
+        return {"session_id": self.session_id, "turn_policy": self.turns.policy,
+                "speak_enabled": self.speak_enabled, "interaction_mode": self.interaction_mode,
+                "max_history": self.max_history, "remember": self.remember}
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# --- Single-Flight Request Coalescing ---
+# While a call for a key is in flight, identical calls wait on the same future
+# instead of repeating the work (double-clicked submits, a repeated voice
+# command, the same sentence synthesized twice, the same URL fetched twice).
+# Keys are tuples whose first element names the kind of call, which is also
+# what the hit/miss counters are grouped by. The futures are
+# concurrent.futures Futures, so thread callers block on them and asyncio
+# callers await them through asyncio.wrap_future.
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls onto one in-flight future."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}       # key -> Future
+        self._counters = {}       # kind -> {"calls": n, "coalesced": n}
+
+    def _count(self, key, coalesced):
+        kind = key[0] if isinstance(key, tuple) else key
+        counters = self._counters.setdefault(kind, {"calls": 0, "coalesced": 0})
+        counters["calls"] += 1
+        counters["coalesced"] += coalesced
+
+    def claim(self, key):
+        """
+        Returns (future, is_leader). The leader must settle the future with
+        finish(); everyone else just waits on it.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            self._count(key, not leader)
+            return future, leader
+
+    def finish(self, key, future, result=None, error=None):
+        """Settles a claimed future and releases the key for new calls."""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) unless an identical call is in flight, and returns its result."""
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """
+        asyncio variant of do(). func may be a coroutine function or a plain
+        (blocking) function, which then runs in the loop's default executor.
+        """
+        future, leader = self.claim(key)
+        if leader:
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    result = await func(*args, **kwargs)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+            except BaseException as e:
+                self.finish(key, future, error=e)
+                raise
+            self.finish(key, future, result)
+            return result
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._inflight
+
+    def stats(self):
+        """Returns calls and coalesced hits per kind of call."""
+        with self._lock:
+            return {kind: dict(counters, in_flight=sum(1 for k in self._inflight if (k[0] if isinstance(k, tuple) else k) == kind))
+                    for kind, counters in self._counters.items()}
@@ -0,0 +1,172 @@
+import json
+import os
+import time
+
+import speech_recognition as sr
+
+from metrics import LatencyStats
+
+# --- Speech-to-Text Engines ---
+# Every engine turns sr.AudioData into text and reports failures the same way
+# speech_recognition does (sr.UnknownValueError when nothing intelligible was
+# said, sr.RequestError when the engine itself is unavailable), so callers only
+# handle one set of exceptions. Each engine records its own latency stats.
+
+OFFLINE_RETRY_SECONDS = 30  # After a network failure, stay offline this long before retrying Google
+VOSK_SAMPLE_RATE = 16000
+
+
+class STTEngine:
+    """Base class for speech-to-text engines."""
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = LatencyStats()
+
+    def is_available(self):
+        return True
+
+    def transcribe(self, audio):
+        """Returns the recognized text for audio, recording latency per call."""
+        started = time.perf_counter()
+        try:
+            text = self._recognize(audio)
+        except sr.UnknownValueError:
+            # The engine worked, there just was no speech in it
+            self.stats.record(time.perf_counter() - started)
+            raise
+        except Exception:
+            self.stats.record(time.perf_counter() - started, ok=False)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return text
+
+    def _recognize(self, audio):
+        raise NotImplementedError
+
+
+class GoogleSTT(STTEngine):
+    """Google Web Speech API via speech_recognition (needs network)."""
+
+    name = "google"
+
+    def __init__(self, recognizer=None, endpoint=None):
+        super().__init__()
+        self.recognizer = recognizer or sr.Recognizer()
+        # Stand-in for the Web Speech API endpoint (load tests); needs SpeechRecognition 3.11+
+        self.endpoint = endpoint or os.getenv("AURA_GOOGLE_STT_URL")
+
+    def _recognize(self, audio):
+        if self.endpoint:
+            return self.recognizer.recognize_google(audio, endpoint=self.endpoint)
+        return self.recognizer.recognize_google(audio)
+
+
+class SphinxSTT(STTEngine):
+    """CMU PocketSphinx via speech_recognition (offline, needs the pocketsphinx package)."""
+
+    name = "sphinx"
+
+    def __init__(self, recognizer=None):
+        super().__init__()
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def is_available(self):
+        try:
+            import pocketsphinx  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_sphinx(audio)
+
+
+class VoskSTT(STTEngine):
+    """Vosk/Kaldi local model (offline). The model directory comes from VOSK_MODEL_PATH."""
+
+    name = "vosk"
+
+    def __init__(self, model_path=None):
+        super().__init__()
+        self.model_path = model_path or os.getenv("VOSK_MODEL_PATH")
+        self._model = None
+
+    def is_available(self):
+        if not self.model_path or not os.path.isdir(self.model_path):
+            return False
+        try:
+            import vosk  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _recognize(self, audio):
+        try:
+            import vosk
+        except ImportError:
+            raise sr.RequestError("vosk is not installed")
+        if self._model is None:
+            if not self.model_path:
+                raise sr.RequestError("VOSK_MODEL_PATH is not set")
+            self._model = vosk.Model(self.model_path)  # Loaded once, reused for every turn
+
+        recognizer = vosk.KaldiRecognizer(self._model, VOSK_SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class FallbackSTT(STTEngine):
+    """Uses the primary engine and switches to the offline one while the network is failing."""
+
+    name = "auto"
+
+    def __init__(self, primary, fallback):
+        super().__init__()
+        self.primary = primary
+        self.fallback = fallback
+        self._offline_until = 0.0
+
+    def _recognize(self, audio):
+        if time.monotonic() >= self._offline_until:
+            try:
+                return self.primary.transcribe(audio)
+            except sr.RequestError as e:
+                print(f"{self.primary.name} speech recognition unavailable ({e}); using {self.fallback.name}.")
+                self._offline_until = time.monotonic() + OFFLINE_RETRY_SECONDS
+        return self.fallback.transcribe(audio)
+
+    def engine_stats(self):
+        return {self.primary.name: self.primary.stats.snapshot(), self.fallback.name: self.fallback.stats.snapshot()}
+
+
+def first_available_offline_engine(recognizer=None):
+    """Returns the first usable offline engine (Vosk, then PocketSphinx), or None."""
+    for engine in (VoskSTT(), SphinxSTT(recognizer)):
+        if engine.is_available():
+            return engine
+    return None
+
+
+def create_stt_engine(name="auto", recognizer=None):
+    """
+    Builds the engine named by name: "google", "sphinx", "vosk", or "auto"
+    (Google, falling back to an offline engine when one is installed).
+    """
+    name = (name or "auto").lower()
+    if name == "google":
+        return GoogleSTT(recognizer)
+    if name == "sphinx":
+        return SphinxSTT(recognizer)
+    if name == "vosk":
+        return VoskSTT()
+
+    google = GoogleSTT(recognizer)
+    offline = first_available_offline_engine(recognizer)
+    if offline is None:
+        return google
+    return FallbackSTT(google, offline)
@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import threading
+
+from context_window import estimate_tokens
+from rate_limiter import PRIORITY_BACKGROUND
+
+# --- Rolling Conversation Summary ---
+# Older turns are folded into one running summary by a background thread that
+# uses a cheaper model. The interactive prompt then carries the summary plus
+# only the most recent turns, so its size stays roughly constant however long
+# the session runs. The foreground request never waits for summarization: it
+# simply uses whatever summary is ready. Summary and raw history are persisted
+# together in one JSON state file. With a shared rate limiter, summary
+# requests queue behind interactive turns.
+
+SUMMARY_MODEL = "llama3-8b-8192"
+KEEP_RECENT_MESSAGES = 6    # Newest history messages always sent verbatim
+FOLD_BATCH_MESSAGES = 6     # Fold only once this many messages are waiting, to batch the work
+MAX_SUMMARY_TOKENS = 300
+STATE_FILE = "conversation_state.json"
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and Aura, an AI assistant.
+Update the summary with the new messages. Keep names, facts, preferences, decisions and open questions.
+Drop small talk. Write at most 150 words in plain prose. Reply with the summary only."""
+
+
+class RollingSummarizer:
+    """Keeps a running summary of older conversation turns, updated in the background."""
+
+    def __init__(self, client, model=SUMMARY_MODEL, state_path=STATE_FILE, limiter=None):
+        self.client = client
+        self.limiter = limiter
+        self.model = model
+        self.state_path = state_path
+        self.summary = ""
+        self.summarized_count = 0   # Leading history messages already folded into the summary
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def prompt_context(self, history):
+        """Returns (summary messages, history still sent verbatim) for the next prompt."""
+        with self._lock:
+            summary, count = self.summary, self.summarized_count
+        summary_messages = []
+        if summary:
+            summary_messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        return summary_messages, history[count:]
+
+    def maybe_fold(self, history, current=None):
+        """
+        Starts a background fold if enough old turns are waiting; never blocks.
+        current() returns the live history, which is saved with the new summary; exchanges
+        recorded while the fold was running would otherwise be lost from the state file.
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            fold_end = len(history) - KEEP_RECENT_MESSAGES
+            if fold_end - self.summarized_count < FOLD_BATCH_MESSAGES:
+                return
+            pending = list(history[self.summarized_count:fold_end])
+            self._worker = threading.Thread(
+                target=self._fold, args=(pending, fold_end, current or (lambda: list(history))),
+                name="aura-summarizer", daemon=True,
+            )
+            self._worker.start()
+
+    def _fold(self, pending, fold_end, current):
+        with self._lock:
+            previous = self.summary
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in pending)
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"},
+        ]
+        try:
+            if self.limiter is not None:
+                self.limiter.acquire(estimate_tokens(transcript) + MAX_SUMMARY_TOKENS, PRIORITY_BACKGROUND)
+            raw = self.client.chat.completions.with_raw_response.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.2,
+                max_tokens=MAX_SUMMARY_TOKENS,
+            )
+            if self.limiter is not None:
+                self.limiter.observe_headers(raw.headers)
+            summary = raw.parse().choices[0].message.content.strip()
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429 and self.limiter is not None:
+                response = getattr(e, "response", None)
+                self.limiter.on_throttled(response.headers if response is not None else None)
+            # The raw turns are still in the history and keep being sent; retry on the next turn
+            print(f"Background summarization failed: {e}")
+            return
+        with self._lock:
+            self.summary = summary
+            self.summarized_count = fold_end
+        self.save(current())
+
+    def forget(self, count, unfolded=False):
+        """
+        Called before count leading messages are dropped from the history; returns how many may be dropped.
+        Only messages already in the summary may go unless unfolded is set, and none while a fold is
+        running (its positions refer to the current history).
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return 0
+            if not unfolded:
+                count = min(count, self.summarized_count)
+            self.summarized_count = max(0, self.summarized_count - count)
+            return count
+
+    def save(self, history):
+        """Atomically writes the summary and the raw history to the state file."""
+        with self._lock:
+            state = {"summary": self.summary, "summarized_count": self.summarized_count, "history": list(history)}
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"Error saving conversation state: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def load(self):
+        """Restores the summary from the state file and returns the saved raw history."""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            print(f"Error loading conversation state: {e}")
+            return []
+        history = state.get("history", [])
+        with self._lock:
+            self.summary = state.get("summary", "")
+            self.summarized_count = min(state.get("summarized_count", 0), len(history))
+        return history
@@ -0,0 +1,33 @@
+import pytest
+
+from semantic_cache import SemanticCache, is_standalone
+
+
+@pytest.mark.parametrize("question", [
+    "What is my name?",
+    "what's my name",
+    "What did I just say?",
+    "What was my last question?",
+    "Summarize our conversation so far",
+    "Do you remember what I told you?",
+    "Can you explain that again?",
+])
+def test_conversation_dependent_questions_are_not_standalone(question):
+    assert not is_standalone(question)
+
+
+@pytest.mark.parametrize("question", [
+    "What is the capital of France?",
+    "How do rainbows form?",
+    "Explain how photosynthesis works",
+])
+def test_general_questions_are_standalone(question):
+    assert is_standalone(question)
+
+
+def test_lookup_serves_only_matching_language_and_model(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "cache.npz"))
+    cache.add("What is the capital of France?", "en", "model-a", "Paris.")
+    assert cache.lookup("what is the capital of france", "en", "model-a")[0] == "Paris."
+    assert cache.lookup("what is the capital of france", "hi", "model-a") is None
+    assert cache.lookup("what is the capital of france", "en", "model-b") is None
@@ -0,0 +1,287 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import LatencyStats
+
+# --- Turn Tracing ---
+# Every turn (a typed message, a voice exchange, an image request, a server
+# chat turn) carries a Trace with a short trace id. The stages it passes
+# through record spans on it: microphone calibration, listening, speech
+# recognition, language and intent detection, cache lookups, rate limiter
+# and turn queue waits, LLM attempts, TTS queueing and synthesis, playback.
+# The current trace travels in a ContextVar, so coroutines and helpers find
+# it without extra parameters; work handed to a thread pool must be wrapped
+# with bind(), since pools do not copy the caller's context. Without a
+# current trace every helper here is a no-op.
+#
+# Finished traces are appended to a size-rotated JSONL file
+# (traces/aura_traces.jsonl, then .1, .2, ...) and the most recent ones are
+# kept in memory for the GUI latency panel. Spans recorded after their trace
+# finished (e.g. a cancelled hedge attempt unwinding) are dropped.
+
+TRACE_FILE = os.path.join("traces", "aura_traces.jsonl")
+MAX_TRACE_FILE_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3               # Rotated files kept besides the current one
+RECENT_TRACES = 50              # Finished traces kept in memory
+
+_current = contextvars.ContextVar("aura_trace", default=None)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class Trace:
+    """Span timings of one turn. Times are time.monotonic() values."""
+
+    def __init__(self, tracer, kind, session_id=None, attributes=None):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.session_id = session_id
+        self.attributes = dict(attributes or {})
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.duration = None
+        self.ok = True
+        self.spans = []
+        self.finished = False
+        self.discarded = False
+        self._lock = threading.Lock()
+
+    def add_span(self, name, started, ended=None, ok=True, **attributes):
+        """Records a span from started to ended (default: now)."""
+        ended = time.monotonic() if ended is None else ended
+        span = {"name": name, "start_ms": _ms(started - self.started), "duration_ms": _ms(max(0.0, ended - started)),
+                "ok": ok, "thread": threading.current_thread().name}
+        span.update(attributes)
+        with self._lock:
+            if not self.finished:
+                self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Times the enclosed block; an exception marks the span failed and propagates."""
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self.add_span(name, started, ok=False, error=type(e).__name__, **attributes)
+            raise
+        self.add_span(name, started, **attributes)
+
+    def has_span(self, name):
+        with self._lock:
+            return any(span["name"] == name for span in self.spans)
+
+    def set(self, **attributes):
+        """Adds attributes to the trace itself (intent, language, model...)."""
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def discard(self):
+        """Drops the trace instead of recording it (e.g. a listen that heard nothing)."""
+        self.discarded = True
+
+    def finish(self, ok=True):
+        """Ends the trace and hands it to the tracer; later calls do nothing."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.ok = ok
+            self.duration = time.monotonic() - self.started
+        if not self.discarded:
+            self.tracer.record(self)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+            return {
+                "trace_id": self.trace_id,
+                "kind": self.kind,
+                "session_id": self.session_id,
+                "started_at": round(self.started_at, 3),
+                "duration_ms": _ms(self.duration if self.duration is not None else time.monotonic() - self.started),
+                "ok": self.ok,
+                "attributes": dict(self.attributes),
+                "spans": spans,
+            }
+
+
+class Tracer:
+    """Creates traces and records finished ones to a rotating JSONL file and an in-memory window."""
+
+    def __init__(self, path=TRACE_FILE, max_bytes=MAX_TRACE_FILE_BYTES, backups=TRACE_BACKUPS, enabled=True,
+                 keep=RECENT_TRACES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = enabled          # False: traces are still kept in memory, just not written
+        self.recorded = 0
+        self._recent = deque(maxlen=keep)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def start(self, kind, session_id=None, **attributes):
+        """Starts a trace; make it current with activate()."""
+        return Trace(self, kind, session_id, attributes)
+
+    @contextmanager
+    def trace(self, kind, session_id=None, **attributes):
+        """Starts a trace, makes it current for the enclosed block and finishes it afterwards."""
+        with activate(self.start(kind, session_id, **attributes)) as trace:
+            yield trace
+
+    def record(self, trace):
+        data = trace.to_dict()
+        with self._lock:
+            self.recorded += 1
+            self._recent.append(data)
+            listeners = list(self._listeners)
+            if self.enabled:
+                self._write(json.dumps(data, ensure_ascii=False) + "\n")
+        for callback in listeners:
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"Error in trace listener: {e}")
+
+    def _write(self, line):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Error writing trace: {e}")
+
+    def _rotate(self):
+        for index in range(self.backups, 0, -1):
+            source = self.path if index == 1 else f"{self.path}.{index - 1}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index}")
+        if self.backups == 0:
+            os.remove(self.path)
+
+    def subscribe(self, callback):
+        """Calls callback(trace dict) from the finishing thread whenever a trace is recorded."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def recent(self, count=None):
+        """The most recently finished traces as dicts, oldest first."""
+        with self._lock:
+            traces = list(self._recent)
+        return traces[-count:] if count else traces
+
+    def stage_stats(self, count=None):
+        """Per-stage latency over recent traces: {stage: LatencyStats snapshot}, a stage's spans summed per turn."""
+        stages = {}
+        for trace in self.recent(count):
+            totals = {}
+            for span in trace["spans"]:
+                totals[span["name"]] = totals.get(span["name"], 0.0) + span["duration_ms"] / 1000
+            for name, seconds in totals.items():
+                stages.setdefault(name, LatencyStats()).record(seconds)
+        return {name: stats.snapshot() for name, stats in stages.items()}
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def activate(trace, finish=True):
+    """Makes trace current for the enclosed block; with finish, ends it afterwards (failed on an exception)."""
+    token = _current.set(trace)
+    ok = False
+    try:
+        yield trace
+        ok = True
+    finally:
+        _current.reset(token)
+        if finish:
+            trace.finish(ok)
+
+
+def annotate(**attributes):
+    """Adds attributes to the current trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.set(**attributes)
+
+
+def add_span(name, started, ended=None, ok=True, **attributes):
+    """Records a span on the current trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(name, started, ended, ok, **attributes)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Times the enclosed block as a span of the current trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **attributes):
+        yield
+
+
+def traced(name):
+    """Decorator recording each call of a (synchronous) function as a span of the current trace."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(func, queue_span=None):
+    """
+    Wraps func to run with the caller's current trace on another thread (executors and
+    threads do not copy context). With queue_span, the time between bind() and the call
+    starting is recorded as a span, i.e. how long the work waited for a free worker.
+    """
+    if _current.get() is None:
+        return func
+    context = contextvars.copy_context()
+    queued = time.monotonic()
+
+    def run(*args, **kwargs):
+        if queue_span:
+            context.run(add_span, queue_span, queued)
+        return context.run(func, *args, **kwargs)
+    return run
+
+
+def format_trace(trace, width=32):
+    """Text waterfall of a trace dict: one line per span with a bar placed on the turn's timeline."""
+    total = max(trace["duration_ms"], 1.0)
+    lines = [f"{trace['kind']} {trace['trace_id']}  {trace['duration_ms']:.0f} ms" + ("" if trace["ok"] else "  (failed)")]
+    for span in trace["spans"]:
+        offset = min(width - 1, int(span["start_ms"] / total * width))
+        length = max(1, min(width - offset, round(span["duration_ms"] / total * width)))
+        bar = " " * offset + "█" * length
+        mark = "" if span["ok"] else " !"
+        lines.append(f"  {span['name']:<18}{bar:<{width}} {span['duration_ms']:>8.0f} ms{mark}")
+    return "\n".join(lines)
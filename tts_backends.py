@@ -0,0 +1,210 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from metrics import LatencyStats
+
+# --- Text-to-Speech Backends ---
+# Every backend turns text into encoded audio bytes (mp3 or wav, both of which
+# the audio output can play). TTSSelector keeps latency stats per backend and
+# language, keeps the preferred backend while it is healthy and fast enough,
+# and falls back to the fastest healthy alternative otherwise.
+
+UNHEALTHY_SECONDS = 30      # A failing backend is skipped this long before it is tried again
+LATENCY_BUDGET_SECONDS = 2  # A backend whose median synthesis time exceeds this counts as slow
+
+
+class TTSBackend:
+    """Base class for speech synthesis backends."""
+
+    name = "base"
+    languages = None  # None means every language
+
+    @property
+    def voice(self):
+        """Settings that change the produced audio (part of the cache key)."""
+        return {}
+
+    def is_available(self):
+        return True
+
+    def supports(self, lang):
+        return self.languages is None or lang in self.languages
+
+    def synthesize(self, text, lang):
+        """Returns the encoded audio for text as bytes."""
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS (one HTTPS request per utterance)."""
+
+    name = "gtts"
+
+    def __init__(self, slow=False, base_url=None):
+        self.slow = slow
+        # Stand-in server speaking the same protocol (load tests), e.g. http://127.0.0.1:8901
+        self.base_url = base_url or os.getenv("AURA_GTTS_URL")
+
+    @property
+    def voice(self):
+        return {"slow": self.slow}
+
+    def synthesize(self, text, lang):
+        from gtts import gTTS
+        buffer = BytesIO()
+        tts = gTTS(text=text, lang=lang, slow=self.slow)
+        if self.base_url:
+            prepare = tts._prepare_requests
+            tts._prepare_requests = lambda: [self._redirect(request) for request in prepare()]
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def _redirect(self, request):
+        url = urlsplit(request.url)
+        request.url = self.base_url.rstrip("/") + url.path + (f"?{url.query}" if url.query else "")
+        return request
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng (or espeak) command line synthesizer; fully offline, writes WAV to stdout."""
+
+    name = "espeak"
+    languages = {"en", "hi"}
+
+    def __init__(self, speed=165):
+        self.speed = speed
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    @property
+    def voice(self):
+        return {"speed": self.speed}
+
+    def is_available(self):
+        return self.binary is not None
+
+    def synthesize(self, text, lang):
+        # Text goes in on stdin, so a sentence starting with "-" is never read as an option
+        result = subprocess.run(
+            [self.binary, "-v", lang, "-s", str(self.speed), "--stdout", "--stdin"],
+            input=text.encode("utf-8"), capture_output=True, timeout=30, check=True,
+        )
+        return result.stdout
+
+
+class Pyttsx3Backend(TTSBackend):
+    """pyttsx3 with the system voices (SAPI5 / NSSpeechSynthesizer / espeak); offline."""
+
+    name = "pyttsx3"
+    languages = {"en"}
+
+    def __init__(self, rate=175):
+        self.rate = rate
+        self._lock = threading.Lock()  # The pyttsx3 engine is not thread-safe
+
+    @property
+    def voice(self):
+        return {"rate": self.rate}
+
+    def is_available(self):
+        try:
+            import pyttsx3  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def synthesize(self, text, lang):
+        import pyttsx3
+        # pyttsx3 can only render to a file, so this backend pays one temp-file round-trip
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            with self._lock:
+                engine = pyttsx3.init()
+                engine.setProperty("rate", self.rate)
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class TTSSelector:
+    """Picks a TTS backend per language from measured latency and health, with fallback."""
+
+    def __init__(self, backends, preferences=None):
+        self.backends = [backend for backend in backends if backend.is_available()]
+        self.preferences = preferences or {}  # lang -> [backend names], most preferred first
+        self._stats = {}                      # (backend name, lang) -> LatencyStats
+        self._unhealthy_until = {}            # backend name -> monotonic time
+        self._lock = threading.Lock()
+
+    def stats(self, backend, lang):
+        with self._lock:
+            return self._stats.setdefault((backend.name, lang), LatencyStats())
+
+    def _preference_rank(self, backend, lang):
+        order = self.preferences.get(lang) or self.preferences.get("*") or []
+        return order.index(backend.name) if backend.name in order else len(order) + self.backends.index(backend)
+
+    def candidates(self, lang):
+        """Returns backends for lang in the order they should be tried."""
+        now = time.monotonic()
+        usable = [b for b in self.backends if b.supports(lang)]
+
+        def rank(backend):
+            healthy = self._unhealthy_until.get(backend.name, 0) <= now
+            median = self.stats(backend, lang).percentile(50)
+            fast_enough = median is None or median <= LATENCY_BUDGET_SECONDS
+            # Healthy, fast-enough backends keep their preference order; slow ones go by speed
+            if healthy and fast_enough:
+                return (0, self._preference_rank(backend, lang))
+            return (1 if healthy else 2, median if median is not None else float("inf"))
+
+        return sorted(usable, key=rank)
+
+    def synthesize(self, text, lang):
+        """Synthesizes with the best backend, falling back on errors; returns (backend, audio bytes)."""
+        errors = []
+        for backend in self.candidates(lang):
+            started = time.perf_counter()
+            try:
+                audio = backend.synthesize(text, lang)
+            except Exception as e:
+                self.stats(backend, lang).record(time.perf_counter() - started, ok=False)
+                with self._lock:
+                    self._unhealthy_until[backend.name] = time.monotonic() + UNHEALTHY_SECONDS
+                print(f"TTS backend {backend.name} failed ({e}); trying the next one.")
+                errors.append(e)
+                continue
+            self.stats(backend, lang).record(time.perf_counter() - started)
+            return backend, audio
+        raise RuntimeError(f"No TTS backend could synthesize speech for '{lang}': {errors}")
+
+    def latency_report(self):
+        """Returns {lang: {backend: stats}} for every backend/language pair used so far."""
+        with self._lock:
+            items = list(self._stats.items())
+        report = {}
+        for (name, lang), stats in items:
+            report.setdefault(lang, {})[name] = stats.snapshot()
+        return report
+
+
+def parse_preferences(spec):
+    """Parses "en:gtts,espeak;hi:gtts" into {"en": ["gtts", "espeak"], "hi": ["gtts"]}."""
+    preferences = {}
+    for part in (spec or "").split(";"):
+        if ":" in part:
+            lang, names = part.split(":", 1)
+            preferences[lang.strip()] = [name.strip() for name in names.split(",") if name.strip()]
+    return preferences
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+# --- Content-Addressed TTS Cache ---
+# Synthesized audio is stored under the SHA-256 of (text, lang, voice settings),
+# both on disk (survives restarts) and in a small in-memory layer. Both layers
+# are bounded by size and evict the least recently used entries; pinned keys
+# (fixed system phrases) are never evicted. Audio is produced and served as
+# bytes; disk writes happen on a background thread, off the speaking path.
+
+CACHE_DIR = "tts_cache"
+CACHE_EXT = ".audio"  # mp3 or wav, depending on the backend that produced it
+MAX_DISK_BYTES = 64 * 1024 * 1024
+MAX_MEMORY_BYTES = 8 * 1024 * 1024
+
+
+def cache_key(text, lang, **voice):
+    """Returns the content address for a piece of speech and its voice settings."""
+    payload = json.dumps([text, lang, sorted(voice.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Size-bounded LRU cache of synthesized speech, in memory and on disk."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_disk_bytes=MAX_DISK_BYTES, max_memory_bytes=MAX_MEMORY_BYTES,
+                 pinned=()):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes, least recently used first
+        self._memory_bytes = 0
+        self._disk = OrderedDict()    # key -> size in bytes, least recently used first
+        self._disk_bytes = 0
+        self._pinned = set(pinned)    # Protected from the start, including the sweep below
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aura-tts-cache")
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.sweep()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_EXT)
+
+    def sweep(self):
+        """Removes half-written files and rebuilds the disk index in last-used order."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                elif name.endswith(CACHE_EXT):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, name[:-len(CACHE_EXT)], stat.st_size))
+            except OSError as e:
+                print(f"TTS cache sweep skipped {name}: {e}")
+
+        with self._lock:
+            self._disk.clear()
+            self._disk_bytes = 0
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_bytes += size
+            self._evict_disk()
+
+    def pin(self, key):
+        """Protects a key from eviction (used for phrases Aura speaks all the time)."""
+        with self._lock:
+            self._pinned.add(key)
+
+    def get(self, key):
+        """Returns the cached audio bytes for key, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._touch_disk(key)
+                self.hits += 1
+                return data
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+        with self._lock:
+            if data is None:
+                self._disk_bytes -= self._disk.pop(key, 0)
+                self.misses += 1
+                return None
+            self._touch_disk(key)
+            self._remember(key, data)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Stores audio bytes for key; the disk copy is written in the background."""
+        with self._lock:
+            self._remember(key, data)
+        self._writer.submit(self._write_to_disk, key, data)
+
+    def get_or_create(self, key, synthesize):
+        """Returns cached audio for key, calling synthesize(fp) to produce it on a miss."""
+        data = self.get(key)
+        if data is not None:
+            return data
+        buffer = BytesIO()
+        synthesize(buffer)
+        data = buffer.getvalue()
+        self.put(key, data)
+        return data
+
+    def flush(self):
+        """Waits until every pending disk write has finished."""
+        self._writer.submit(lambda: None).result()
+
+    def _write_to_disk(self, key, data):
+        # Write next to the final file and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Failed to write TTS cache entry: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._evict_disk()
+
+    def _touch_disk(self, key):
+        if key in self._disk:
+            self._disk.move_to_end(key)
+            now = time.time()
+            try:
+                os.utime(self._path(key), (now, now))  # Keeps LRU order across restarts
+            except OSError:
+                pass
+
+    def _remember(self, key, data):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if len(data) > self.max_memory_bytes:
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        for old_key in list(self._memory):
+            if self._memory_bytes <= self.max_memory_bytes:
+                break
+            if old_key in self._pinned:
+                continue
+            self._memory_bytes -= len(self._memory.pop(old_key))
+
+    def _evict_disk(self):
+        for old_key in list(self._disk):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            if old_key in self._pinned:
+                continue
+            self._disk_bytes -= self._disk.pop(old_key)
+            try:
+                os.remove(self._path(old_key))
+            except OSError as e:
+                print(f"Failed to evict TTS cache entry {old_key}: {e}")
+
+
+def sweep_stale_audio(directory="temp_audio"):
+    """Deletes mp3 files left behind by older versions that saved one file per reply."""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith("response_") and name.endswith(".mp3"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError as e:
+                print(f"Failed to delete stale audio {name}: {e}")
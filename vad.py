@@ -0,0 +1,211 @@
+import sys
+import time
+import wave
+
+import numpy as np
+
+# --- Voice Activity Detection ---
+# Frames are classified with vectorized NumPy features: RMS energy against an
+# adaptive noise floor, and zero-crossing rate to reject hiss-like noise. The
+# floor follows quiet frames, and is raised to the quietest frame of the last
+# few seconds when that is louder, so a step up in background noise (which
+# makes every frame look like speech) cannot lock the VAD in "speech". An
+# Endpointer adds hangover smoothing on top: speech has to persist for a few
+# frames before an utterance starts, and a short run of silence ends it.
+
+
+CHUNK_SAMPLES = 1024  # Samples per classify() call in detect_segments (speech_recognition's default chunk)
+
+
+class VadConfig:
+    """Tunable VAD parameters; the defaults end an utterance after ~250 ms of silence."""
+
+    def __init__(self, frame_ms=20, start_ms=60, end_silence_ms=250, max_utterance_s=30,
+                 threshold_ratio=2.5, min_threshold=150, strong_ratio=4.0, zcr_max=0.25,
+                 noise_adapt_rate=0.05, noise_window_s=5.0):
+        self.frame_ms = frame_ms                  # Analysis frame length
+        self.start_ms = start_ms                  # Speech needed before an utterance starts
+        self.end_silence_ms = end_silence_ms      # Silence that ends an utterance
+        self.max_utterance_s = max_utterance_s    # Hard cap, None for no cap
+        self.threshold_ratio = threshold_ratio    # Speech must be this much louder than the noise floor
+        self.min_threshold = min_threshold        # RMS floor, so digital silence is never "speech"
+        self.strong_ratio = strong_ratio          # Above threshold * strong_ratio, ZCR is ignored (fricatives)
+        self.zcr_max = zcr_max                    # Zero-crossings per sample above which quiet frames count as noise
+        self.noise_adapt_rate = noise_adapt_rate  # Weight of each quiet frame in the noise floor average
+        self.noise_window_s = noise_window_s      # The floor rises to the quietest frame of this window
+
+
+def frame_features(samples, frame_len):
+    """Returns per-frame RMS energy and zero-crossing rate for 16-bit PCM samples."""
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_len
+    return energy, zcr
+
+
+class VoiceActivityDetector:
+    """Classifies audio frames as speech or non-speech with an adaptive noise floor."""
+
+    def __init__(self, sample_rate, config=None):
+        self.config = config or VadConfig()
+        self.sample_rate = sample_rate
+        self.frame_len = max(1, int(sample_rate * self.config.frame_ms / 1000))
+        self.noise_floor = None
+        self._leftover = np.zeros(0, dtype=np.int16)
+        window = max(1, round(self.config.noise_window_s * 1000 / self.config.frame_ms))
+        self._recent = np.zeros(window, dtype=np.float32)  # Ring of recent frame energies
+        self._recent_pos = 0
+        self._recent_full = False
+
+    @property
+    def threshold(self):
+        return max(self.config.min_threshold, (self.noise_floor or 0.0) * self.config.threshold_ratio)
+
+    def calibrate(self, pcm):
+        """Sets the noise floor from audio known to contain no speech."""
+        energy, _ = frame_features(np.frombuffer(pcm, dtype=np.int16), self.frame_len)
+        self.noise_floor = float(np.mean(energy)) if energy.size else 0.0
+
+    def classify(self, pcm):
+        """Returns a boolean speech flag for every complete frame in pcm (partial frames carry over)."""
+        samples = np.concatenate([self._leftover, np.frombuffer(pcm, dtype=np.int16)])
+        n_used = (len(samples) // self.frame_len) * self.frame_len
+        self._leftover = samples[n_used:]
+        energy, zcr = frame_features(samples[:n_used], self.frame_len)
+        if self.noise_floor is None:
+            self.noise_floor = float(np.min(energy)) if energy.size else 0.0
+
+        threshold = self.threshold
+        loud = energy >= threshold
+        speech = loud & ((zcr <= self.config.zcr_max) | (energy >= threshold * self.config.strong_ratio))
+
+        # Only quiet frames move the noise floor, so speech never raises it
+        rate = self.config.noise_adapt_rate
+        for value in energy[~loud]:
+            self.noise_floor += rate * (float(value) - self.noise_floor)
+        # ...but real speech always has pauses, so if even the quietest recent frame is louder, the noise rose
+        self._remember(energy)
+        if self._recent_full:
+            self.noise_floor = max(self.noise_floor, float(self._recent.min()))
+        return speech
+
+    def _remember(self, energy):
+        energy = energy[-len(self._recent):]
+        positions = (self._recent_pos + np.arange(len(energy))) % len(self._recent)
+        self._recent[positions] = energy
+        self._recent_pos = (self._recent_pos + len(energy)) % len(self._recent)
+        self._recent_full = self._recent_full or self._recent_pos < len(energy) or len(energy) == len(self._recent)
+
+
+class Endpointer:
+    """Turns per-frame speech flags into utterance start/end events with hangover smoothing."""
+
+    def __init__(self, config=None, max_utterance_s=None):
+        self.config = config or VadConfig()
+        max_utterance_s = max_utterance_s or self.config.max_utterance_s
+        self.start_frames = max(1, round(self.config.start_ms / self.config.frame_ms))
+        self.end_frames = max(1, round(self.config.end_silence_ms / self.config.frame_ms))
+        self.max_frames = round(max_utterance_s * 1000 / self.config.frame_ms) if max_utterance_s else None
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.frame_index = 0      # Frames seen so far
+        self.start_frame = None   # Frame where the current/last utterance started
+        self.end_frame = None     # Frame where the last utterance ended (decision point)
+        self.last_speech_frame = None
+        self._speech_run = 0
+        self._silence_run = 0
+
+    def update(self, flags):
+        """Feeds frame flags; returns "end" if an utterance ended in this batch, else "start" or None."""
+        event = None
+        for is_speech in flags:
+            self.frame_index += 1
+            if not self.in_speech:
+                self._speech_run = self._speech_run + 1 if is_speech else 0
+                if self._speech_run >= self.start_frames:
+                    self.in_speech = True
+                    self.start_frame = self.frame_index - self._speech_run
+                    self._silence_run = 0
+                    event = event or "start"
+            else:
+                self._silence_run = 0 if is_speech else self._silence_run + 1
+                too_long = self.max_frames and self.frame_index - self.start_frame >= self.max_frames
+                if self._silence_run >= self.end_frames or too_long:
+                    self.in_speech = False
+                    self.end_frame = self.frame_index
+                    self.last_speech_frame = self.frame_index - self._silence_run
+                    self._speech_run = 0
+                    return "end"
+        return event
+
+
+def detect_segments(samples, sample_rate, config=None):
+    """Runs the VAD over a whole recording; returns [(start_s, end_s, decided_at_s), ...]."""
+    config = config or VadConfig()
+    vad = VoiceActivityDetector(sample_rate, config)
+    calibration = samples[:int(sample_rate * 0.25)]
+    vad.calibrate(calibration.tobytes())
+    # Classify chunk by chunk as the microphone stream does, so the noise floor adapts along the way
+    flags = np.concatenate([vad.classify(samples[i:i + CHUNK_SAMPLES].tobytes())
+                            for i in range(0, len(samples), CHUNK_SAMPLES)] or [np.zeros(0, dtype=bool)])
+
+    endpointer = Endpointer(config)
+    frame_s = vad.frame_len / sample_rate
+    segments = []
+    position = 0
+    while position < len(flags):
+        # Feed frame by frame so every start/end pair is seen
+        event = endpointer.update(flags[position:position + 1])
+        position += 1
+        if event == "end":
+            segments.append((endpointer.start_frame * frame_s, endpointer.last_speech_frame * frame_s,
+                             endpointer.end_frame * frame_s))
+    if endpointer.in_speech:
+        segments.append((endpointer.start_frame * frame_s, len(flags) * frame_s, len(flags) * frame_s))
+    return segments
+
+
+def read_wav(path):
+    """Loads a mono 16-bit WAV file as (samples, sample_rate)."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        if wav.getnchannels() > 1:
+            samples = samples.reshape(-1, wav.getnchannels())[:, 0].copy()
+        return samples, wav.getframerate()
+
+
+def benchmark(paths, config=None):
+    """Prints detected segments, endpointing delay and processing speed for WAV fixtures."""
+    config = config or VadConfig()
+    for path in paths:
+        samples, sample_rate = read_wav(path)
+        started = time.perf_counter()
+        segments = detect_segments(samples, sample_rate, config)
+        elapsed = time.perf_counter() - started
+        duration = len(samples) / sample_rate
+        print(f"{path}: {duration:.2f} s audio, {len(segments)} utterance(s), "
+              f"processed in {elapsed * 1000:.1f} ms ({duration / max(elapsed, 1e-9):.0f}x realtime)")
+        for start, end, decided in segments:
+            print(f"  speech {start:6.2f}-{end:6.2f} s, end decided after {(decided - end) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    # Usage: python vad.py recording.wav [more.wav ...] [--end-silence-ms 250]
+    args = sys.argv[1:]
+    options = {}
+    while "--end-silence-ms" in args:
+        i = args.index("--end-silence-ms")
+        options["end_silence_ms"] = int(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python vad.py recording.wav [more.wav ...] [--end-silence-ms 250]")
+        sys.exit(1)
+    benchmark(args, VadConfig(**options))